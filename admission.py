@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+请求准入控制模块
+按请求类别限制同时处理的请求数，超出时在有界队列中等待，队列已满或等待超时返回 503 + Retry-After。
+
+- upload：上传和导入（整个请求体读入内存，并发数最小）
+- download：书籍文件、封面、导出归档和静态文件
+- priority：阅读进度、词典查询等影响阅读体验的小请求，独立的名额，不会被上传和下载占满
+- events：SSE 变更推送的长连接（不排队，名额用完直接拒绝）
+- api：其他接口
+每个客户端（按 IP）在每个类别中还有单独的并发上限，避免一个客户端占满全部名额。
+
+设置环境变量 EPUB_ADMISSION=0 可关闭准入控制。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, Any
+
+
+ADMISSION_ENABLED = os.environ.get('EPUB_ADMISSION', '1') != '0'
+
+
+class RequestClass:
+    """一个请求类别的限制"""
+    
+    def __init__(self, name: str, limit: int, queue_size: int, wait_timeout: float,
+                 per_client: int, retry_after: int):
+        """
+        Args:
+            limit: 同时处理的最大请求数（可通过环境变量 EPUB_LIMIT_<类别> 调整）
+            queue_size: 最多排队等待的请求数
+            wait_timeout: 排队等待的最长时间（秒）
+            per_client: 单个客户端同时进行（含排队）的最大请求数
+            retry_after: 拒绝时建议客户端等待的秒数
+        """
+        self.name = name
+        self.limit = max(1, int(os.environ.get(f'EPUB_LIMIT_{name.upper()}', limit)))
+        self.queue_size = queue_size
+        self.wait_timeout = wait_timeout
+        self.per_client = per_client
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self.clients: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.max_wait = 0.0
+
+
+def classify(method: str, path: str) -> str:
+    """按请求方法和路径判断请求类别"""
+    if method == 'PUT':
+        return 'upload'
+    if method == 'POST':
+        if path in ('/api/upload', '/api/upload-cover', '/api/import') or path.startswith('/api/uploads'):
+            return 'upload'
+        if path == '/api/progress':
+            return 'priority'
+        return 'api'
+    
+    if path == '/api/events':
+        return 'events'
+    if path.startswith('/api/progress/') or path.startswith('/api/dict/') or \
+            (path.startswith('/api/book/') and path.endswith('/dictionary')):
+        return 'priority'
+    if not path.startswith('/api/') or path.startswith('/api/cover/') or \
+            path in ('/api/export', '/api/covers/sprite.jpg'):
+        return 'download'
+    if path.startswith('/api/book/'):
+        rest = path[len('/api/book/'):]
+        # /api/book/<id>（EPUB 文件）和 /api/book/<id>/file/<path>（书内文件）
+        if '/' not in rest or '/file/' in rest:
+            return 'download'
+    return 'api'
+
+
+class AdmissionController:
+    """请求准入控制器"""
+    
+    def __init__(self, enabled: bool = ADMISSION_ENABLED):
+        self.enabled = enabled
+        self.classes = {
+            'upload': RequestClass('upload', limit=2, queue_size=8, wait_timeout=30.0, per_client=2, retry_after=10),
+            'download': RequestClass('download', limit=16, queue_size=64, wait_timeout=10.0, per_client=8,
+                                     retry_after=2),
+            'priority': RequestClass('priority', limit=16, queue_size=64, wait_timeout=5.0, per_client=8,
+                                     retry_after=1),
+            'events': RequestClass('events', limit=256, queue_size=0, wait_timeout=0.0, per_client=16,
+                                   retry_after=5),
+            'api': RequestClass('api', limit=16, queue_size=64, wait_timeout=5.0, per_client=12, retry_after=1),
+        }
+        self._condition = threading.Condition()
+    
+    def acquire(self, request_class: RequestClass, client: str) -> bool:
+        """获取一个处理名额，返回 False 表示应拒绝（队列已满、等待超时或客户端并发过多）"""
+        with self._condition:
+            if request_class.clients.get(client, 0) >= request_class.per_client:
+                request_class.rejected += 1
+                return False
+            if request_class.active >= request_class.limit and request_class.waiting >= request_class.queue_size:
+                request_class.rejected += 1
+                return False
+            
+            request_class.clients[client] = request_class.clients.get(client, 0) + 1
+            start = time.monotonic()
+            deadline = start + request_class.wait_timeout
+            request_class.waiting += 1
+            try:
+                while request_class.active >= request_class.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._release_client(request_class, client)
+                        request_class.rejected += 1
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                request_class.waiting -= 1
+            
+            request_class.active += 1
+            request_class.admitted += 1
+            request_class.max_wait = max(request_class.max_wait, time.monotonic() - start)
+            return True
+    
+    def release(self, request_class: RequestClass, client: str) -> None:
+        with self._condition:
+            request_class.active -= 1
+            self._release_client(request_class, client)
+            self._condition.notify_all()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'enabled': self.enabled,
+                'classes': {
+                    name: {
+                        'limit': request_class.limit,
+                        'queueSize': request_class.queue_size,
+                        'perClient': request_class.per_client,
+                        'active': request_class.active,
+                        'waiting': request_class.waiting,
+                        'clients': len(request_class.clients),
+                        'admitted': request_class.admitted,
+                        'rejected': request_class.rejected,
+                        'maxWaitMs': round(request_class.max_wait * 1000, 1)
+                    }
+                    for name, request_class in self.classes.items()
+                }
+            }
+    
+    @staticmethod
+    def _release_client(request_class: RequestClass, client: str) -> None:
+        count = request_class.clients.get(client, 0) - 1
+        if count > 0:
+            request_class.clients[client] = count
+        else:
+            request_class.clients.pop(client, None)
+
+
+# 全局准入控制器实例
+admission_controller = AdmissionController()
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器实例"""
+    return admission_controller
+
+
+def send_overloaded(handler, request_class: RequestClass) -> None:
+    """返回 503，并关闭连接（不读取未处理的请求体）"""
+    body = json.dumps({
+        'success': False,
+        'error': 'Server busy',
+        'requestClass': request_class.name,
+        'retryAfter': request_class.retry_after
+    }).encode('utf-8')
+    handler.close_connection = True
+    handler.send_response(503)
+    handler.send_header('Content-type', 'application/json; charset=utf-8')
+    handler.send_header('Content-Length', str(len(body)))
+    handler.send_header('Retry-After', str(request_class.retry_after))
+    handler.send_header('Connection', 'close')
+    handler.end_headers()
+    if handler.command != 'HEAD':
+        handler.wfile.write(body)
+
+
+def admission_controlled(method):
+    """
+    请求处理方法装饰器（用于 do_GET/do_POST 等）
+    按请求类别获取处理名额，拿不到时直接返回 503
+    """
+    @functools.wraps(method)
+    def wrapper(handler, *args, **kwargs):
+        controller = admission_controller
+        if not controller.enabled:
+            return method(handler, *args, **kwargs)
+        
+        request_class = controller.classes[classify(handler.command, handler.path.split('?', 1)[0])]
+        client = handler.client_address[0]
+        if not controller.acquire(request_class, client):
+            print(f"⚠️ [Admission] 拒绝请求 ({request_class.name}): {handler.command} {handler.path} from {client}")
+            send_overloaded(handler, request_class)
+            return None
+        try:
+            return method(handler, *args, **kwargs)
+        finally:
+            controller.release(request_class, client)
+    return wrapper
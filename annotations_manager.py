@@ -2,10 +2,22 @@
 """
 注释数据管理模块
 负责管理EPUB阅读器的高亮、下划线、笔记等注释数据
+
+持久化采用"快照 + 追加日志"的方式：
+- annotations.json          快照文件（完整数据，原子写入）
+- annotations.json.journal  操作日志（JSONL，每次保存只追加新操作）
+日志增长到一定条目数后在后台线程中压缩进快照。
+
+内存中每本书的注释按 id -> 注释 的有序字典保存，并额外维护按类型的索引，
+查找、更新、删除均为 O(1)，按类型获取时不需要过滤整本书的注释。
+注释ID在同一本书中唯一：添加已存在ID的注释会替换原注释；
+快照中出现重复ID时（旧版本按列表保存）保留第一个，其余分配新ID并重写快照，不丢弃数据。
 """
 
 import json
 import os
+import tempfile
+import threading
 import time
 import uuid
 from typing import Dict, Any, Optional, List
@@ -15,79 +27,349 @@ from datetime import datetime, timezone
 class AnnotationManager:
     """注释数据管理器类 - 专门管理注释相关数据"""
     
-    def __init__(self, data_file: str = 'annotations.json'):
+    # 日志条目数达到该值后触发后台压缩
+    COMPACT_THRESHOLD = 1000
+    
+    def __init__(self, data_file: str = 'annotations.json', compact_threshold: Optional[int] = None):
         self.data_file = data_file
-        self.annotations: Dict[str, List[Dict[str, Any]]] = {}  # bookId -> annotations[]
+        self.journal_file = f"{data_file}.journal"
+        self.compact_threshold = compact_threshold or self.COMPACT_THRESHOLD
+        # bookId -> {annotationId: annotation}，字典保持插入顺序
+        self.annotations: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # bookId -> type -> {annotationId: annotation}
+        self._type_index: Dict[str, Dict[Optional[str], Dict[str, Dict[str, Any]]]] = {}
         self.version = "1.0"
+        
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()  # 保证同一时间只有一个压缩在进行
+        self._seq = 0                          # 最近一次分配的操作序号
+        self._snapshot_seq = 0                 # 快照中已包含的最大操作序号
+        self._journal_entries = 0              # 日志中尚未压缩的条目数
+        self._pending_ops: List[str] = []      # 尚未写入日志的操作（已序列化）
+        self._compact_thread: Optional[threading.Thread] = None
+        
         self._load_data()
     
     def _load_data(self) -> None:
-        """从文件加载注释数据"""
-        try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                self.version = data.get('version', '1.0')
-                self.annotations = data.get('annotations', {})
-                
-                # 统计加载的注释数量
-                total_annotations = sum(len(book_annotations) for book_annotations in self.annotations.values())
-                print(f"📝 [AnnotationManager] 从 {self.data_file} 加载了 {len(self.annotations)} 本书的注释")
-                print(f"📝 [AnnotationManager] 总共 {total_annotations} 个注释")
-                
-            else:
-                print(f"📝 [AnnotationManager] 注释文件 {self.data_file} 不存在，使用空数据")
+        """从快照加载注释数据，并回放日志中快照之后的操作"""
+        renamed = 0
+        with self._lock:
+            self._pending_ops = []
+            self._journal_entries = 0
+            try:
+                if os.path.exists(self.data_file):
+                    with open(self.data_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    
+                    self.version = data.get('version', '1.0')
+                    renamed = self._build_indexes(data.get('annotations', {}))
+                    self._snapshot_seq = data.get('journalSeq', 0)
+                    print(f"📝 [AnnotationManager] 从 {self.data_file} 加载了 {len(self.annotations)} 本书的注释")
+                else:
+                    print(f"📝 [AnnotationManager] 注释文件 {self.data_file} 不存在，使用空数据")
+                    self._initialize_empty_data()
+            
+            except Exception as e:
+                print(f"❌ [AnnotationManager] 加载注释数据失败: {e}")
                 self._initialize_empty_data()
-                
-        except Exception as e:
-            print(f"❌ [AnnotationManager] 加载注释数据失败: {e}")
-            self._initialize_empty_data()
+            
+            self._seq = self._snapshot_seq
+            replayed = self._replay_journal()
+            
+            # 统计加载的注释数量
+            total_annotations = sum(len(book_annotations) for book_annotations in self.annotations.values())
+            if replayed:
+                print(f"📝 [AnnotationManager] 从 {self.journal_file} 回放了 {replayed} 个操作")
+            print(f"📝 [AnnotationManager] 总共 {total_annotations} 个注释")
+        
+        if renamed:
+            # 新分配的ID写入快照，之后的操作（按新ID记录）重启后仍能对应
+            print(f"⚠️ [AnnotationManager] 快照中有 {renamed} 个重复ID的注释，已分配新ID")
+            self.compact()
     
     def _initialize_empty_data(self) -> None:
         """初始化空的注释数据"""
         self.annotations = {}
+        self._type_index = {}
         self.version = "1.0"
+        self._snapshot_seq = 0
+    
+    def _build_indexes(self, raw_annotations: Dict[str, List[Dict[str, Any]]]) -> int:
+        """由快照中的列表结构构建内存索引，返回因ID重复而重新分配ID的注释数"""
+        self.annotations = {}
+        self._type_index = {}
+        renamed = 0
+        for book_id, book_annotations in raw_annotations.items():
+            self.annotations[book_id] = {}
+            self._type_index[book_id] = {}
+            for annotation in book_annotations:
+                if 'id' not in annotation:
+                    annotation['id'] = self._generate_annotation_id()
+                elif annotation['id'] in self.annotations[book_id]:
+                    # 列表中按ID更新、删除时命中的是第一个，后面的重复项改用新ID
+                    new_id = self._generate_annotation_id()
+                    print(f"⚠️ [AnnotationManager] 重复的注释ID: {book_id} -> {annotation['id']}，改为 {new_id}")
+                    annotation['id'] = new_id
+                    renamed += 1
+                self._insert(book_id, annotation)
+        return renamed
+    
+    def _replay_journal(self) -> int:
+        """回放日志文件，返回实际应用的操作数"""
+        if not os.path.exists(self.journal_file):
+            return 0
+        
+        self._discard_torn_tail()
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时可能留下写了一半的最后一行，直接忽略
+                    print(f"⚠️ [AnnotationManager] 跳过损坏的日志行: {self.journal_file}:{line_no}")
+                    continue
+                
+                seq = entry.get('seq', 0)
+                self._seq = max(self._seq, seq)
+                self._journal_entries += 1
+                if seq <= self._snapshot_seq:
+                    # 已经包含在快照中（压缩后、截断日志前崩溃的情况）
+                    continue
+                
+                self._apply_op(entry)
+                replayed += 1
+        
+        return replayed
+    
+    def _discard_torn_tail(self) -> None:
+        """截掉日志末尾没有换行结尾的残缺记录，避免后续追加的操作与其拼接"""
+        with open(self.journal_file, 'rb+') as f:
+            content = f.read()
+            if not content or content.endswith(b'\n'):
+                return
+            keep = content.rfind(b'\n') + 1
+            f.truncate(keep)
+        print(f"⚠️ [AnnotationManager] 丢弃日志末尾的残缺记录: {len(content) - keep} 字节")
+    
+    def _apply_op(self, entry: Dict[str, Any]) -> None:
+        """把一条日志操作应用到内存数据"""
+        op = entry.get('op')
+        book_id = entry.get('bookId')
+        
+        if op == 'add':
+            self._insert(book_id, entry['annotation'])
+        elif op == 'update':
+            self._update(book_id, entry.get('id'), entry.get('updates', {}))
+        elif op == 'remove':
+            self._delete(book_id, entry.get('id'))
+        elif op == 'clear':
+            self._clear(book_id, entry.get('type'))
+        elif op == 'drop':
+            self._drop(book_id)
+        else:
+            print(f"⚠️ [AnnotationManager] 未知的日志操作: {op}")
+    
+    # 索引维护（调用方需持有锁）
+    def _insert(self, book_id: str, annotation: Dict[str, Any]) -> None:
+        """插入注释；同一本书中已存在相同ID时替换原注释"""
+        annotation_id = annotation['id']
+        book_annotations = self.annotations.setdefault(book_id, {})
+        previous = book_annotations.get(annotation_id)
+        if previous is not None:
+            self._unindex_type(book_id, annotation_id, previous.get('type'))
+        
+        book_annotations[annotation_id] = annotation
+        self._type_bucket(book_id, annotation.get('type'))[annotation_id] = annotation
+    
+    def _update(self, book_id: str, annotation_id: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """更新注释字段，类型变化时同步类型索引"""
+        annotation = self.annotations.get(book_id, {}).get(annotation_id)
+        if annotation is None:
+            return None
+        
+        old_type = annotation.get('type')
+        annotation.update(changes)
+        if annotation.get('type') != old_type:
+            self._unindex_type(book_id, annotation_id, old_type)
+            self._type_bucket(book_id, annotation.get('type'))[annotation_id] = annotation
+        return annotation
+    
+    def _delete(self, book_id: str, annotation_id: str) -> Optional[Dict[str, Any]]:
+        """删除注释，返回被删除的注释"""
+        annotation = self.annotations.get(book_id, {}).pop(annotation_id, None)
+        if annotation is not None:
+            self._unindex_type(book_id, annotation_id, annotation.get('type'))
+        return annotation
+    
+    def _clear(self, book_id: str, annotation_type: Optional[str] = None) -> int:
+        """清除书籍的全部或指定类型注释，返回清除数量"""
+        if annotation_type:
+            bucket = self._type_index.get(book_id, {}).pop(annotation_type, {})
+            book_annotations = self.annotations.get(book_id, {})
+            for annotation_id in bucket:
+                del book_annotations[annotation_id]
+            return len(bucket)
+        
+        removed_count = len(self.annotations.get(book_id, {}))
+        self.annotations[book_id] = {}
+        self._type_index[book_id] = {}
+        return removed_count
+    
+    def _drop(self, book_id: str) -> None:
+        """移除书籍的全部注释数据"""
+        self.annotations.pop(book_id, None)
+        self._type_index.pop(book_id, None)
+    
+    def _type_bucket(self, book_id: str, annotation_type: Optional[str]) -> Dict[str, Dict[str, Any]]:
+        """获取（必要时创建）某本书某类型的索引桶"""
+        return self._type_index.setdefault(book_id, {}).setdefault(annotation_type, {})
+    
+    def _unindex_type(self, book_id: str, annotation_id: str, annotation_type: Optional[str]) -> None:
+        """从类型索引中移除注释，桶为空时一并删除"""
+        book_types = self._type_index.get(book_id, {})
+        bucket = book_types.get(annotation_type)
+        if bucket is not None:
+            bucket.pop(annotation_id, None)
+            if not bucket:
+                del book_types[annotation_type]
+    
+    def _record_op(self, op: str, book_id: str, **fields: Any) -> None:
+        """记录一个待写入日志的操作（调用方需持有锁）"""
+        self._seq += 1
+        entry = {'seq': self._seq, 'op': op, 'bookId': book_id}
+        entry.update(fields)
+        # 立即序列化，避免之后对注释对象的原地修改影响日志内容
+        self._pending_ops.append(json.dumps(entry, ensure_ascii=False))
     
     def save_data(self) -> bool:
-        """保存注释数据到文件"""
+        """把自上次保存以来的操作追加到日志（与注释总数无关）"""
         try:
-            # 统计当前数据
-            total_annotations = sum(len(book_annotations) for book_annotations in self.annotations.values())
-            print(f"📝 [AnnotationManager] 准备保存 {len(self.annotations)} 本书的注释")
-            print(f"📝 [AnnotationManager] 总共 {total_annotations} 个注释")
-            
-            data = {
-                'version': self.version,
-                'lastModified': datetime.now(timezone.utc).isoformat(),
-                'annotations': self.annotations
-            }
+            with self._lock:
+                written = self._flush_pending()
+                need_compact = self._journal_entries >= self.compact_threshold
             
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            print(f"📝 [AnnotationManager] ✅ 已追加 {written} 个操作到 {self.journal_file}")
             
-            print(f"📝 [AnnotationManager] ✅ 注释数据已保存到 {self.data_file}")
+            if need_compact:
+                self.compact_async()
             return True
-            
+        
         except Exception as e:
             print(f"❌ [AnnotationManager] 保存注释数据失败: {e}")
             return False
     
+    def _flush_pending(self) -> int:
+        """把待写入的操作追加到日志并 fsync（调用方需持有锁）"""
+        pending = self._pending_ops
+        if not pending:
+            return 0
+        
+        with open(self.journal_file, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(pending) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self._journal_entries += len(pending)
+        self._pending_ops = []
+        return len(pending)
+    
+    def compact(self) -> bool:
+        """把当前数据压缩为新快照（临时文件 + 原子重命名），并截断日志"""
+        try:
+            with self._compact_lock:
+                with self._lock:
+                    # 先把未落盘的操作写入日志，保证快照序号之前的操作都已持久化
+                    self._flush_pending()
+                    snapshot_seq = self._seq
+                    data = {
+                        'version': self.version,
+                        'lastModified': datetime.now(timezone.utc).isoformat(),
+                        'journalSeq': snapshot_seq,
+                        'annotations': {
+                            book_id: list(book_annotations.values())
+                            for book_id, book_annotations in self.annotations.items()
+                        }
+                    }
+                    # 在锁内序列化，得到一致的数据视图
+                    content = json.dumps(data, ensure_ascii=False)
+                
+                # 写快照期间不持有数据锁，新操作照常追加到日志（序号大于 snapshot_seq）
+                self._atomic_write(self.data_file, content)
+                
+                with self._lock:
+                    self._snapshot_seq = snapshot_seq
+                    self._truncate_journal(snapshot_seq)
+            
+            print(f"📝 [AnnotationManager] ✅ 日志已压缩到快照 {self.data_file} (seq={snapshot_seq})")
+            return True
+        
+        except Exception as e:
+            print(f"❌ [AnnotationManager] 压缩注释日志失败: {e}")
+            return False
+    
+    def compact_async(self) -> None:
+        """在后台线程中压缩日志（已有压缩在进行时忽略）"""
+        with self._lock:
+            if self._compact_thread and self._compact_thread.is_alive():
+                return
+            self._compact_thread = threading.Thread(
+                target=self.compact, name='annotation-compactor', daemon=True
+            )
+            self._compact_thread.start()
+    
+    def _truncate_journal(self, snapshot_seq: int) -> None:
+        """只保留日志中序号大于 snapshot_seq 的条目（调用方需持有锁）"""
+        remaining = []
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        if json.loads(line).get('seq', 0) > snapshot_seq:
+                            remaining.append(line)
+                    except ValueError:
+                        continue
+        
+        self._atomic_write(self.journal_file, ''.join(line + '\n' for line in remaining))
+        self._journal_entries = len(remaining)
+    
+    @staticmethod
+    def _atomic_write(path: str, content: str) -> None:
+        """写入临时文件后重命名，保证文件要么是旧内容要么是完整的新内容"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
     def reload_data(self) -> None:
-        """重新加载注释数据"""
+        """重新加载注释数据（丢弃尚未保存的操作）"""
         print("🔄 [AnnotationManager] 重新加载注释数据...")
         self._load_data()
     
     # 注释CRUD操作
     def add_annotation(self, book_id: str, annotation_data: Dict[str, Any]) -> str:
-        """添加注释"""
+        """添加注释（同一本书中已存在相同ID的注释会被替换）"""
         # 确保必需字段存在
         if 'id' not in annotation_data:
             annotation_data['id'] = self._generate_annotation_id()
         
         if 'bookId' not in annotation_data:
             annotation_data['bookId'] = book_id
-            
+        
         if 'timestamp' not in annotation_data:
             annotation_data['timestamp'] = datetime.now(timezone.utc).isoformat()
         
@@ -98,30 +380,30 @@ class AnnotationManager:
                 raise ValueError(f"注释数据缺少必需字段: {field}")
         
         # 添加到对应书籍的注释列表
-        if book_id not in self.annotations:
-            self.annotations[book_id] = []
-        
-        self.annotations[book_id].append(annotation_data)
+        with self._lock:
+            replaced = annotation_data['id'] in self.annotations.get(book_id, {})
+            self._insert(book_id, annotation_data)
+            self._record_op('add', book_id, annotation=annotation_data)
         
-        print(f"📝 [AnnotationManager] 添加注释: {book_id} -> {annotation_data['type']} ({annotation_data['id']})")
+        if replaced:
+            print(f"📝 [AnnotationManager] 替换已存在的注释: {book_id} -> {annotation_data['type']} ({annotation_data['id']})")
+        else:
+            print(f"📝 [AnnotationManager] 添加注释: {book_id} -> {annotation_data['type']} ({annotation_data['id']})")
         return annotation_data['id']
     
     def get_annotation(self, book_id: str, annotation_id: str) -> Optional[Dict[str, Any]]:
         """获取指定注释"""
-        book_annotations = self.annotations.get(book_id, [])
-        for annotation in book_annotations:
-            if annotation.get('id') == annotation_id:
-                return annotation.copy()
-        return None
+        annotation = self.annotations.get(book_id, {}).get(annotation_id)
+        return annotation.copy() if annotation is not None else None
     
     def update_annotation(self, book_id: str, annotation_id: str, updates: Dict[str, Any]) -> bool:
         """更新注释"""
-        book_annotations = self.annotations.get(book_id, [])
-        for i, annotation in enumerate(book_annotations):
-            if annotation.get('id') == annotation_id:
-                # 更新字段
-                annotation.update(updates)
-                annotation['lastModified'] = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            # 更新字段
+            changes = dict(updates)
+            changes['lastModified'] = datetime.now(timezone.utc).isoformat()
+            if self._update(book_id, annotation_id, changes) is not None:
+                self._record_op('update', book_id, id=annotation_id, updates=changes)
                 
                 print(f"📝 [AnnotationManager] 更新注释: {book_id} -> {annotation_id}")
                 return True
@@ -131,17 +413,12 @@ class AnnotationManager:
     
     def remove_annotation(self, book_id: str, annotation_id: str) -> bool:
         """删除注释"""
-        book_annotations = self.annotations.get(book_id, [])
-        for i, annotation in enumerate(book_annotations):
-            if annotation.get('id') == annotation_id:
-                removed_annotation = book_annotations.pop(i)
+        with self._lock:
+            # 书籍没有注释后保留空字典，便于后续添加
+            removed_annotation = self._delete(book_id, annotation_id)
+            if removed_annotation is not None:
+                self._record_op('remove', book_id, id=annotation_id)
                 print(f"📝 [AnnotationManager] 删除注释: {book_id} -> {annotation_id} ({removed_annotation.get('type', 'unknown')})")
-                
-                # 如果书籍没有注释了，可以选择保留空列表或删除键
-                if not book_annotations:
-                    # 保留空列表，便于后续添加
-                    pass
-                
                 return True
         
         print(f"⚠️ [AnnotationManager] 未找到要删除的注释: {book_id} -> {annotation_id}")
@@ -149,50 +426,48 @@ class AnnotationManager:
     
     def get_book_annotations(self, book_id: str, annotation_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """获取指定书籍的注释"""
-        book_annotations = self.annotations.get(book_id, [])
-        
         if annotation_type:
-            # 过滤指定类型的注释
-            filtered_annotations = [ann for ann in book_annotations if ann.get('type') == annotation_type]
-            return [ann.copy() for ann in filtered_annotations]
+            # 直接读取类型索引，无需过滤整本书的注释
+            book_annotations = self._type_index.get(book_id, {}).get(annotation_type, {})
+        else:
+            book_annotations = self.annotations.get(book_id, {})
         
-        return [ann.copy() for ann in book_annotations]
+        return [ann.copy() for ann in book_annotations.values()]
     
     def get_all_annotations(self) -> Dict[str, List[Dict[str, Any]]]:
         """获取所有注释数据"""
-        return {book_id: [ann.copy() for ann in annotations] 
+        return {book_id: [ann.copy() for ann in annotations.values()] 
                 for book_id, annotations in self.annotations.items()}
     
     def clear_book_annotations(self, book_id: str, annotation_type: Optional[str] = None) -> int:
         """清除指定书籍的注释"""
-        if book_id not in self.annotations:
-            return 0
-        
-        if annotation_type:
-            # 只删除指定类型的注释
-            original_count = len(self.annotations[book_id])
-            self.annotations[book_id] = [
-                ann for ann in self.annotations[book_id] 
-                if ann.get('type') != annotation_type
-            ]
-            removed_count = original_count - len(self.annotations[book_id])
-            print(f"📝 [AnnotationManager] 清除书籍 {book_id} 的 {annotation_type} 注释: {removed_count} 个")
-            return removed_count
-        else:
-            # 删除所有注释
-            removed_count = len(self.annotations[book_id])
-            self.annotations[book_id] = []
-            print(f"📝 [AnnotationManager] 清除书籍 {book_id} 的所有注释: {removed_count} 个")
-            return removed_count
+        with self._lock:
+            if book_id not in self.annotations:
+                return 0
+            
+            if annotation_type:
+                # 只删除指定类型的注释
+                removed_count = self._clear(book_id, annotation_type)
+                self._record_op('clear', book_id, type=annotation_type)
+                print(f"📝 [AnnotationManager] 清除书籍 {book_id} 的 {annotation_type} 注释: {removed_count} 个")
+                return removed_count
+            else:
+                # 删除所有注释
+                removed_count = self._clear(book_id)
+                self._record_op('clear', book_id)
+                print(f"📝 [AnnotationManager] 清除书籍 {book_id} 的所有注释: {removed_count} 个")
+                return removed_count
     
     def remove_book_data(self, book_id: str) -> bool:
         """完全移除指定书籍的注释数据"""
-        if book_id in self.annotations:
-            removed_count = len(self.annotations[book_id])
-            del self.annotations[book_id]
-            print(f"📝 [AnnotationManager] 移除书籍 {book_id} 的所有注释数据: {removed_count} 个")
-            return True
-        return False
+        with self._lock:
+            if book_id in self.annotations:
+                removed_count = len(self.annotations[book_id])
+                self._drop(book_id)
+                self._record_op('drop', book_id)
+                print(f"📝 [AnnotationManager] 移除书籍 {book_id} 的所有注释数据: {removed_count} 个")
+                return True
+            return False
     
     # 导入导出功能
     def export_book_annotations(self, book_id: str) -> Dict[str, Any]:
@@ -212,32 +487,32 @@ class AnnotationManager:
         try:
             imported_annotations = import_data.get('annotations', [])
             
-            if not merge:
-                # 覆盖模式：清除现有注释
-                self.annotations[book_id] = []
-            
-            # 导入注释
-            imported_count = 0
-            for annotation in imported_annotations:
-                # 确保注释有有效的ID
-                if 'id' not in annotation:
-                    annotation['id'] = self._generate_annotation_id()
-                
-                # 更新bookId
-                annotation['bookId'] = book_id
+            with self._lock:
+                if not merge:
+                    # 覆盖模式：清除现有注释
+                    self._clear(book_id)
+                    self._record_op('clear', book_id)
                 
-                # 添加导入时间戳
-                annotation['importedAt'] = datetime.now(timezone.utc).isoformat()
-                
-                if book_id not in self.annotations:
-                    self.annotations[book_id] = []
-                
-                self.annotations[book_id].append(annotation)
-                imported_count += 1
+                # 导入注释
+                imported_count = 0
+                for annotation in imported_annotations:
+                    # 确保注释有有效的ID
+                    if 'id' not in annotation:
+                        annotation['id'] = self._generate_annotation_id()
+                    
+                    # 更新bookId
+                    annotation['bookId'] = book_id
+                    
+                    # 添加导入时间戳
+                    annotation['importedAt'] = datetime.now(timezone.utc).isoformat()
+                    
+                    self._insert(book_id, annotation)
+                    self._record_op('add', book_id, annotation=annotation)
+                    imported_count += 1
             
             print(f"📝 [AnnotationManager] 导入书籍 {book_id} 的注释: {imported_count} 个")
             return True
-            
+        
         except Exception as e:
             print(f"❌ [AnnotationManager] 导入注释失败: {e}")
             return False
@@ -260,10 +535,10 @@ class AnnotationManager:
             book_counts[book_id] = book_count
             total_annotations += book_count
             
-            # 统计类型
-            for annotation in book_annotations:
-                annotation_type = annotation.get('type', 'unknown')
-                type_counts[annotation_type] = type_counts.get(annotation_type, 0) + 1
+            # 统计类型（直接使用类型索引的桶大小）
+            for annotation_type, bucket in self._type_index.get(book_id, {}).items():
+                annotation_type = annotation_type or 'unknown'
+                type_counts[annotation_type] = type_counts.get(annotation_type, 0) + len(bucket)
         
         return {
             'totalAnnotations': total_annotations,
@@ -278,11 +553,11 @@ class AnnotationManager:
         issues = []
         
         for book_id, book_annotations in self.annotations.items():
-            if not isinstance(book_annotations, list):
-                issues.append(f"书籍 {book_id} 的注释数据不是列表类型")
+            if not isinstance(book_annotations, dict):
+                issues.append(f"书籍 {book_id} 的注释数据不是字典类型")
                 continue
             
-            for i, annotation in enumerate(book_annotations):
+            for i, annotation in enumerate(book_annotations.values()):
                 # 检查必需字段
                 required_fields = ['id', 'type', 'cfiRange']
                 for field in required_fields:
@@ -302,44 +577,49 @@ class AnnotationManager:
         return f"AnnotationManager(books={stats['booksWithAnnotations']}, annotations={stats['totalAnnotations']})"
 
 
-# 全局注释管理器实例
-annotation_manager = AnnotationManager()
+# 全局注释管理器实例（首次使用时创建，导入模块时不读取注释文件）
+annotation_manager = None
+_annotation_manager_lock = threading.Lock()
 
 
 def get_annotation_manager() -> AnnotationManager:
     """获取全局注释管理器实例"""
+    global annotation_manager
+    with _annotation_manager_lock:
+        if annotation_manager is None:
+            annotation_manager = AnnotationManager()
     return annotation_manager
 
 
 # 便捷函数
 def save_annotations_data() -> bool:
     """保存注释数据"""
-    return annotation_manager.save_data()
+    return get_annotation_manager().save_data()
 
 
 def load_annotations_data() -> None:
     """加载注释数据"""
-    annotation_manager.reload_data()
+    get_annotation_manager().reload_data()
 
 
 def get_book_annotations(book_id: str, annotation_type: Optional[str] = None) -> List[Dict[str, Any]]:
     """获取书籍注释"""
-    return annotation_manager.get_book_annotations(book_id, annotation_type)
+    return get_annotation_manager().get_book_annotations(book_id, annotation_type)
 
 
 def add_annotation(book_id: str, annotation_data: Dict[str, Any]) -> str:
     """添加注释"""
-    return annotation_manager.add_annotation(book_id, annotation_data)
+    return get_annotation_manager().add_annotation(book_id, annotation_data)
 
 
 def remove_annotation(book_id: str, annotation_id: str) -> bool:
     """删除注释"""
-    return annotation_manager.remove_annotation(book_id, annotation_id)
+    return get_annotation_manager().remove_annotation(book_id, annotation_id)
 
 
 def get_annotations_stats() -> Dict[str, Any]:
     """获取注释统计"""
-    return annotation_manager.get_stats()
+    return get_annotation_manager().get_stats()
 
 
 if __name__ == "__main__":
@@ -8,6 +8,7 @@ console.log('📚 书架页面 JavaScript 已加载');
 // 全局变量
 let importedBooks = [];
 let recentBooks = [];
+let coverSprites = new Map(); // bookId -> 封面拼图中对应格子的背景样式
 
 // 初始化书架
 async function initBookshelf() {
@@ -179,6 +180,9 @@ async function handleFileImport(event) {
         
         const response = await fetch('/api/upload', {
             method: 'POST',
+            headers: {
+                'Accept': 'application/x-ndjson'
+            },
             body: formData
         });
         
@@ -186,9 +190,14 @@ async function handleFileImport(event) {
             throw new Error(`上传失败: ${response.status} ${response.statusText}`);
         }
         
-        const result = await response.json();
+        // 服务端每处理完一本书返回一行进度
+        const result = await readUploadProgress(response);
         console.log('📚 后端响应:', result);
         
+        result.failed.forEach(item => {
+            showMessage(`上传 ${item.filename} 失败: ${item.error}`, 'error');
+        });
+        
         if (result.success) {
             // 显示成功消息
             showMessage(`成功添加 ${result.books.length} 本书籍到书架`, 'success');
@@ -214,6 +223,52 @@ async function handleFileImport(event) {
     }
 }
 
+// 读取上传接口的 NDJSON 进度流，更新加载提示，返回汇总结果
+async function readUploadProgress(response) {
+    const loadingText = document.querySelector('#loadingOverlay p');
+    const originalText = loadingText ? loadingText.textContent : '';
+    const result = { success: false, books: [], failed: [] };
+    
+    const handleEvent = (event) => {
+        if (event.event === 'book') {
+            if (event.success) {
+                result.books.push({ id: event.id, title: event.title, filename: event.filename });
+            } else {
+                result.failed.push({ filename: event.filename, error: event.error });
+            }
+            if (loadingText) {
+                loadingText.textContent = `正在上传 ${event.completed}/${event.total}: ${event.title || event.filename}`;
+            }
+        }
+    };
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    try {
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+        }
+        if (buffer.trim()) {
+            handleEvent(JSON.parse(buffer));
+        }
+    } finally {
+        if (loadingText) {
+            loadingText.textContent = originalText;
+        }
+    }
+    
+    result.success = result.books.length > 0;
+    return result;
+}
+
 // 生成书籍ID
 function generateBookId() {
     return 'book_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9);
@@ -359,9 +414,7 @@ function createImportedBookCard(book) {
     const language = getLanguageDisplay(book.metadata?.language);
 
     // 检查是否有封面
-    const coverContent = book.metadata?.coverUrl
-        ? `<img src="${book.metadata.coverUrl}" alt="封面" />`
-        : '<div class="book-cover-placeholder">📖</div>';
+    const coverContent = renderCoverContent(book, '<div class="book-cover-placeholder">📖</div>');
 
     bookCard.innerHTML = `
         <div class="book-cover">
@@ -385,6 +438,18 @@ function createImportedBookCard(book) {
     return bookCard;
 }
 
+// 封面内容：优先使用封面拼图中的格子，其次单独的封面图片
+function renderCoverContent(book, placeholder) {
+    const spriteStyle = coverSprites.get(book.id);
+    if (spriteStyle) {
+        return `<div class="book-cover-sprite" role="img" aria-label="封面" style="${spriteStyle}"></div>`;
+    }
+    if (book.metadata?.coverUrl) {
+        return `<img src="${book.metadata.coverUrl}" alt="封面" />`;
+    }
+    return placeholder;
+}
+
 // 获取语言显示文本
 function getLanguageDisplay(languageCode) {
     const languageMap = {
@@ -466,9 +531,7 @@ function renderRecentBooks() {
                 displayTitle = importedBook.metadata?.title || importedBook.name;
                 displayAuthor = importedBook.metadata?.creator || '未知作者';
                 
-                if (importedBook.metadata?.coverUrl) {
-                    coverContent = `<img src="${importedBook.metadata.coverUrl}" alt="封面" />`;
-                }
+                coverContent = renderCoverContent(importedBook, coverContent);
             }
         }
 
@@ -538,6 +601,9 @@ async function loadBooksFromServer() {
             
             console.log(`📚 从服务器加载了 ${importedBooks.length} 本书籍`);
             
+            // 整页封面拼成一张图，代替逐本请求封面
+            await loadCoverSprites();
+            
             // 如果服务器没有书籍，清理本地存储的无效数据
             if (importedBooks.length === 0) {
                 console.log('📚 服务器无书籍数据，清理本地存储...');
@@ -568,6 +634,39 @@ async function loadBooksFromServer() {
     }
 }
 
+// 加载书架封面拼图（顺序与 /api/books 一致，每页一张图）
+async function loadCoverSprites() {
+    const pageSize = 100;
+    const sprites = new Map();
+    try {
+        for (let offset = 0; offset < importedBooks.length; offset += pageSize) {
+            const response = await fetch(`/api/covers/sprite?offset=${offset}&limit=${pageSize}`);
+            if (!response.ok) {
+                throw new Error(`服务器响应错误: ${response.status}`);
+            }
+            
+            const sprite = await response.json();
+            if (!sprite.success || !sprite.available) {
+                console.log('📚 服务器未提供封面拼图，逐本加载封面');
+                break;
+            }
+            
+            // 格子大小一致，用百分比定位，封面框缩放时同样适用
+            for (const [bookId, cell] of Object.entries(sprite.cells)) {
+                const x = sprite.columns > 1 ? cell.column / (sprite.columns - 1) * 100 : 0;
+                const y = sprite.rows > 1 ? cell.row / (sprite.rows - 1) * 100 : 0;
+                sprites.set(bookId, `background-image: url('${sprite.image}'); ` +
+                    `background-size: ${sprite.columns * 100}% ${sprite.rows * 100}%; ` +
+                    `background-position: ${x}% ${y}%;`);
+            }
+        }
+        console.log(`📚 封面拼图已加载: ${sprites.size} 个封面`);
+    } catch (error) {
+        console.warn('📚 封面拼图加载失败，逐本加载封面:', error);
+    }
+    coverSprites = sprites;
+}
+
 // 从本地存储加载书籍（降级方案）
 function loadBooksFromLocalStorage() {
     try {
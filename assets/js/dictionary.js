@@ -44,6 +44,10 @@ let currentHighlightAnnotationId = null;
 // 高亮追踪器 - 用于防止重复高亮
 const highlightTracker = new Set();
 
+// 章节词典预取缓存：spine序号 -> { kind, words: Map(词 -> 词条), entries }
+const chapterDictionaryCache = new Map();
+const CHAPTER_DICTIONARY_CACHE_LIMIT = 5;
+
 /**
  * 从Selection对象中获取文本，过滤掉振假名（ruby标签中的rt内容）
  * @param {Selection} selection - 浏览器Selection对象
@@ -741,6 +745,9 @@ function bindEpubSelectionEvents() {
             console.log('🔍 新页面渲染完成:', section.index, section.href);
             console.log('🔍 视图对象:', view);
 
+            // 预取本章的词典数据，章节内查询不再逐词请求
+            prefetchChapterDictionary(section.index);
+
             // 确保新页面也能触发选择事件
             // epub.js的selected事件应该是全局的，但我们可以添加额外的调试
             if (view && view.document) {
@@ -1151,29 +1158,29 @@ function showNotification(message) {
     }, 2000);
 }
 
-// 根据语言选择API端点
+// 根据语言选择API端点（经由服务端代理 /api/dict，代理负责缓存并转发到远程词典API）
 function getApiEndpoint(language, word) {
     const lang = language ? language.toLowerCase() : 'ja';
     
     console.log('🌐 选择API端点，语言:', lang);
     
     if (lang === 'ja' || lang === 'jp' || lang === 'japanese' || lang.startsWith('ja-')) {
-        const url = `https://language.3049589.xyz/api/japanese/${encodeURIComponent(word)}?definition`;
+        const url = `/api/dict/ja/${encodeURIComponent(word)}`;
         console.log('🇯🇵 使用日语API:', url);
         return { url, type: 'japanese' };
     } else if (lang === 'en' || lang === 'english' || lang.startsWith('en-')) {
-        const url = `https://language.3049589.xyz/api/stardict/${encodeURIComponent(word)}`;
+        const url = `/api/dict/en/${encodeURIComponent(word)}`;
         console.log('🇺🇸 使用英语API:', url);
         return { url, type: 'english' };
     } else if (lang === 'zh' || lang === 'chinese' || lang.startsWith('zh-')) {
         // 中文暂时使用英语API作为备选
-        const url = `https://language.3049589.xyz/api/stardict/${encodeURIComponent(word)}`;
+        const url = `/api/dict/en/${encodeURIComponent(word)}`;
         console.log('🇨🇳 中文使用英语API作为备选:', url);
         return { url, type: 'english' };
     }
     
     // 默认使用日语API
-    const url = `https://language.3049589.xyz/api/japanese/${encodeURIComponent(word)}?definition`;
+    const url = `/api/dict/ja/${encodeURIComponent(word)}`;
     console.log('🌍 默认使用日语API:', url);
     return { url, type: 'japanese' };
 }
@@ -1187,7 +1194,16 @@ async function fetchEnglishDictionary(apiUrl, word) {
         const data = await response.json();
         
         console.log('📚 英语API响应:', data);
-        
+        return parseEnglishDictionaryData(data, word);
+    } catch (error) {
+        console.error('❌ 英语词典查询失败:', error);
+        return null;
+    }
+}
+
+// 把英语词典API响应转换为面板显示的结果
+function parseEnglishDictionaryData(data, word) {
+    try {
         if (data && data.word) {
             // 根据你提供的API响应格式处理
             const result = {
@@ -1228,7 +1244,16 @@ async function fetchJapaneseDictionary(apiUrl, word) {
         const data = await response.json();
         
         console.log('📚 日语API响应:', data);
-        
+        return parseJapaneseDictionaryData(data, word);
+    } catch (error) {
+        console.error('❌ 日语词典查询失败:', error);
+        return null;
+    }
+}
+
+// 把日语词典API响应转换为面板显示的结果
+function parseJapaneseDictionaryData(data, word) {
+    try {
         if (data.success && data.found && data.data) {
             const entry = data.data;
             console.log('📚 处理日语API数据:', entry);
@@ -1294,6 +1319,15 @@ async function fetchOnlineDictionary(word) {
         // 根据语言选择API端点
         const apiInfo = getApiEndpoint(currentLanguage, word);
         
+        // 优先使用本章预取的词典数据
+        const prefetched = findPrefetchedEntry(word);
+        if (prefetched) {
+            console.log('📚 使用章节预取的词典数据:', word);
+            return apiInfo.type === 'english'
+                ? parseEnglishDictionaryData(prefetched, word)
+                : parseJapaneseDictionaryData(prefetched, word);
+        }
+        
         // 根据API类型调用相应的处理函数
         if (apiInfo.type === 'english') {
             return await fetchEnglishDictionary(apiInfo.url, word);
@@ -1306,6 +1340,63 @@ async function fetchOnlineDictionary(word) {
     }
 }
 
+// 预取章节词典数据（每章只请求一次）
+async function prefetchChapterDictionary(spineIndex) {
+    const bookId = window.currentBookId;
+    if (!bookId || spineIndex === undefined || chapterDictionaryCache.has(spineIndex)) {
+        return;
+    }
+
+    // 先占位，避免同一章节重复请求
+    chapterDictionaryCache.set(spineIndex, null);
+    try {
+        const language = window.getCurrentBookLanguage ? window.getCurrentBookLanguage() : 'ja';
+        const response = await fetch(`/api/book/${encodeURIComponent(bookId)}/dictionary?spine=${spineIndex}&lang=${encodeURIComponent(language || 'ja')}`);
+        if (!response.ok) {
+            console.log('📚 章节词典预取失败，状态:', response.status);
+            chapterDictionaryCache.delete(spineIndex);
+            return;
+        }
+
+        const result = await response.json();
+        chapterDictionaryCache.set(spineIndex, {
+            kind: result.kind,
+            words: new Map(Object.entries(result.words)),
+            entries: result.entries
+        });
+        console.log(`📚 章节词典预取完成: #${spineIndex}, ${result.stats.resolved} 个词`);
+
+        // 只保留最近几个章节
+        while (chapterDictionaryCache.size > CHAPTER_DICTIONARY_CACHE_LIMIT) {
+            chapterDictionaryCache.delete(chapterDictionaryCache.keys().next().value);
+        }
+    } catch (error) {
+        console.error('📚 章节词典预取出错:', error);
+        chapterDictionaryCache.delete(spineIndex);
+    }
+}
+
+// 在预取缓存中查找单词（日语按最长前缀匹配，与服务端查询一致）
+function findPrefetchedEntry(word) {
+    for (const chapter of chapterDictionaryCache.values()) {
+        if (!chapter) {
+            continue;
+        }
+        const candidates = chapter.kind === 'english' ? [word, word.toLowerCase()] : [];
+        if (chapter.kind !== 'english') {
+            for (let length = word.length; length > 0; length--) {
+                candidates.push(word.slice(0, length));
+            }
+        }
+        for (const candidate of candidates) {
+            if (chapter.words.has(candidate)) {
+                return chapter.entries[chapter.words.get(candidate)];
+            }
+        }
+    }
+    return null;
+}
+
 // 清空搜索
 function clearSearch() {
     const input = document.getElementById('dictSearchInput');
@@ -235,13 +235,42 @@ async function loadLocationsFromLocal(book) {
             return true;
         } else {
             console.log('📍 [Locations] 本地存储中没有locations数据');
-            return false;
+            return await loadLocationsFromServer(book, bookId);
         }
     } catch (error) {
         console.error('📍 [Locations] ❌ 从本地加载失败:', error);
         return false;
     }
 }
+
+// 从服务端读取上传时预生成的locations，避免在浏览器中逐章解析
+async function loadLocationsFromServer(book, bookId) {
+    try {
+        const response = await fetch(`/api/book/${encodeURIComponent(bookId)}/locations?chars=1024`);
+        if (response.status !== 200) {
+            console.log('📍 [Locations] 服务端暂无locations数据，状态:', response.status);
+            return false;
+        }
+
+        const result = await response.json();
+        if (!result.success || !Array.isArray(result.locations)) {
+            return false;
+        }
+
+        book.locations._locations = result.locations;
+        book.locations.total = result.total;
+
+        console.log('📍 [Locations] ✅ 从服务端加载成功');
+        console.log('📍 [Locations] 位置点数量:', result.total);
+
+        // 缓存到本地，下次直接读取
+        await saveLocationsToLocal(book);
+        return true;
+    } catch (error) {
+        console.error('📍 [Locations] ❌ 从服务端加载失败:', error);
+        return false;
+    }
+}
 let importedUrl = null;
 let currentPage = 0;  // 当前页面索引
 let totalPages = 0;   // 总页数
@@ -640,20 +669,51 @@ async function initReader(file = null) {
 async function loadTOC() {
     try {
         const navigation = await book.loaded.navigation;
-        const tocContainer = document.getElementById('toc');
-
-        navigation.toc.forEach((chapter, index) => {
-            const tocItem = document.createElement('div');
-            tocItem.className = 'toc-item';
-            tocItem.textContent = chapter.label;
-            tocItem.onclick = () => goToChapter(chapter.href);
-            tocContainer.appendChild(tocItem);
-        });
+        renderTOC(navigation.toc);
     } catch (error) {
         console.error('加载目录失败:', error);
     }
 }
 
+// 渲染目录（会替换已显示的目录）
+function renderTOC(toc) {
+    const tocContainer = document.getElementById('toc');
+    if (!tocContainer) {
+        return;
+    }
+    tocContainer.innerHTML = '';
+
+    toc.forEach((chapter, index) => {
+        const tocItem = document.createElement('div');
+        tocItem.className = 'toc-item';
+        tocItem.textContent = chapter.label;
+        tocItem.onclick = () => goToChapter(chapter.href);
+        tocContainer.appendChild(tocItem);
+    });
+}
+
+// 从服务端获取书籍结构，在EPUB下载完成前先显示目录
+async function loadStructureFromServer(bookId) {
+    try {
+        const response = await fetch(`/api/book/${encodeURIComponent(bookId)}/structure`);
+        if (!response.ok) {
+            console.log('🗂️ 书籍结构不可用，状态:', response.status);
+            return null;
+        }
+
+        const structure = await response.json();
+        // 书籍已经加载完成时以epub.js解析的目录为准
+        if (!book && structure.toc.length > 0) {
+            renderTOC(structure.toc);
+            console.log('🗂️ 已根据服务端结构显示目录:', structure.toc.length, '项');
+        }
+        return structure;
+    } catch (error) {
+        console.warn('🗂️ 获取书籍结构失败:', error);
+        return null;
+    }
+}
+
 // 显示EPUB元数据信息并更新侧边栏
 function showEpubMetadata() {
     console.log('📚 showEpubMetadata 被调用');
@@ -1795,8 +1855,11 @@ async function loadBookFromAPI(bookId) {
         console.log('📚 设置当前书籍ID:', currentBookId);
         console.log('🌐 全局书籍ID已设置:', window.currentBookId);
         
-        // 构建API URL
-        const apiUrl = `/api/book/${encodeURIComponent(bookId)}`;
+        // 与EPUB下载并行获取书籍结构，先显示目录
+        loadStructureFromServer(bookId);
+
+        // 构建API URL（优先使用服务端的优化版本，尚未生成时服务端返回原文件）
+        const apiUrl = `/api/book/${encodeURIComponent(bookId)}?variant=optimized`;
         console.log('📚 请求URL:', apiUrl);
 
         // 获取EPUB文件
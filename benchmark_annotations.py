@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+注释查找微基准
+对比 AnnotationManager 的索引结构（按 id、按类型）与线性扫描列表的查找、更新、过滤、删除耗时，
+只测内存结构，不读写注释文件
+
+python3 benchmark_annotations.py [注释数量]
+"""
+
+import random
+import sys
+import time
+from typing import Dict
+
+from annotations_manager import AnnotationManager
+
+
+def benchmark_lookups(count: int = 100_000, rounds: int = 1000) -> Dict[str, float]:
+    """
+    注释查找微基准：对比索引结构与线性扫描列表
+    
+    Args:
+        count: 单本书的注释数量
+        rounds: 每项操作的执行次数
+    
+    Returns:
+        各操作平均耗时（微秒），键名带 indexed_/linear_ 前缀
+    """
+    types = ['highlight', 'underline', 'note', 'mark']
+    book_id = 'bench_book'
+    annotations = [
+        {'id': f'annotation_{i}', 'bookId': book_id, 'type': types[i % 4], 'cfiRange': f'epubcfi(/6/{i})'}
+        for i in range(count)
+    ]
+    
+    # 不读写真实文件，只测内存结构
+    manager = AnnotationManager.__new__(AnnotationManager)
+    manager.annotations = {}
+    manager._type_index = {}
+    for annotation in annotations:
+        manager._insert(book_id, dict(annotation))
+    linear = [dict(annotation) for annotation in annotations]
+    
+    sample_ids = [f'annotation_{random.randrange(count)}' for _ in range(rounds)]
+    results: Dict[str, float] = {}
+    
+    def timed(name: str, func, args_list) -> None:
+        start = time.perf_counter()
+        for args in args_list:
+            func(*args)
+        results[name] = (time.perf_counter() - start) / len(args_list) * 1e6
+    
+    def linear_get(annotation_id):
+        for annotation in linear:
+            if annotation.get('id') == annotation_id:
+                return annotation.copy()
+        return None
+    
+    def linear_update(annotation_id):
+        for annotation in linear:
+            if annotation.get('id') == annotation_id:
+                annotation.update({'color': 'red'})
+                return True
+        return False
+    
+    def linear_remove(annotation_id):
+        for i, annotation in enumerate(linear):
+            if annotation.get('id') == annotation_id:
+                linear.pop(i)
+                return True
+        return False
+    
+    # 线性扫描代价高，基线只跑少量轮次
+    linear_ids = sample_ids[:max(1, rounds // 20)]
+    
+    timed('indexed_get', lambda i: manager.get_annotation(book_id, i), [(i,) for i in sample_ids])
+    timed('linear_get', linear_get, [(i,) for i in linear_ids])
+    timed('indexed_update', lambda i: manager._update(book_id, i, {'color': 'red'}), [(i,) for i in sample_ids])
+    timed('linear_update', linear_update, [(i,) for i in linear_ids])
+    timed('indexed_type_filter', lambda: manager.get_book_annotations(book_id, 'note'), [()] * len(linear_ids))
+    timed('linear_type_filter', lambda: [a.copy() for a in linear if a.get('type') == 'note'], [()] * len(linear_ids))
+    timed('indexed_remove', lambda i: manager._delete(book_id, i), [(i,) for i in sample_ids])
+    timed('linear_remove', linear_remove, [(i,) for i in linear_ids])
+    
+    return results
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"📝 注释查找微基准（单本书 {count:,} 个注释，单位: 微秒/次）")
+    for name, micros in benchmark_lookups(count).items():
+        print(f"   {name:<22} {micros:>12.2f}")
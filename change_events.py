@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+数据变更推送模块（Server-Sent Events）
+SQLiteDataManager 在阅读进度、注释写入提交后发布变更事件，/api/events 以 SSE 推送给订阅的客户端，
+多设备同时阅读时不需要轮询。
+
+- 事件保存在内存环形缓冲区中，事件 ID 为 "<启动时间>-<序号>"
+- 客户端断线重连时带上 Last-Event-ID，从断点继续推送；断点已不在缓冲区中（或服务已重启）时
+  推送 reset 事件，客户端应重新获取完整数据
+- 只订阅一本书时，跳过其他书籍的事件后发送只有 id 的消息，断点随整个事件流前进
+- 没有事件时定期发送注释行保持连接，单个连接持续 STREAM_DURATION 秒后结束，由客户端自动重连
+"""
+
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Dict, Any, Iterator, List, Optional
+
+
+# 内存中保留的最近事件数
+MAX_EVENTS = 1024
+
+# 心跳间隔、单个连接的最长持续时间（秒），以及建议客户端重连的间隔（毫秒）
+HEARTBEAT_INTERVAL = 15
+STREAM_DURATION = 300
+RETRY_MS = 3000
+
+
+ChangeEvent = namedtuple('ChangeEvent', ['seq', 'event', 'book_id', 'data', 'timestamp'])
+
+
+class ChangeEventBus:
+    """变更事件的发布和订阅"""
+    
+    def __init__(self, max_events: int = MAX_EVENTS):
+        # 服务重启后序号从头开始，用启动时间区分
+        self.epoch = str(int(time.time() * 1000))
+        self._events: 'deque[ChangeEvent]' = deque(maxlen=max_events)
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._subscribers = 0
+        self._published = 0
+    
+    def publish(self, event: str, book_id: str, data: Dict[str, Any]) -> str:
+        """发布事件，返回事件 ID"""
+        with self._condition:
+            self._seq += 1
+            self._events.append(ChangeEvent(self._seq, event, book_id, data, int(time.time() * 1000)))
+            self._published += 1
+            self._condition.notify_all()
+            return self._event_id(self._seq)
+    
+    def stream(self, last_event_id: Optional[str] = None, book_id: Optional[str] = None,
+               duration: float = STREAM_DURATION, heartbeat: float = HEARTBEAT_INTERVAL) -> Iterator[bytes]:
+        """
+        生成 SSE 数据
+        
+        Args:
+            last_event_id: 客户端收到的最后一个事件 ID（Last-Event-ID），为空时只推送之后的新事件
+            book_id: 只推送该书籍的事件，为空时推送整个书库的事件
+        """
+        with self._condition:
+            self._subscribers += 1
+        try:
+            yield f'retry: {RETRY_MS}\n\n'.encode('utf-8')
+            seq = self._resume_position(last_event_id)
+            if seq is None:
+                seq = self._current_seq()
+                yield self._format_reset(seq)
+            
+            deadline = time.monotonic() + duration
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                events = self._wait_for(seq, min(heartbeat, remaining))
+                if events is None:
+                    # 断点之后的事件已被挤出缓冲区
+                    seq = self._current_seq()
+                    yield self._format_reset(seq)
+                    continue
+                if not events:
+                    yield b': ping\n\n'
+                    continue
+                skipped = False
+                for event in events:
+                    seq = event.seq
+                    skipped = bool(book_id) and event.book_id != book_id
+                    if not skipped:
+                        yield self._format(event)
+                if skipped:
+                    # 其他书籍的事件不推送，但断点要前进，否则重连时断点可能已被挤出缓冲区而收到 reset
+                    yield self._format_position(seq)
+        finally:
+            with self._condition:
+                self._subscribers -= 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'epoch': self.epoch,
+                'lastEventId': self._event_id(self._seq),
+                'buffered': len(self._events),
+                'published': self._published,
+                'subscribers': self._subscribers
+            }
+    
+    def _event_id(self, seq: int) -> str:
+        return f'{self.epoch}-{seq}'
+    
+    def _current_seq(self) -> int:
+        with self._condition:
+            return self._seq
+    
+    def _resume_position(self, last_event_id: Optional[str]) -> Optional[int]:
+        """Last-Event-ID 对应的序号；无法从断点继续时返回 None"""
+        if not last_event_id:
+            return self._current_seq()
+        epoch, _, seq_text = last_event_id.partition('-')
+        if epoch != self.epoch or not seq_text.isdigit():
+            return None
+        seq = int(seq_text)
+        with self._condition:
+            if seq > self._seq:
+                return None
+            if seq < self._seq and (not self._events or self._events[0].seq > seq + 1):
+                return None
+        return seq
+    
+    def _wait_for(self, seq: int, timeout: float) -> Optional[List[ChangeEvent]]:
+        """等待序号大于 seq 的事件；超时返回空列表，事件已不在缓冲区中返回 None"""
+        with self._condition:
+            if self._seq <= seq:
+                self._condition.wait(timeout)
+            if self._seq <= seq:
+                return []
+            if self._events[0].seq > seq + 1:
+                return None
+            return [event for event in self._events if event.seq > seq]
+    
+    def _format(self, event: ChangeEvent) -> bytes:
+        data = json.dumps({'bookId': event.book_id, 'timestamp': event.timestamp, **event.data},
+                          ensure_ascii=False)
+        return f'id: {self._event_id(event.seq)}\nevent: {event.event}\ndata: {data}\n\n'.encode('utf-8')
+    
+    def _format_position(self, seq: int) -> bytes:
+        # 只有 id 没有 data 的消息不会触发客户端事件，只更新 Last-Event-ID
+        return f'id: {self._event_id(seq)}\n\n'.encode('utf-8')
+    
+    def _format_reset(self, seq: int) -> bytes:
+        return f'id: {self._event_id(seq)}\nevent: reset\ndata: {{}}\n\n'.encode('utf-8')
+
+
+# 全局变更事件总线实例
+change_event_bus = ChangeEventBus()
+
+
+def get_change_event_bus() -> ChangeEventBus:
+    """获取全局变更事件总线实例"""
+    return change_event_bus
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+章节纯文本缓存模块
+按"EPUB 内容哈希 + spine 序号"缓存每个章节提取并规范化后的纯文本（zlib 压缩存入 SQLite）
+
+- 读取时缺失的章节当场提取（惰性），上传后也可在后台线程中提取整本书
+- 搜索索引、词典预取、摘录生成等服务端功能共用同一份文本
+- 书籍删除时（remove_book）清除对应的缓存
+"""
+
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List
+
+from epub_locations import get_locations_index
+from epub_parser import EpubBook, extract_text
+
+
+# 一次请求最多返回的章节数
+MAX_RANGE = 50
+
+_SPACES_RE = re.compile(r'[ \t\r\f\v 　]+')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+
+def normalize_text(text: str) -> str:
+    """规范化章节文本：NFC、行内空白合并为一个空格、去掉行首尾空白、最多保留一个空行"""
+    text = unicodedata.normalize('NFC', text)
+    lines = [_SPACES_RE.sub(' ', line).strip() for line in text.split('\n')]
+    return _BLANK_LINES_RE.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def extract_chapter(book: EpubBook, spine_index: int) -> str:
+    """提取一个章节的规范化纯文本（块级元素之间换行）"""
+    root = book.load_document(book.spine[spine_index])
+    body = root.find('body')
+    return normalize_text(extract_text(body if body is not None else root, '\n'))
+
+
+class ChapterTextCache:
+    """章节纯文本缓存"""
+    
+    def __init__(self, db_file: str = 'chapter_text.db'):
+        self.db_file = db_file
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._hits = 0
+        self._misses = 0
+        self._init_database()
+    
+    @contextmanager
+    def _get_connection(self):
+        """获取数据库连接，退出时提交并关闭"""
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _init_database(self) -> None:
+        with self._get_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chapter_text (
+                    content_hash TEXT NOT NULL,
+                    spine_index INTEGER NOT NULL,
+                    href TEXT,
+                    chars INTEGER NOT NULL,
+                    text BLOB NOT NULL,
+                    PRIMARY KEY (content_hash, spine_index)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS chapter_text_books (
+                    content_hash TEXT PRIMARY KEY,
+                    spine_count INTEGER NOT NULL,
+                    complete INTEGER DEFAULT 0,
+                    updated_at INTEGER
+                )
+            ''')
+    
+    def content_hash(self, file_path: str) -> str:
+        """与位置索引共用的内容哈希（按大小和修改时间记忆）"""
+        return get_locations_index().content_hash(file_path)
+    
+    def get_range(self, file_path: str, start: int, end: int) -> Dict[str, Any]:
+        """
+        获取 [start, end) 范围内章节的纯文本，缺失的章节当场提取并写入缓存
+        
+        Raises:
+            EpubParseError: EPUB 无法解析
+            IndexError: 范围超出 spine
+        """
+        content_hash = self.content_hash(file_path)
+        cached = self._read(content_hash, start, end)
+        spine_count = self._spine_count(content_hash)
+        
+        missing = [index for index in range(start, end) if index not in cached]
+        if missing or spine_count is None:
+            with EpubBook(file_path) as book:
+                spine_count = len(book.spine)
+                if not 0 <= start < end <= spine_count:
+                    raise IndexError(f"spine 范围超出: [{start}, {end}) / {spine_count}")
+                extracted = [
+                    (index, book.spine[index].get('href'), extract_chapter(book, index))
+                    for index in missing
+                ]
+            self._store(content_hash, spine_count, extracted)
+            for index, href, text in extracted:
+                cached[index] = {'index': index, 'href': href, 'chars': len(text), 'text': text}
+        elif not 0 <= start < end <= spine_count:
+            raise IndexError(f"spine 范围超出: [{start}, {end}) / {spine_count}")
+        
+        with self._lock:
+            self._hits += len(range(start, end)) - len(missing)
+            self._misses += len(missing)
+        
+        return {
+            'contentHash': content_hash,
+            'spineCount': spine_count,
+            'chapters': [cached[index] for index in range(start, end)]
+        }
+    
+    def get_chapter(self, file_path: str, spine_index: int) -> str:
+        """获取单个章节的纯文本"""
+        return self.get_range(file_path, spine_index, spine_index + 1)['chapters'][0]['text']
+    
+    def build(self, file_path: str) -> int:
+        """提取整本书所有尚未缓存的章节，返回新提取的章节数"""
+        content_hash = self.content_hash(file_path)
+        start = time.time()
+        with self._get_connection() as conn:
+            row = conn.execute('SELECT complete FROM chapter_text_books WHERE content_hash = ?',
+                               (content_hash,)).fetchone()
+            if row and row['complete']:
+                return 0
+            existing = {r['spine_index'] for r in conn.execute(
+                'SELECT spine_index FROM chapter_text WHERE content_hash = ?', (content_hash,))}
+        
+        with EpubBook(file_path) as book:
+            extracted = [
+                (index, item.get('href'), extract_chapter(book, index))
+                for index, item in enumerate(book.spine) if index not in existing
+            ]
+            spine_count = len(book.spine)
+        self._store(content_hash, spine_count, extracted, complete=True)
+        print(f"📝 [ChapterText] 提取章节文本: {file_path} ({len(extracted)} 章, {time.time() - start:.2f}s)")
+        return len(extracted)
+    
+    def remove(self, file_path: str) -> None:
+        """删除书籍对应的章节文本缓存"""
+        if not os.path.exists(file_path):
+            return
+        content_hash = self.content_hash(file_path)
+        with self._get_connection() as conn:
+            conn.execute('DELETE FROM chapter_text WHERE content_hash = ?', (content_hash,))
+            conn.execute('DELETE FROM chapter_text_books WHERE content_hash = ?', (content_hash,))
+    
+    def schedule(self, file_path: str) -> None:
+        """把书籍加入后台提取队列（重复提交会被忽略）"""
+        with self._lock:
+            if file_path in self._pending:
+                return
+            self._pending.add(file_path)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='chapter-text', daemon=True)
+                self._worker.start()
+        self._queue.put(file_path)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._get_connection() as conn:
+            row = conn.execute('''
+                SELECT COUNT(*) AS chapters, COUNT(DISTINCT content_hash) AS books,
+                       COALESCE(SUM(chars), 0) AS chars, COALESCE(SUM(LENGTH(text)), 0) AS stored_bytes
+                FROM chapter_text
+            ''').fetchone()
+        with self._lock:
+            hits, misses, pending = self._hits, self._misses, len(self._pending)
+        return {
+            'books': row['books'],
+            'chapters': row['chapters'],
+            'chars': row['chars'],
+            'storedBytes': row['stored_bytes'],
+            'hits': hits,
+            'misses': misses,
+            'pending': pending
+        }
+    
+    def _read(self, content_hash: str, start: int, end: int) -> Dict[int, Dict[str, Any]]:
+        with self._get_connection() as conn:
+            rows = conn.execute('''
+                SELECT spine_index, href, chars, text FROM chapter_text
+                WHERE content_hash = ? AND spine_index >= ? AND spine_index < ?
+            ''', (content_hash, start, end)).fetchall()
+        return {
+            row['spine_index']: {
+                'index': row['spine_index'],
+                'href': row['href'],
+                'chars': row['chars'],
+                'text': zlib.decompress(row['text']).decode('utf-8')
+            }
+            for row in rows
+        }
+    
+    def _spine_count(self, content_hash: str) -> Optional[int]:
+        with self._get_connection() as conn:
+            row = conn.execute('SELECT spine_count FROM chapter_text_books WHERE content_hash = ?',
+                               (content_hash,)).fetchone()
+        return row['spine_count'] if row else None
+    
+    def _store(self, content_hash: str, spine_count: int, chapters: List[tuple], complete: bool = False) -> None:
+        with self._get_connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO chapter_text (content_hash, spine_index, href, chars, text)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (content_hash, index, href, len(text), zlib.compress(text.encode('utf-8'), 6))
+                for index, href, text in chapters
+            ])
+            conn.execute('''
+                INSERT INTO chapter_text_books (content_hash, spine_count, complete, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (content_hash) DO UPDATE SET
+                    spine_count = excluded.spine_count,
+                    complete = MAX(complete, excluded.complete),
+                    updated_at = excluded.updated_at
+            ''', (content_hash, spine_count, 1 if complete else 0, int(time.time() * 1000)))
+    
+    def _run(self) -> None:
+        while True:
+            file_path = self._queue.get()
+            try:
+                if os.path.exists(file_path):
+                    self.build(file_path)
+            except Exception as e:
+                print(f"❌ [ChapterText] 提取章节文本失败: {file_path} ({e})")
+            finally:
+                with self._lock:
+                    self._pending.discard(file_path)
+                self._queue.task_done()
+
+
+# 全局章节文本缓存实例
+chapter_text_cache = None
+
+
+def get_chapter_text_cache() -> ChapterTextCache:
+    """获取全局章节文本缓存实例"""
+    global chapter_text_cache
+    if chapter_text_cache is None:
+        chapter_text_cache = ChapterTextCache()
+    return chapter_text_cache
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+书架封面拼图模块
+把 /api/books 中一页书籍的封面缩成统一大小的缩略图，拼成一张 JPEG（sprite），
+书架用一次 JSON 请求和一次图片请求即可显示整页封面，不再逐本请求 /api/cover/<id>。
+
+- 需要 Pillow；未安装时接口返回 available=false，书架退回逐本请求封面
+- 缩略图按封面文件（大小、修改时间）缓存，封面变化时只重新生成变化的那一张，再重新拼合该页
+- 拼图版本号由该页所有封面的签名计算，版本号相同的图片可以长期缓存
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    ImageOps = None
+    PIL_AVAILABLE = False
+
+
+# 缩略图大小（书架封面为 3:4，按 2 倍像素生成）
+THUMB_WIDTH = 120
+THUMB_HEIGHT = 160
+
+# 拼图每行的缩略图数
+COLUMNS = 10
+
+# 每页书籍数
+SPRITE_PAGE_SIZE = 100
+MAX_SPRITE_PAGE_SIZE = 200
+
+JPEG_QUALITY = 82
+
+# 内存中缓存的拼图数和缩略图数
+MAX_CACHED_SPRITES = 32
+MAX_CACHED_THUMBNAILS = 4096
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class CoverSprite:
+    """一页封面拼图"""
+    
+    __slots__ = ('version', 'image', 'cells', 'columns', 'rows')
+    
+    def __init__(self, version: str, image: bytes, cells: Dict[str, Dict[str, int]], columns: int, rows: int):
+        self.version = version
+        self.image = image
+        self.cells = cells
+        self.columns = columns
+        self.rows = rows
+    
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'columns': self.columns,
+            'rows': self.rows,
+            'cellWidth': THUMB_WIDTH,
+            'cellHeight': THUMB_HEIGHT,
+            'cells': self.cells
+        }
+
+
+class CoverSpriteBuilder:
+    """封面拼图生成器（缩略图和拼图都按签名缓存）"""
+    
+    def __init__(self, max_sprites: int = MAX_CACHED_SPRITES, max_thumbnails: int = MAX_CACHED_THUMBNAILS):
+        self.max_sprites = max_sprites
+        self.max_thumbnails = max_thumbnails
+        self._sprites: 'OrderedDict[str, CoverSprite]' = OrderedDict()
+        self._thumbnails: 'OrderedDict[str, Tuple[Tuple[int, int], bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._thumbnail_builds = 0
+        self._sprite_builds = 0
+        self._hits = 0
+    
+    @property
+    def available(self) -> bool:
+        return PIL_AVAILABLE
+    
+    def get_sprite(self, books: List[Tuple[str, Optional[str]]]) -> CoverSprite:
+        """
+        获取一页书籍的封面拼图
+        
+        Args:
+            books: [(book_id, 封面路径)]，按书架顺序；没有封面的书籍不占格子
+        """
+        covers = []
+        for book_id, cover_path in books:
+            signature = _file_signature(cover_path) if cover_path else None
+            if signature:
+                covers.append((book_id, cover_path, signature))
+        version = hashlib.sha1(repr([(book_id, path, signature) for book_id, path, signature in covers])
+                               .encode('utf-8')).hexdigest()[:16]
+        
+        with self._lock:
+            sprite = self._sprites.get(version)
+            if sprite is not None:
+                self._sprites.move_to_end(version)
+                self._hits += 1
+                return sprite
+        
+        # 同一时间只生成一张拼图，并发的相同请求等待后直接使用结果
+        with self._build_lock:
+            with self._lock:
+                sprite = self._sprites.get(version)
+                if sprite is not None:
+                    return sprite
+            sprite = self._build(version, covers)
+            with self._lock:
+                self._sprites[version] = sprite
+                while len(self._sprites) > self.max_sprites:
+                    self._sprites.popitem(last=False)
+                self._sprite_builds += 1
+        return sprite
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'available': PIL_AVAILABLE,
+                'sprites': len(self._sprites),
+                'thumbnails': len(self._thumbnails),
+                'spriteBuilds': self._sprite_builds,
+                'thumbnailBuilds': self._thumbnail_builds,
+                'hits': self._hits
+            }
+    
+    def _build(self, version: str, covers: List[tuple]) -> CoverSprite:
+        thumbnails = []
+        for book_id, cover_path, signature in covers:
+            try:
+                thumbnails.append((book_id, self._thumbnail(cover_path, signature)))
+            except Exception as e:
+                print(f"⚠️ [CoverSprite] 封面无法解码，跳过: {cover_path} ({e})")
+        
+        columns = max(1, min(COLUMNS, len(thumbnails)))
+        rows = max(1, (len(thumbnails) + columns - 1) // columns)
+        sheet = Image.new('RGB', (columns * THUMB_WIDTH, rows * THUMB_HEIGHT), (255, 255, 255))
+        cells = {}
+        for index, (book_id, data) in enumerate(thumbnails):
+            column, row = index % columns, index // columns
+            with Image.open(io.BytesIO(data)) as thumbnail:
+                sheet.paste(thumbnail, (column * THUMB_WIDTH, row * THUMB_HEIGHT))
+            cells[book_id] = {'index': index, 'column': column, 'row': row}
+        
+        output = io.BytesIO()
+        sheet.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+        return CoverSprite(version, output.getvalue(), cells, columns, rows)
+    
+    def _thumbnail(self, cover_path: str, signature: Tuple[int, int]) -> bytes:
+        """封面缩略图（JPEG），封面文件未变化时直接使用缓存"""
+        with self._lock:
+            cached = self._thumbnails.get(cover_path)
+            if cached and cached[0] == signature:
+                self._thumbnails.move_to_end(cover_path)
+                return cached[1]
+        
+        with Image.open(cover_path) as image:
+            # JPEG 在解码时直接缩小，避免完整解码大尺寸封面
+            image.draft('RGB', (THUMB_WIDTH * 2, THUMB_HEIGHT * 2))
+            thumbnail = ImageOps.fit(image.convert('RGB'), (THUMB_WIDTH, THUMB_HEIGHT), Image.LANCZOS)
+        output = io.BytesIO()
+        thumbnail.save(output, 'JPEG', quality=90)
+        data = output.getvalue()
+        
+        with self._lock:
+            self._thumbnails[cover_path] = (signature, data)
+            self._thumbnails.move_to_end(cover_path)
+            while len(self._thumbnails) > self.max_thumbnails:
+                self._thumbnails.popitem(last=False)
+            self._thumbnail_builds += 1
+        return data
+
+
+# 全局封面拼图生成器实例
+cover_sprite_builder = CoverSpriteBuilder()
+
+
+def get_cover_sprite_builder() -> CoverSpriteBuilder:
+    """获取全局封面拼图生成器实例"""
+    return cover_sprite_builder
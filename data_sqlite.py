@@ -7,19 +7,33 @@ SQLite数据管理模块
 import sqlite3
 import json
 import os
+import threading
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable
 import uuid
 from datetime import datetime
 
-from models import DatabaseSchema, BookModel, ReadingProgressModel, AnnotationModel
+from models import DatabaseSchema, BookModel, ReadingProgressModel, AnnotationModel, HotQueries
+from records import BookRecord, ProgressRecord, AnnotationRecord, select_columns
+from chapter_text import get_chapter_text_cache
 
 
 class SQLiteDataManager:
     """SQLite数据管理器类 - 统一管理所有应用数据"""
     
+    # 有版本号的数据表（写入后版本号加一，响应缓存据此失效）
+    GENERATION_TABLES = ('books', 'reading_progress', 'annotations')
+    
+    # 书籍文件锁的分段数
+    BOOK_LOCK_STRIPES = 64
+    
     def __init__(self, db_file: str = 'books_data.db'):
         self.db_file = db_file
+        self._generations = dict.fromkeys(self.GENERATION_TABLES, 0)
+        self._generation_lock = threading.Lock()
+        self._change_listeners: List[Callable[[str, str, Dict[str, Any]], None]] = []
+        # 书籍文件锁（按 book_id 分段），上传写入文件到登记书籍、后台检查并删除文件两个过程互斥
+        self._book_locks = [threading.Lock() for _ in range(self.BOOK_LOCK_STRIPES)]
         self._init_database()
         print(f"📚 [SQLiteDataManager] 初始化完成，数据库文件: {self.db_file}")
     
@@ -33,6 +47,41 @@ class SQLiteDataManager:
         conn.row_factory = sqlite3.Row  # 使结果可以通过列名访问
         return conn
     
+    def get_generation(self, *tables: str) -> tuple:
+        """读取数据表的版本号（应在查询数据之前读取）"""
+        with self._generation_lock:
+            return tuple(self._generations[table] for table in tables)
+    
+    def bump_generation(self, *tables: str) -> None:
+        """数据表写入提交后调用，使依赖这些表的缓存失效；不传参数时所有表都失效"""
+        with self._generation_lock:
+            for table in tables or self.GENERATION_TABLES:
+                if table in self._generations:
+                    self._generations[table] += 1
+    
+    def book_lock(self, book_id: str) -> threading.Lock:
+        """书籍文件的锁（同一本书总是同一把锁）"""
+        return self._book_locks[hash(book_id) % len(self._book_locks)]
+    
+    def add_change_listener(self, listener: Callable[[str, str, Dict[str, Any]], None]) -> None:
+        """注册变更监听器 listener(事件, book_id, 数据)，阅读进度和注释写入提交后调用"""
+        self._change_listeners.append(listener)
+    
+    def _emit_change(self, event: str, book_id: str, data: Dict[str, Any]) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(event, book_id, data)
+            except Exception as e:
+                print(f"❌ [SQLiteDataManager] 变更通知失败: {event} ({e})")
+    
+    def _fetch_records(self, record_type, sql: str, params: tuple = ()) -> list:
+        """执行查询并把每行直接构造为记录（不经过 sqlite3.Row），列顺序须与记录字段一致"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(sql, params)
+            return list(map(record_type._make, cursor))
+    
     # 书籍管理方法
     def add_book(self, book_id: str, book_info: Dict[str, Any], file_path: str) -> None:
         """添加书籍"""
@@ -68,11 +117,17 @@ class SQLiteDataManager:
                 book_info.get('fontSize')
             ))
             conn.commit()
+        self.bump_generation('books')
         
         print(f"📚 [SQLiteDataManager] 添加书籍: {book_id}")
     
-    def remove_book(self, book_id: str) -> bool:
-        """移除书籍（包括实际文件和相关数据）"""
+    def remove_book(self, book_id: str, remove_files: bool = True) -> bool:
+        """
+        移除书籍（包括实际文件和相关数据）
+        
+        Args:
+            remove_files: 为 False 时只删除数据库记录，文件由调用方稍后用 remove_book_files 清理
+        """
         removed = False
         
         # 获取要删除的书籍信息
@@ -81,9 +136,35 @@ class SQLiteDataManager:
             print(f"❌ [SQLiteDataManager] 书籍不存在: {book_id}")
             return False
         
-        # 删除EPUB文件
-        file_path = book_info.get('file_path')
+        if remove_files:
+            removed = self.remove_book_files(book_info.get('file_path'), book_info.get('cover_path'))
+        
+        # 删除数据库记录（包括关联的进度和注释）
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM books WHERE book_id = ?', (book_id,))
+            cursor.execute(HotQueries.DELETE_READING_EVENTS, (book_id,))
+            cursor.execute(HotQueries.DELETE_DAILY_STATS, (book_id,))
+            cursor.execute('DELETE FROM reading_book_stats WHERE book_id = ?', (book_id,))
+            conn.commit()
+            removed = True
+        self.bump_generation('books', 'reading_progress', 'annotations')
+        
+        if removed:
+            print(f"📚 [SQLiteDataManager] 完全移除书籍: {book_id}")
+        return removed
+    
+    @staticmethod
+    def remove_book_files(file_path: Optional[str], cover_path: Optional[str]) -> bool:
+        """删除书籍文件、章节文本缓存、封面和解压目录（可重复执行），返回是否删除了书籍文件"""
+        removed = False
+        
+        # 删除EPUB文件（先清除按文件内容哈希缓存的章节文本）
         if file_path and os.path.exists(file_path):
+            try:
+                get_chapter_text_cache().remove(file_path)
+            except Exception as e:
+                print(f"❌ [SQLiteDataManager] 清除章节文本缓存失败: {e}")
             try:
                 os.remove(file_path)
                 print(f"🗑️ [SQLiteDataManager] 删除书籍文件: {file_path}")
@@ -92,7 +173,6 @@ class SQLiteDataManager:
                 print(f"❌ [SQLiteDataManager] 删除书籍文件失败: {e}")
         
         # 删除封面文件
-        cover_path = book_info.get('cover_path')
         if cover_path and os.path.exists(cover_path):
             try:
                 os.remove(cover_path)
@@ -112,22 +192,13 @@ class SQLiteDataManager:
                 except Exception as e:
                     print(f"❌ [SQLiteDataManager] 删除解压目录失败: {e}")
         
-        # 删除数据库记录（包括关联的进度和注释）
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM books WHERE book_id = ?', (book_id,))
-            conn.commit()
-            removed = True
-        
-        if removed:
-            print(f"📚 [SQLiteDataManager] 完全移除书籍: {book_id}")
         return removed
     
     def get_book(self, book_id: str) -> Optional[Dict[str, Any]]:
         """获取书籍信息"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM books WHERE book_id = ?', (book_id,))
+            cursor.execute(HotQueries.BOOK, (book_id,))
             row = cursor.fetchone()
             
             if row:
@@ -157,33 +228,13 @@ class SQLiteDataManager:
             row = cursor.fetchone()
             return row['file_path'] if row else None
     
+    def get_book_records(self) -> List[BookRecord]:
+        """获取所有书籍记录（元组记录，不逐行构造字典）"""
+        return self._fetch_records(BookRecord, f'SELECT {select_columns(BookRecord)} FROM books')
+    
     def get_all_books(self) -> Dict[str, Any]:
         """获取所有书籍"""
-        books = {}
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM books')
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                book_id = row['book_id']
-                books[book_id] = {
-                    'title': row['title'],
-                    'author': row['author'],
-                    'filename': row['filename'],
-                    'addedDate': str(row['added_date']),
-                    'language': row['language'],
-                    'fileSize': row['file_size'],
-                    'publisher': row['publisher'],
-                    'description': row['description'],
-                    'identifier': row['identifier'],
-                    'coverPath': row['cover_path'],
-                    'fontFamily': row['font_family'],
-                    'fontMode': row['font_mode'],
-                    'fontSize': row['font_size']
-                }
-        
-        return books
+        return {record.book_id: record.to_dict() for record in self.get_book_records()}
     
     def get_book_files(self) -> Dict[str, str]:
         """获取书籍文件映射"""
@@ -198,6 +249,23 @@ class SQLiteDataManager:
         
         return book_files
     
+    def clear_missing_cover(self, book_id: str, cover_path: str) -> bool:
+        """封面文件已不存在时清除书籍的封面记录（书籍列表随之更新），返回是否清除"""
+        if not cover_path or os.path.exists(cover_path):
+            return False
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE books SET cover_path = NULL, updated_at = CURRENT_TIMESTAMP
+                WHERE book_id = ? AND cover_path = ?
+            ''', (book_id, cover_path))
+            conn.commit()
+        if cursor.rowcount == 0:
+            return False
+        self.bump_generation('books')
+        print(f"⚠️  [SQLiteDataManager] 封面文件不存在，清除封面记录: {book_id} ({cover_path})")
+        return True
+    
     # 字体设置管理方法
     _NOT_PROVIDED = object()  # 哨兵值，区分"未传"和"传了None"
     
@@ -230,6 +298,7 @@ class SQLiteDataManager:
             
             if cursor.rowcount > 0:
                 conn.commit()
+                self.bump_generation('books')
                 print(f"🔤 [SQLiteDataManager] 更新书籍字体设置: {book_id}")
                 print(f"🔤 [SQLiteDataManager] 字体: {font_family if font_family is not self._NOT_PROVIDED else '(未变)'}, "
                       f"模式: {font_mode if font_mode is not self._NOT_PROVIDED else '(未变)'}, "
@@ -243,7 +312,7 @@ class SQLiteDataManager:
         """获取书籍字体设置（包括字体族和字体大小）"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT font_family, font_mode, font_size FROM books WHERE book_id = ?', (book_id,))
+            cursor.execute(HotQueries.BOOK_FONT, (book_id,))
             row = cursor.fetchone()
             
             if row:
@@ -261,7 +330,7 @@ class SQLiteDataManager:
         
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM reading_progress WHERE book_id = ?', (book_id,))
+            cursor.execute(HotQueries.PROGRESS, (book_id,))
             row = cursor.fetchone()
             
             if row:
@@ -282,20 +351,23 @@ class SQLiteDataManager:
         print(f"📖 [SQLiteDataManager] set_progress被调用，设置: '{book_id}'")
         print(f"📖 [SQLiteDataManager] 进度数据: {progress_data}")
         
+        record = ProgressRecord(
+            book_id,
+            progress_data.get('cfi', ''),
+            progress_data.get('percentage', 0.0),
+            progress_data.get('chapterTitle', ''),
+            progress_data.get('timestamp', int(time.time() * 1000))
+        )
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT OR REPLACE INTO reading_progress (
                     book_id, cfi, percentage, chapter_title, timestamp, updated_at
                 ) VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (
-                book_id,
-                progress_data.get('cfi', ''),
-                progress_data.get('percentage', 0.0),
-                progress_data.get('chapterTitle', ''),
-                progress_data.get('timestamp', int(time.time() * 1000))
-            ))
+            ''', record)
             conn.commit()
+        self.bump_generation('reading_progress')
+        self._emit_change('progress', book_id, {'progress': record.to_dict()})
         
         percentage = progress_data.get('percentage', 0) * 100
         print(f"📖 [SQLiteDataManager] ✅ 设置进度: '{book_id}' -> {percentage:.1f}%")
@@ -308,34 +380,164 @@ class SQLiteDataManager:
             
             if cursor.rowcount > 0:
                 conn.commit()
+                self.bump_generation('reading_progress')
+                self._emit_change('progress-removed', book_id, {})
                 print(f"📖 [SQLiteDataManager] 移除进度: {book_id}")
                 return True
             return False
     
+    def get_progress_records(self) -> List[ProgressRecord]:
+        """获取所有阅读进度记录"""
+        return self._fetch_records(ProgressRecord, f'SELECT {select_columns(ProgressRecord)} FROM reading_progress')
+    
     def get_all_progress(self) -> Dict[str, Any]:
         """获取所有阅读进度"""
-        progress = {}
+        return {record.book_id: record.to_dict() for record in self.get_progress_records()}
+    
+    # 阅读历史和统计方法
+    def add_reading_events(self, events: List[Dict[str, Any]]) -> None:
+        """
+        批量写入阅读事件，并在同一事务中累加按天、按书的汇总
+        
+        Args:
+            events: 事件列表，每个事件包含 bookId、timestamp、cfi、percentage、chapterTitle，
+                    以及已计算好的增量 durationMs、pages、percentageDelta、newSession
+        """
+        if not events:
+            return
+        
+        # 先在内存中合并同一天/同一本书的增量，每个汇总行只写一次
+        daily: Dict[tuple, List] = {}
+        per_book: Dict[str, List] = {}
+        for event in events:
+            book_id = event['bookId']
+            day = time.strftime('%Y-%m-%d', time.localtime(event['timestamp'] / 1000))
+            row = daily.setdefault((day, book_id), [0, 0, 0.0, 0])
+            row[0] += event['durationMs']
+            row[1] += event['pages']
+            row[2] += event['percentageDelta']
+            row[3] += 1
+            
+            totals = per_book.setdefault(book_id, [0, 0, 0.0, 0, 0, event['timestamp'], event['timestamp']])
+            totals[0] += event['durationMs']
+            totals[1] += event['pages']
+            totals[2] += event['percentageDelta']
+            totals[3] += 1
+            totals[4] += 1 if event['newSession'] else 0
+            totals[5] = min(totals[5], event['timestamp'])
+            totals[6] = max(totals[6], event['timestamp'])
+        
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM reading_progress')
-            rows = cursor.fetchall()
+            cursor.executemany('''
+                INSERT INTO reading_events (
+                    book_id, timestamp, cfi, percentage, chapter_title,
+                    duration_ms, pages, percentage_delta
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(
+                event['bookId'], event['timestamp'], event.get('cfi', ''),
+                event.get('percentage', 0.0), event.get('chapterTitle', ''),
+                event['durationMs'], event['pages'], event['percentageDelta']
+            ) for event in events])
             
-            for row in rows:
-                book_id = row['book_id']
-                progress[book_id] = {
-                    'cfi': row['cfi'],
-                    'percentage': row['percentage'],
-                    'chapterTitle': row['chapter_title'],
-                    'timestamp': row['timestamp']
-                }
+            cursor.executemany('''
+                INSERT INTO reading_daily_stats (day, book_id, duration_ms, pages, percentage_gained, events)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (day, book_id) DO UPDATE SET
+                    duration_ms = duration_ms + excluded.duration_ms,
+                    pages = pages + excluded.pages,
+                    percentage_gained = percentage_gained + excluded.percentage_gained,
+                    events = events + excluded.events
+            ''', [(day, book_id, *row) for (day, book_id), row in daily.items()])
+            
+            cursor.executemany('''
+                INSERT INTO reading_book_stats (
+                    book_id, duration_ms, pages, percentage_gained, events, sessions, first_read, last_read
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (book_id) DO UPDATE SET
+                    duration_ms = duration_ms + excluded.duration_ms,
+                    pages = pages + excluded.pages,
+                    percentage_gained = percentage_gained + excluded.percentage_gained,
+                    events = events + excluded.events,
+                    sessions = sessions + excluded.sessions,
+                    first_read = MIN(first_read, excluded.first_read),
+                    last_read = MAX(last_read, excluded.last_read)
+            ''', [(book_id, *totals) for book_id, totals in per_book.items()])
+            conn.commit()
+    
+    def get_last_reading_event(self, book_id: str) -> Optional[Dict[str, Any]]:
+        """获取某本书最近一次阅读事件"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(HotQueries.LAST_READING_EVENT, (book_id,))
+            row = cursor.fetchone()
+            if row:
+                return {'timestamp': row['timestamp'], 'cfi': row['cfi'], 'percentage': row['percentage']}
+            return None
+    
+    def get_reading_stats(self, days: int = 30, book_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        读取阅读统计（只查询汇总表，不扫描事件表）
+        
+        Args:
+            days: 返回最近多少天的每日统计
+            book_id: 只统计指定书籍（可选）
+        """
+        since = time.strftime('%Y-%m-%d', time.localtime(time.time() - (days - 1) * 86400))
+        book_params = (book_id,) if book_id else ()
         
-        return progress
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(HotQueries.BOOK_DAILY_STATS if book_id else HotQueries.DAILY_STATS,
+                           (since, *book_params))
+            daily = [{
+                'day': row['day'],
+                'durationMs': row['duration_ms'],
+                'pages': row['pages'],
+                'percentageGained': row['percentage_gained'],
+                'books': row['books']
+            } for row in cursor.fetchall()]
+            
+            cursor.execute(HotQueries.SINGLE_BOOK_STATS if book_id else HotQueries.BOOK_STATS, book_params)
+            books = [{
+                'bookId': row['book_id'],
+                'title': row['title'],
+                'durationMs': row['duration_ms'],
+                'pages': row['pages'],
+                'percentageGained': row['percentage_gained'],
+                'sessions': row['sessions'],
+                'firstRead': row['first_read'],
+                'lastRead': row['last_read']
+            } for row in cursor.fetchall()]
+        
+        totals = {
+            'durationMs': sum(book['durationMs'] for book in books),
+            'pages': sum(book['pages'] for book in books),
+            'sessions': sum(book['sessions'] for book in books),
+            'books': len(books),
+            'daysRead': len(daily)
+        }
+        return {'totals': totals, 'daily': daily, 'books': books}
     
     # 注释管理方法
     def add_annotation(self, book_id: str, annotation_data: Dict[str, Any]) -> Optional[str]:
         """添加注释"""
         annotation_id = annotation_data.get('id') or f"annotation_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
         
+        record = AnnotationRecord(
+            annotation_id,
+            book_id,
+            annotation_data.get('type', 'highlight'),
+            annotation_data.get('cfiRange', ''),
+            annotation_data.get('text', ''),
+            annotation_data.get('color', ''),
+            annotation_data.get('className', ''),
+            annotation_data.get('note', ''),
+            annotation_data.get('source', ''),
+            annotation_data.get('chapterTitle'),
+            annotation_data.get('chapterIndex'),
+            annotation_data.get('timestamp', int(time.time() * 1000))
+        )
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -343,64 +545,36 @@ class SQLiteDataManager:
                     id, book_id, type, cfi_range, text, color, class_name,
                     note, source, chapter_title, chapter_index, timestamp
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                annotation_id,
-                book_id,
-                annotation_data.get('type', 'highlight'),
-                annotation_data.get('cfiRange', ''),
-                annotation_data.get('text', ''),
-                annotation_data.get('color', ''),
-                annotation_data.get('className', ''),
-                annotation_data.get('note', ''),
-                annotation_data.get('source', ''),
-                annotation_data.get('chapterTitle'),
-                annotation_data.get('chapterIndex'),
-                annotation_data.get('timestamp', int(time.time() * 1000))
-            ))
+            ''', record)
             conn.commit()
+        self.bump_generation('annotations')
+        self._emit_change('annotation-added', book_id, {'annotation': record.to_dict()})
         
         print(f"📝 [SQLiteDataManager] 添加注释: {annotation_id}")
         return annotation_id
     
+    def get_annotation_records(self, book_id: str, annotation_type: Optional[str] = None) -> List[AnnotationRecord]:
+        """获取书籍注释记录（按时间排序）"""
+        columns = select_columns(AnnotationRecord)
+        if annotation_type:
+            return self._fetch_records(AnnotationRecord, HotQueries.BOOK_ANNOTATIONS_BY_TYPE.format(columns=columns),
+                                       (book_id, annotation_type))
+        return self._fetch_records(AnnotationRecord, HotQueries.BOOK_ANNOTATIONS.format(columns=columns), (book_id,))
+    
     def get_book_annotations(self, book_id: str, annotation_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """获取书籍注释"""
-        annotations = []
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            
-            if annotation_type:
-                cursor.execute('SELECT * FROM annotations WHERE book_id = ? AND type = ?', (book_id, annotation_type))
-            else:
-                cursor.execute('SELECT * FROM annotations WHERE book_id = ?', (book_id,))
-            
-            rows = cursor.fetchall()
-            
-            for row in rows:
-                annotations.append({
-                    'id': row['id'],
-                    'bookId': row['book_id'],
-                    'type': row['type'],
-                    'cfiRange': row['cfi_range'],
-                    'text': row['text'],
-                    'color': row['color'],
-                    'className': row['class_name'],
-                    'note': row['note'],
-                    'source': row['source'],
-                    'chapterTitle': row['chapter_title'],
-                    'chapterIndex': row['chapter_index'],
-                    'timestamp': row['timestamp']
-                })
-        
-        return annotations
+        return [record.to_dict() for record in self.get_annotation_records(book_id, annotation_type)]
     
     def remove_annotation(self, book_id: str, annotation_id: str) -> bool:
         """删除注释"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM annotations WHERE book_id = ? AND id = ?', (book_id, annotation_id))
+            cursor.execute(HotQueries.DELETE_ANNOTATION, (book_id, annotation_id))
             
             if cursor.rowcount > 0:
                 conn.commit()
+                self.bump_generation('annotations')
+                self._emit_change('annotation-removed', book_id, {'id': annotation_id})
                 print(f"📝 [SQLiteDataManager] 删除注释: {annotation_id}")
                 return True
             return False
@@ -445,6 +619,8 @@ class SQLiteDataManager:
             
             if cursor.rowcount > 0:
                 conn.commit()
+                self.bump_generation('annotations')
+                self._emit_change('annotation-updated', book_id, {'id': annotation_id, 'updates': updates})
                 print(f"📝 [SQLiteDataManager] 更新注释: {annotation_id}")
                 return True
             return False
@@ -455,13 +631,15 @@ class SQLiteDataManager:
             cursor = conn.cursor()
             
             if annotation_type:
-                cursor.execute('DELETE FROM annotations WHERE book_id = ? AND type = ?', (book_id, annotation_type))
+                cursor.execute(HotQueries.CLEAR_ANNOTATIONS_BY_TYPE, (book_id, annotation_type))
             else:
                 cursor.execute('DELETE FROM annotations WHERE book_id = ?', (book_id,))
             
             count = cursor.rowcount
             if count > 0:
                 conn.commit()
+                self.bump_generation('annotations')
+                self._emit_change('annotations-cleared', book_id, {'type': annotation_type, 'count': count})
                 print(f"📝 [SQLiteDataManager] 清除注释: {book_id}, 数量: {count}")
             
             return count
@@ -507,7 +685,7 @@ class SQLiteDataManager:
         
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT book_id, file_path FROM books')
+            cursor.execute('SELECT book_id, file_path, cover_path FROM books')
             rows = cursor.fetchall()
             
             for row in rows:
@@ -518,6 +696,11 @@ class SQLiteDataManager:
                     print(f"⚠️  [SQLiteDataManager] 书籍文件不存在: {book_id} ({file_path})")
                     invalid_books.append(book_id)
         
+        # 清除已不存在的封面记录（书籍列表的 hasCover 按记录判断）
+        for row in rows:
+            if row['book_id'] not in invalid_books:
+                self.clear_missing_cover(row['book_id'], row['cover_path'])
+        
         # 移除无效的书籍
         for book_id in invalid_books:
             self.remove_book(book_id)
@@ -546,7 +729,7 @@ class SQLiteDataManager:
             stats['annotations_count'] = cursor.fetchone()[0]
             
             # 有注释的书籍数量
-            cursor.execute('SELECT COUNT(DISTINCT book_id) FROM annotations')
+            cursor.execute(HotQueries.ANNOTATED_BOOKS_COUNT)
             stats['annotated_books_count'] = cursor.fetchone()[0]
             
             stats['files_count'] = stats['books_count']  # 兼容性
@@ -636,7 +819,7 @@ def migrate_from_json(json_data_file: str = 'books_data.json',
         print(f"📊 [Migration] 迁移结果: {stats}")
         
         return True
-        
+    
     except Exception as e:
         print(f"❌ [Migration] 迁移失败: {e}")
         return False
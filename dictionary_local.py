@@ -0,0 +1,680 @@
+#!/usr/bin/env python3
+"""
+本地词典模块
+把 StarDict / JMdict 词典文件导入本地 SQLite 索引，离线查询，只有本地未收录时才访问远程词典
+
+- 查询结果与远程词典 API 的响应格式一致，dictionary.js 无需区分来源
+- 日语支持动词/形容词活用还原（食べました -> 食べる）和最长前缀匹配（選中"食べている。"也能查到）
+- 每个线程复用一个只读连接，命中时只需一次索引查询
+
+导入:
+    python3 dictionary_local.py import-jmdict JMdict_e.gz
+    python3 dictionary_local.py import-stardict stardict-ecdict/ecdict.ifo [--kind english]
+    python3 dictionary_local.py lookup ja 食べました
+"""
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Iterator, FrozenSet
+
+from dictionary_proxy import dictionary_kind
+
+
+# ---------------------------------------------------------------------------
+# 日语活用还原
+# ---------------------------------------------------------------------------
+
+# 词形类别（与 JMdict 词性标签对应）
+V1, V5, VK, VS, ADJ_I, TE = 'v1', 'v5', 'vk', 'vs', 'adj-i', 'te'
+
+# 五段动词词尾在各段的变化：う段 -> (あ段, い段, え段, お段)
+_GODAN_ROWS = {
+    'う': ('わ', 'い', 'え', 'お'),
+    'く': ('か', 'き', 'け', 'こ'),
+    'ぐ': ('が', 'ぎ', 'げ', 'ご'),
+    'す': ('さ', 'し', 'せ', 'そ'),
+    'つ': ('た', 'ち', 'て', 'と'),
+    'ぬ': ('な', 'に', 'ね', 'の'),
+    'ぶ': ('ば', 'び', 'べ', 'ぼ'),
+    'む': ('ま', 'み', 'め', 'も'),
+    'る': ('ら', 'り', 'れ', 'ろ'),
+}
+
+# 五段动词的て形/た形音便
+_GODAN_TE = {
+    'う': 'っ', 'つ': 'っ', 'る': 'っ',
+    'む': 'ん', 'ぶ': 'ん', 'ぬ': 'ん',
+    'く': 'い', 'ぐ': 'い', 'す': 'し',
+}
+
+
+class DeinflectRule:
+    """一条还原规则：把词尾 suffix_in 替换为 suffix_out"""
+    
+    __slots__ = ('suffix_in', 'suffix_out', 'types_in', 'types_out', 'reason')
+    
+    def __init__(self, suffix_in: str, suffix_out: str, types_in: FrozenSet[str],
+                 types_out: FrozenSet[str], reason: str):
+        self.suffix_in = suffix_in
+        self.suffix_out = suffix_out
+        self.types_in = types_in      # 适用于哪些词形（空集表示只适用于原始输入）
+        self.types_out = types_out    # 还原后的词形
+        self.reason = reason
+
+
+def _build_rules() -> List[DeinflectRule]:
+    rules: List[DeinflectRule] = []
+    
+    def add(suffix_in, suffix_out, types_in, types_out, reason):
+        rules.append(DeinflectRule(suffix_in, suffix_out, frozenset(types_in), frozenset(types_out), reason))
+    
+    # 丁寧形：食べます / 書きました / 行きません ...
+    for ending in ('ます', 'ました', 'ません', 'ませんでした', 'ましょう', 'まして'):
+        add(ending, 'る', (), (V1,), 'polite')
+        for base, row in _GODAN_ROWS.items():
+            add(row[1] + ending, base, (), (V5,), 'polite')
+        add('し' + ending, 'する', (), (VS,), 'polite')
+        add('き' + ending, 'くる', (), (VK,), 'polite')
+        add('来' + ending, '来る', (), (VK,), 'polite')
+    
+    # て形 / た形（〜ている 等还原到て形后继续）
+    for te, ta in (('て', 'た'), ('で', 'だ')):
+        for suffix, reason in ((te, 'te'), (ta, 'past')):
+            if te == 'て':
+                add(suffix, 'る', (TE,), (V1,), reason)
+                add('し' + suffix, 'する', (TE,), (VS,), reason)
+                add('き' + suffix, 'くる', (TE,), (VK,), reason)
+                add('来' + suffix, '来る', (TE,), (VK,), reason)
+                add('行っ' + suffix, '行く', (TE,), (V5,), reason)
+                add('いっ' + suffix, 'いく', (TE,), (V5,), reason)
+            for base, sound in _GODAN_TE.items():
+                voiced = base in ('む', 'ぶ', 'ぬ', 'ぐ')
+                if voiced == (te == 'で'):
+                    add(sound + suffix, base, (TE,), (V5,), reason)
+    add('かった', 'い', (TE,), (ADJ_I,), 'past')
+    add('くて', 'い', (TE,), (ADJ_I,), 'te')
+    
+    # 〜ている / 〜てる / 〜ておく / 〜てしまう：还原为て形
+    for aux, types, reason in (('いる', (V1,), 'progressive'), ('る', (V1,), 'progressive'),
+                               ('おく', (V5,), 'te-oku'), ('しまう', (V5,), 'te-shimau')):
+        add('て' + aux, 'て', types, (TE,), reason)
+        add('で' + aux, 'で', types, (TE,), reason)
+    
+    # 否定形（ない按形容词活用）
+    add('ない', 'る', (ADJ_I,), (V1,), 'negative')
+    for base, row in _GODAN_ROWS.items():
+        add(row[0] + 'ない', base, (ADJ_I,), (V5,), 'negative')
+    add('しない', 'する', (ADJ_I,), (VS,), 'negative')
+    add('こない', 'くる', (ADJ_I,), (VK,), 'negative')
+    add('来ない', '来る', (ADJ_I,), (VK,), 'negative')
+    add('くない', 'い', (ADJ_I,), (ADJ_I,), 'negative')
+    
+    # 〜たい（按形容词活用）
+    add('たい', 'る', (ADJ_I,), (V1,), 'want')
+    for base, row in _GODAN_ROWS.items():
+        add(row[1] + 'たい', base, (ADJ_I,), (V5,), 'want')
+    add('したい', 'する', (ADJ_I,), (VS,), 'want')
+    add('きたい', 'くる', (ADJ_I,), (VK,), 'want')
+    
+    # 被动 / 使役 / 可能（结果按一段动词活用）
+    add('られる', 'る', (V1,), (V1,), 'passive/potential')
+    add('させる', 'る', (V1,), (V1,), 'causative')
+    for base, row in _GODAN_ROWS.items():
+        add(row[0] + 'れる', base, (V1,), (V5,), 'passive')
+        add(row[0] + 'せる', base, (V1,), (V5,), 'causative')
+        add(row[2] + 'る', base, (V1,), (V5,), 'potential')
+    add('される', 'する', (V1,), (VS,), 'passive')
+    add('させる', 'する', (V1,), (VS,), 'causative')
+    add('できる', 'する', (V1,), (VS,), 'potential')
+    add('こられる', 'くる', (V1,), (VK,), 'passive/potential')
+    add('こさせる', 'くる', (V1,), (VK,), 'causative')
+    
+    # 条件形 / 意志形 / 命令形
+    add('れば', 'る', (), (V1,), 'conditional')
+    add('ければ', 'い', (), (ADJ_I,), 'conditional')
+    add('すれば', 'する', (), (VS,), 'conditional')
+    add('くれば', 'くる', (), (VK,), 'conditional')
+    add('よう', 'る', (), (V1,), 'volitional')
+    add('しよう', 'する', (), (VS,), 'volitional')
+    add('こよう', 'くる', (), (VK,), 'volitional')
+    add('ろ', 'る', (), (V1,), 'imperative')
+    add('しろ', 'する', (), (VS,), 'imperative')
+    add('こい', 'くる', (), (VK,), 'imperative')
+    for base, row in _GODAN_ROWS.items():
+        add(row[2] + 'ば', base, (), (V5,), 'conditional')
+        add(row[3] + 'う', base, (), (V5,), 'volitional')
+        add(row[2], base, (), (V5,), 'imperative')
+    
+    # 形容词的连用形和名词化
+    add('く', 'い', (), (ADJ_I,), 'adverbial')
+    add('さ', 'い', (), (ADJ_I,), 'noun')
+    
+    # サ变复合动词：勉強する -> 勉強（名词带 vs 词性）
+    add('する', '', (VS,), (VS,), 'suru')
+    return rules
+
+
+DEINFLECT_RULES = _build_rules()
+_RULES_BY_LAST_CHAR: Dict[str, List[DeinflectRule]] = {}
+for _rule in DEINFLECT_RULES:
+    _RULES_BY_LAST_CHAR.setdefault(_rule.suffix_in[-1], []).append(_rule)
+
+
+def deinflect(word: str, max_depth: int = 6) -> List[Tuple[str, Optional[FrozenSet[str]], List[str]]]:
+    """
+    生成可能的辞书形
+    
+    Returns:
+        [(候选词, 词形集合（None 表示原始输入，不限词性）, 还原原因列表), ...]，第一个是原词
+    """
+    results = [(word, None, [])]
+    seen = {(word, None)}
+    frontier = [(word, None, [])]
+    for _ in range(max_depth):
+        next_frontier = []
+        for term, types, reasons in frontier:
+            if not term:
+                continue
+            for rule in _RULES_BY_LAST_CHAR.get(term[-1], ()):
+                if not term.endswith(rule.suffix_in):
+                    continue
+                # 原始输入可以套用任何规则；还原出的中间形式只能套用匹配其词形的规则
+                if types is not None and not (types & rule.types_in):
+                    continue
+                candidate = term[:len(term) - len(rule.suffix_in)] + rule.suffix_out
+                if not candidate or (candidate, rule.types_out) in seen:
+                    continue
+                seen.add((candidate, rule.types_out))
+                entry = (candidate, rule.types_out, reasons + [rule.reason])
+                results.append(entry)
+                next_frontier.append(entry)
+        frontier = next_frontier
+        if not frontier:
+            break
+    return results
+
+
+def _pos_classes(pos_tags: List[str]) -> FrozenSet[str]:
+    """把 JMdict 词性标签归类为还原规则使用的词形"""
+    classes = set()
+    for tag in pos_tags:
+        if tag.startswith('v1'):
+            classes.add(V1)
+        elif tag.startswith('v5'):
+            classes.add(V5)
+        elif tag == 'vk':
+            classes.add(VK)
+        elif tag.startswith('vs'):
+            classes.add(VS)
+        elif tag in ('adj-i', 'adj-ix'):
+            classes.add(ADJ_I)
+    return frozenset(classes)
+
+
+# ---------------------------------------------------------------------------
+# 词典文件解析
+# ---------------------------------------------------------------------------
+
+def _open_maybe_gzip(path: str):
+    with open(path, 'rb') as f:
+        magic = f.read(2)
+    return gzip.open(path, 'rb') if magic == b'\x1f\x8b' else open(path, 'rb')
+
+
+def _jmdict_entities(path: str) -> Dict[str, str]:
+    """从 JMdict 的内部 DTD 读取实体定义，返回 {展开后的说明: 实体名}（用于还原词性标签）"""
+    entities = {}
+    with _open_maybe_gzip(path) as f:
+        head = b''
+        for line in f:
+            head += line
+            if b']>' in line:
+                break
+    for name, text in re.findall(r'<!ENTITY\s+(\S+)\s+"([^"]*)"\s*>', head.decode('utf-8', errors='replace')):
+        entities[text] = name
+    return entities
+
+
+def parse_jmdict(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐条读取 JMdict XML（支持 .gz）
+    
+    Yields:
+        {'writings': [...], 'readings': [...], 'senses': [{'pos': [...], 'glosses': [...]}], 'priority': int}
+    """
+    entity_names = _jmdict_entities(path)
+    with _open_maybe_gzip(path) as f:
+        last_pos: List[str] = []
+        for _, element in ET.iterparse(f, events=('end',)):
+            if element.tag != 'entry':
+                continue
+            
+            writings = [node.text for node in element.iter('keb') if node.text]
+            readings = [node.text for node in element.iter('reb') if node.text]
+            priority = len(element.findall('k_ele/ke_pri')) + len(element.findall('r_ele/re_pri'))
+            
+            senses = []
+            for sense in element.findall('sense'):
+                pos = [entity_names.get(node.text, node.text) for node in sense.findall('pos') if node.text]
+                # JMdict 中词性与上一个义项相同时省略
+                if pos:
+                    last_pos = pos
+                glosses = [node.text for node in sense.findall('gloss') if node.text]
+                if glosses:
+                    senses.append({'pos': pos or last_pos, 'glosses': glosses})
+            last_pos = []
+            
+            if (writings or readings) and senses:
+                yield {'writings': writings, 'readings': readings, 'senses': senses, 'priority': priority}
+            element.clear()
+
+
+def _read_ifo(path: str) -> Dict[str, str]:
+    info = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            key, sep, value = line.strip().partition('=')
+            if sep:
+                info[key.strip()] = value.strip()
+    return info
+
+
+def _stardict_file(ifo_path: str, extensions: Tuple[str, ...]) -> Optional[str]:
+    base = ifo_path[:-4] if ifo_path.endswith('.ifo') else ifo_path
+    for extension in extensions:
+        if os.path.exists(base + extension):
+            return base + extension
+    return None
+
+
+def _parse_stardict_fields(data: bytes, sametypesequence: str) -> Dict[str, str]:
+    """按 StarDict 格式拆分一个词条的数据字段，返回 {类型字符: 文本}"""
+    fields: Dict[str, str] = {}
+    
+    def take_text(pos: int, last: bool) -> Tuple[str, int]:
+        if last:
+            return data[pos:].decode('utf-8', errors='replace'), len(data)
+        end = data.find(b'\0', pos)
+        end = len(data) if end < 0 else end
+        return data[pos:end].decode('utf-8', errors='replace'), end + 1
+    
+    pos = 0
+    if sametypesequence:
+        for i, field_type in enumerate(sametypesequence):
+            last = i == len(sametypesequence) - 1
+            if field_type.islower():
+                fields[field_type], pos = take_text(pos, last)
+            else:
+                # 大写类型是二进制数据（图片、音频），跳过
+                size = len(data) - pos if last else struct.unpack('>I', data[pos:pos + 4])[0]
+                pos += size if last else size + 4
+        return fields
+    
+    while pos < len(data):
+        field_type = chr(data[pos])
+        pos += 1
+        if field_type.islower():
+            fields[field_type], pos = take_text(pos, False)
+        else:
+            size = struct.unpack('>I', data[pos:pos + 4])[0]
+            pos += size + 4
+    return fields
+
+
+def parse_stardict(ifo_path: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+    """
+    读取 StarDict 词典（.ifo + .idx[.gz] + .dict[.dz]）
+    
+    Yields:
+        (单词, {类型字符: 文本})，常见类型：m 纯文本释义、h HTML、t 音标
+    """
+    info = _read_ifo(ifo_path)
+    idx_path = _stardict_file(ifo_path, ('.idx', '.idx.gz'))
+    dict_path = _stardict_file(ifo_path, ('.dict', '.dict.dz'))
+    if idx_path is None or dict_path is None:
+        raise FileNotFoundError(f"StarDict 词典缺少 .idx 或 .dict 文件: {ifo_path}")
+    
+    offset_size = 8 if info.get('idxoffsetbits') == '64' else 4
+    offset_format = '>Q' if offset_size == 8 else '>I'
+    sametypesequence = info.get('sametypesequence', '')
+    
+    with _open_maybe_gzip(idx_path) as f:
+        index = f.read()
+    # .dict.dz 是 dictzip（兼容 gzip），整体解压
+    with _open_maybe_gzip(dict_path) as f:
+        content = f.read()
+    
+    pos = 0
+    while pos < len(index):
+        end = index.index(b'\0', pos)
+        word = index[pos:end].decode('utf-8', errors='replace')
+        pos = end + 1
+        offset = struct.unpack(offset_format, index[pos:pos + offset_size])[0]
+        size = struct.unpack('>I', index[pos + offset_size:pos + offset_size + 4])[0]
+        pos += offset_size + 4
+        yield word, _parse_stardict_fields(content[offset:offset + size], sametypesequence)
+
+
+# ---------------------------------------------------------------------------
+# 本地索引
+# ---------------------------------------------------------------------------
+
+class LocalDictionary:
+    """本地词典索引（SQLite）"""
+    
+    def __init__(self, db_file: str = 'dictionary_index.db'):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._kinds: FrozenSet[str] = frozenset()
+        self._kinds_checked = 0.0
+        self._init_database()
+    
+    @contextmanager
+    def _get_connection(self):
+        """获取写连接，退出时提交并关闭"""
+        conn = sqlite3.connect(self.db_file, timeout=30)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _reader(self) -> sqlite3.Connection:
+        """当前线程的只读连接（查询频繁，复用连接）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+    
+    def _init_database(self) -> None:
+        with self._get_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dict_sources (
+                    name TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    entries INTEGER NOT NULL,
+                    imported_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dict_entries (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    pos TEXT,
+                    priority INTEGER DEFAULT 0,
+                    payload BLOB NOT NULL
+                )
+            ''')
+            # 查询只走 (kind, term) 前缀，WITHOUT ROWID 让索引即数据
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dict_terms (
+                    kind TEXT NOT NULL,
+                    term TEXT NOT NULL,
+                    entry_id INTEGER NOT NULL,
+                    PRIMARY KEY (kind, term, entry_id)
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_dict_entries_source ON dict_entries (source)')
+    
+    def available_kinds(self) -> FrozenSet[str]:
+        """已导入的词典类型（每 30 秒刷新，以便发现其他进程完成的导入）"""
+        now = time.time()
+        if now - self._kinds_checked > 30:
+            try:
+                rows = self._reader().execute('SELECT DISTINCT kind FROM dict_sources').fetchall()
+                self._kinds = frozenset(row[0] for row in rows)
+            except sqlite3.Error:
+                self._kinds = frozenset()
+            self._kinds_checked = now
+        return self._kinds
+    
+    def _find(self, kind: str, terms: List[str]) -> List[Tuple[str, Optional[str], int, bytes]]:
+        """批量查询候选词，返回 [(匹配的词, 词性, 优先级, 响应内容)]"""
+        placeholders = ','.join('?' * len(terms))
+        return self._reader().execute(f'''
+            SELECT t.term, e.pos, e.priority, e.payload
+            FROM dict_terms t JOIN dict_entries e ON e.id = t.entry_id
+            WHERE t.kind = ? AND t.term IN ({placeholders})
+            ORDER BY e.priority DESC, e.id
+        ''', [kind] + terms).fetchall()
+    
+    def lookup(self, language: str, word: str) -> Optional[bytes]:
+        """
+        查询本地词典
+        
+        Returns:
+            与远程词典 API 相同格式的 JSON 响应；本地未收录时返回 None
+        """
+        kind = dictionary_kind(language)
+        word = word.strip()
+        if not word or kind not in self.available_kinds():
+            return None
+        
+        if kind == 'english':
+            rows = self._find(kind, list(dict.fromkeys([word, word.lower()])))
+            return rows[0][3] if rows else None
+        return self._lookup_japanese(word)
+    
+    def _lookup_japanese(self, text: str) -> Optional[bytes]:
+        match = self.match_japanese(text)
+        if match is None:
+            return None
+        
+        prefix, reasons, payload = match
+        if not reasons and prefix == text:
+            return payload
+        response = json.loads(payload)
+        response['data']['matched'] = prefix
+        if reasons:
+            response['data']['deinflection'] = {'from': prefix, 'reasons': reasons}
+        return json.dumps(response, ensure_ascii=False).encode('utf-8')
+    
+    def match_japanese(self, text: str) -> Optional[Tuple[str, List[str], bytes]]:
+        """
+        最长前缀匹配：选中的文本可能带有后续的助词或标点
+        
+        Returns:
+            (匹配到的前缀, 活用还原原因, 词条原始响应)；未收录时返回 None
+        """
+        for length in range(len(text), 0, -1):
+            prefix = text[:length]
+            by_term = {}
+            for term, types, reasons in deinflect(prefix):
+                by_term.setdefault(term, []).append((types, reasons))
+            
+            for term, pos, _, payload in self._find('japanese', list(by_term)):
+                entry_classes = _pos_classes((pos or '').split())
+                for types, reasons in by_term[term]:
+                    # 原词直接匹配；还原得到的候选必须与词条的词性一致
+                    if types is None or types & entry_classes:
+                        return prefix, reasons, payload
+        return None
+    
+    def find_many(self, language: str, words: List[str]) -> Dict[str, bytes]:
+        """批量精确查询（不做活用还原），返回 {单词: 响应内容}"""
+        kind = dictionary_kind(language)
+        if kind not in self.available_kinds():
+            return {}
+        
+        found: Dict[str, bytes] = {}
+        for i in range(0, len(words), 500):
+            chunk = words[i:i + 500]
+            by_term: Dict[str, List[str]] = {}
+            for word in chunk:
+                by_term.setdefault(word, []).append(word)
+                if kind == 'english' and word.lower() != word:
+                    by_term.setdefault(word.lower(), []).append(word)
+            for term, _, _, payload in self._find(kind, list(by_term)):
+                for word in by_term[term]:
+                    found.setdefault(word, payload)
+        return found
+    
+    def _replace_source(self, conn: sqlite3.Connection, name: str) -> None:
+        """重新导入同名词典前删除旧数据"""
+        old_ids = 'SELECT id FROM dict_entries WHERE source = ?'
+        conn.execute(f'DELETE FROM dict_terms WHERE entry_id IN ({old_ids})', (name,))
+        conn.execute('DELETE FROM dict_entries WHERE source = ?', (name,))
+        conn.execute('DELETE FROM dict_sources WHERE name = ?', (name,))
+    
+    def _insert_entries(self, conn: sqlite3.Connection, name: str, kind: str, fmt: str,
+                        entries: Iterator[Tuple[List[str], str, int, Dict[str, Any]]]) -> int:
+        """写入词条；entries 产出 (索引词列表, 词性, 优先级, 响应内容)"""
+        self._replace_source(conn, name)
+        cursor = conn.cursor()
+        count = 0
+        term_rows = []
+        for terms, pos, priority, response in entries:
+            cursor.execute(
+                'INSERT INTO dict_entries (source, kind, pos, priority, payload) VALUES (?, ?, ?, ?, ?)',
+                (name, kind, pos, priority, json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            )
+            entry_id = cursor.lastrowid
+            term_rows.extend((kind, term, entry_id) for term in dict.fromkeys(terms) if term)
+            count += 1
+            if len(term_rows) >= 10000:
+                cursor.executemany('INSERT OR IGNORE INTO dict_terms (kind, term, entry_id) VALUES (?, ?, ?)', term_rows)
+                term_rows = []
+        cursor.executemany('INSERT OR IGNORE INTO dict_terms (kind, term, entry_id) VALUES (?, ?, ?)', term_rows)
+        cursor.execute('INSERT INTO dict_sources (name, kind, format, entries, imported_at) VALUES (?, ?, ?, ?, ?)',
+                       (name, kind, fmt, count, time.time()))
+        return count
+    
+    def import_jmdict(self, path: str, name: str = 'jmdict') -> int:
+        """导入 JMdict XML（可为 .gz），返回导入的词条数"""
+        def entries():
+            for entry in parse_jmdict(path):
+                senses = entry['senses']
+                pos_tags = sorted({tag for sense in senses for tag in sense['pos']})
+                response = {
+                    'success': True,
+                    'found': True,
+                    'data': {
+                        'headword': (entry['writings'] or entry['readings'])[0],
+                        'readings': [{'kana': kana} for kana in entry['readings']],
+                        'writings': entry['writings'],
+                        'definitions': [
+                            {
+                                'meaning': '; '.join(sense['glosses']),
+                                'partOfSpeech': ', '.join(sense['pos']),
+                                'examples': []
+                            }
+                            for sense in senses
+                        ],
+                        'source': 'JMdict'
+                    }
+                }
+                yield entry['writings'] + entry['readings'], ' '.join(pos_tags), entry['priority'], response
+        
+        return self._import(name, 'japanese', 'jmdict', entries())
+    
+    def import_stardict(self, ifo_path: str, kind: str = 'english', name: Optional[str] = None) -> int:
+        """导入 StarDict 词典，返回导入的词条数"""
+        name = name or _read_ifo(ifo_path).get('bookname') or os.path.basename(ifo_path)
+        
+        def entries():
+            for word, fields in parse_stardict(ifo_path):
+                definition = fields.get('m') or fields.get('h') or fields.get('x') or fields.get('g') or ''
+                if kind == 'english':
+                    response = {
+                        'word': word,
+                        'phonetic': fields.get('t', ''),
+                        'translation': definition,
+                        'definition': '',
+                        'source': name
+                    }
+                    terms = [word, word.lower()]
+                else:
+                    response = {
+                        'success': True,
+                        'found': True,
+                        'data': {
+                            'headword': word,
+                            'readings': [{'kana': fields['t']}] if fields.get('t') else [],
+                            'writings': [word],
+                            'definitions': [{'meaning': definition, 'partOfSpeech': '', 'examples': []}],
+                            'source': name
+                        }
+                    }
+                    terms = [word]
+                yield terms, '', 0, response
+        
+        return self._import(name, kind, 'stardict', entries())
+    
+    def _import(self, name: str, kind: str, fmt: str, entries) -> int:
+        start = time.time()
+        with self._get_connection() as conn:
+            count = self._insert_entries(conn, name, kind, fmt, entries)
+        self._kinds_checked = 0.0
+        print(f"📖 [LocalDictionary] 导入 {name}: {count} 条 ({time.time() - start:.1f}s)")
+        return count
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """已导入的词典列表"""
+        rows = self._reader().execute(
+            'SELECT name, kind, format, entries, imported_at FROM dict_sources ORDER BY name'
+        ).fetchall()
+        return {
+            'sources': [
+                {'name': name, 'kind': kind, 'format': fmt, 'entries': entries, 'importedAt': int(imported_at * 1000)}
+                for name, kind, fmt, entries, imported_at in rows
+            ]
+        }
+
+
+# 全局本地词典实例
+local_dictionary = None
+
+
+def get_local_dictionary(db_file: str = 'dictionary_index.db') -> LocalDictionary:
+    """获取全局本地词典实例"""
+    global local_dictionary
+    if local_dictionary is None:
+        local_dictionary = LocalDictionary(db_file)
+    return local_dictionary
+
+
+if __name__ == '__main__':
+    import sys
+    
+    usage = (
+        "用法:\n"
+        "  python3 dictionary_local.py import-jmdict <JMdict_e[.gz]>\n"
+        "  python3 dictionary_local.py import-stardict <词典.ifo> [--kind english|japanese]\n"
+        "  python3 dictionary_local.py lookup <语言> <单词>\n"
+        "  python3 dictionary_local.py deinflect <单词>"
+    )
+    if len(sys.argv) < 3:
+        print(usage)
+        sys.exit(1)
+    
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == 'deinflect':
+        for term, types, reasons in deinflect(args[0]):
+            print(term, sorted(types) if types else '-', ' <- '.join(reasons))
+    elif command == 'import-jmdict':
+        get_local_dictionary().import_jmdict(args[0])
+    elif command == 'import-stardict':
+        kind = args[args.index('--kind') + 1] if '--kind' in args else 'english'
+        get_local_dictionary().import_stardict(args[0], kind)
+    elif command == 'lookup' and len(args) >= 2:
+        dictionary = get_local_dictionary()
+        start = time.perf_counter()
+        result = dictionary.lookup(args[0], args[1])
+        elapsed = (time.perf_counter() - start) * 1000
+        print(result.decode('utf-8') if result else '未收录')
+        print(f"耗时 {elapsed:.3f}ms")
+    else:
+        print(usage)
+        sys.exit(1)
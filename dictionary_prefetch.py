@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+章节词典预取模块
+取一个章节的正文（chapter_text 缓存），把其中能在本地词典或代理缓存中查到的词一次性返回，
+阅读器缓存后，本章内的点词查询无需再发请求
+
+只读本地索引和代理缓存，不为预取访问远程词典。
+"""
+
+import json
+import re
+import time
+from typing import Dict, Any, List
+
+from dictionary_local import LocalDictionary
+from dictionary_proxy import DictionaryProxy, dictionary_kind
+
+
+# 日语按最长匹配切词时，单个词的最大长度
+MAX_WORD_LENGTH = 12
+
+# 可以作为日语词开头的字符（汉字、假名、长音符）
+_JAPANESE_CHAR_RE = re.compile(r'[ぁ-ヿ㐀-䶿一-鿿豈-﫿ー々〆]')
+_ENGLISH_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*[A-Za-z]|[A-Za-z]")
+
+
+def _segment_japanese(text: str, local_dictionary: LocalDictionary) -> Dict[str, bytes]:
+    """按本地词典做最长匹配切词，返回 {文中出现的词形: 词条响应}"""
+    found: Dict[str, bytes] = {}
+    misses = set()
+    pos = 0
+    while pos < len(text):
+        if not _JAPANESE_CHAR_RE.match(text[pos]):
+            pos += 1
+            continue
+        window = text[pos:pos + MAX_WORD_LENGTH]
+        if window in misses:
+            pos += 1
+            continue
+        match = local_dictionary.match_japanese(window)
+        if match is None:
+            misses.add(window)
+            pos += 1
+            continue
+        surface, _, payload = match
+        found.setdefault(surface, payload)
+        pos += len(surface)
+    return found
+
+
+def prefetch_chapter(text: str, language: str, local_dictionary: LocalDictionary,
+                     dictionary_proxy: DictionaryProxy) -> Dict[str, Any]:
+    """
+    为一段章节正文批量解析词典
+    
+    Returns:
+        {'words': {词: 词条序号}, 'entries': [词条原始响应(bytes)], 'stats': {...}}
+        相同的词条只出现一次，不同词形通过序号引用
+    """
+    start = time.time()
+    kind = dictionary_kind(language)
+    resolved: Dict[str, bytes] = {}
+    
+    if kind == 'english':
+        words = list(dict.fromkeys(_ENGLISH_WORD_RE.findall(text)))
+        resolved.update(dictionary_proxy.get_cached_many(language, words))
+        # 本地词典优先
+        resolved.update(local_dictionary.find_many(language, words))
+        # 代理缓存的键是查询时的原词，大小写不同的词合并为小写
+        for word in words:
+            if word not in resolved and word.lower() in resolved:
+                resolved[word] = resolved[word.lower()]
+        candidates = len(words)
+    else:
+        resolved.update(dictionary_proxy.get_cached_in_text(language, text))
+        if kind in local_dictionary.available_kinds():
+            resolved.update(_segment_japanese(text, local_dictionary))
+        candidates = len(resolved)
+    
+    # 不同词形（食べる、食べた）常对应同一词条，词条只保留一份
+    entries: List[bytes] = []
+    entry_index: Dict[bytes, int] = {}
+    words_map: Dict[str, int] = {}
+    for word, payload in resolved.items():
+        if payload not in entry_index:
+            entry_index[payload] = len(entries)
+            entries.append(payload)
+        words_map[word] = entry_index[payload]
+    
+    return {
+        'words': words_map,
+        'entries': entries,
+        'stats': {
+            'textLength': len(text),
+            'candidates': candidates,
+            'resolved': len(words_map),
+            'entries': len(entries),
+            'elapsed': round(time.time() - start, 3)
+        }
+    }
+
+
+def encode_prefetch_response(book_id: str, spine_index: int, language: str, result: Dict[str, Any]) -> bytes:
+    """
+    序列化预取结果；词条是已序列化的 JSON，直接拼接，不重新解析
+    """
+    head = json.dumps({
+        'success': True,
+        'bookId': book_id,
+        'spineIndex': spine_index,
+        'language': language,
+        'kind': dictionary_kind(language),
+        'words': result['words'],
+        'stats': result['stats']
+    }, ensure_ascii=False).encode('utf-8')
+    entries = b'[' + b','.join(result['entries']) + b']'
+    # 在对象末尾追加 entries 字段
+    return head[:-1] + b', "entries": ' + entries + b'}'
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+词典查询代理模块
+代替浏览器访问远程词典 API（language.3049589.xyz），并把结果缓存在本地 SQLite 中
+
+- 缓存按 (词典类型, 单词) 存储原始响应，带 TTL，超过条目上限时按最近访问时间淘汰
+- 多个请求同时查询同一个单词时只访问一次上游（请求合并）
+- 上游可替换（set_upstream），测试时可以使用本地的替代实现
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Tuple, Callable
+
+
+DEFAULT_UPSTREAM_URL = 'https://language.3049589.xyz'
+DEFAULT_TTL = 30 * 24 * 3600  # 词典内容很少变化，缓存 30 天
+DEFAULT_MAX_ENTRIES = 100000
+UPSTREAM_TIMEOUT = 10
+
+# 上游：(词典类型, 单词) -> (HTTP 状态码, 响应内容)
+Upstream = Callable[[str, str], Tuple[int, bytes]]
+
+
+class UpstreamError(Exception):
+    """上游词典 API 不可用"""
+
+
+def dictionary_kind(language: str) -> str:
+    """按书籍语言选择词典类型，规则与 dictionary.js 的 getApiEndpoint 一致"""
+    lang = (language or 'ja').lower()
+    if lang in ('en', 'english') or lang.startswith('en-'):
+        return 'english'
+    if lang in ('zh', 'chinese') or lang.startswith('zh-'):
+        # 中文暂时使用英语词典作为备选
+        return 'english'
+    return 'japanese'
+
+
+class RemoteUpstream:
+    """通过 HTTP 访问远程词典 API"""
+    
+    def __init__(self, base_url: str = DEFAULT_UPSTREAM_URL, timeout: float = UPSTREAM_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+    
+    def url_for(self, kind: str, word: str) -> str:
+        quoted = urllib.parse.quote(word, safe='')
+        if kind == 'english':
+            return f"{self.base_url}/api/stardict/{quoted}"
+        return f"{self.base_url}/api/japanese/{quoted}?definition"
+    
+    def __call__(self, kind: str, word: str) -> Tuple[int, bytes]:
+        request = urllib.request.Request(self.url_for(kind, word), headers={'Accept': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                # 未收录的单词，同样可以缓存
+                return 404, e.read()
+            raise UpstreamError(f"HTTP {e.code}")
+        except (urllib.error.URLError, OSError) as e:
+            raise UpstreamError(str(e))
+
+
+class _Flight:
+    """正在进行的一次上游查询，其他线程等待它的结果"""
+    
+    __slots__ = ('event', 'result', 'error')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Tuple[int, bytes]] = None
+        self.error: Optional[Exception] = None
+
+
+class DictionaryProxy:
+    """带持久化缓存和请求合并的词典查询代理"""
+    
+    def __init__(self, db_file: str = 'dictionary_cache.db', upstream: Optional[Upstream] = None,
+                 ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db_file = db_file
+        self.upstream: Upstream = upstream or RemoteUpstream(os.environ.get('DICT_UPSTREAM_URL', DEFAULT_UPSTREAM_URL))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._inflight: Dict[Tuple[str, str], _Flight] = {}
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._stale_served = 0
+        self._upstream_errors = 0
+        self._init_database()
+    
+    @contextmanager
+    def _get_connection(self):
+        """获取数据库连接，退出时提交并关闭（请求线程很多，不能把连接留给垃圾回收）"""
+        conn = sqlite3.connect(self.db_file, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _init_database(self) -> None:
+        with self._get_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS dict_cache (
+                    kind TEXT NOT NULL,
+                    word TEXT NOT NULL,
+                    status INTEGER NOT NULL,
+                    body BLOB NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (kind, word)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_dict_cache_last_access ON dict_cache (last_access)')
+    
+    def set_upstream(self, upstream: Upstream) -> None:
+        """替换上游实现（例如测试时使用本地替代）"""
+        self.upstream = upstream
+    
+    def lookup(self, language: str, word: str) -> Tuple[int, bytes, str]:
+        """
+        查询单词
+        
+        Args:
+            language: 书籍语言（ja、en、zh-CN 等）
+            word: 要查询的单词
+        
+        Returns:
+            (HTTP 状态码, 上游原始响应, 缓存状态 HIT/MISS/COALESCED/STALE)
+        
+        Raises:
+            UpstreamError: 缓存未命中且上游不可用
+        """
+        kind = dictionary_kind(language)
+        word = word.strip()
+        now = time.time()
+        
+        cached = self._get_cached(kind, word)
+        if cached is not None and cached['fetched_at'] + self.ttl > now:
+            self._touch(kind, word, cached['last_access'], now)
+            with self._lock:
+                self._hits += 1
+            return cached['status'], cached['body'], 'HIT'
+        
+        key = (kind, word)
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self._misses += 1
+            else:
+                self._coalesced += 1
+        
+        if not leader:
+            flight.event.wait()
+            if flight.error is None:
+                return flight.result[0], flight.result[1], 'COALESCED'
+            return self._serve_stale(cached, flight.error)
+        
+        try:
+            status, body = self.upstream(kind, word)
+            self._store(kind, word, status, body)
+            flight.result = (status, body)
+            return status, body, 'MISS'
+        except Exception as e:
+            flight.error = e
+            return self._serve_stale(cached, e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+    
+    def _serve_stale(self, cached: Optional[sqlite3.Row], error: Exception) -> Tuple[int, bytes, str]:
+        """上游失败时退回已过期的缓存"""
+        with self._lock:
+            self._upstream_errors += 1
+            if cached is not None:
+                self._stale_served += 1
+        if cached is None:
+            raise error if isinstance(error, UpstreamError) else UpstreamError(str(error))
+        print(f"⚠️ [DictionaryProxy] 上游不可用，返回过期缓存: {error}")
+        return cached['status'], cached['body'], 'STALE'
+    
+    def _get_cached(self, kind: str, word: str) -> Optional[sqlite3.Row]:
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT status, body, fetched_at, last_access FROM dict_cache WHERE kind = ? AND word = ?',
+                           (kind, word))
+            return cursor.fetchone()
+    
+    def get_cached_many(self, language: str, words: List[str]) -> Dict[str, bytes]:
+        """批量读取未过期的缓存（不访问上游），返回 {单词: 响应内容}"""
+        kind = dictionary_kind(language)
+        fresh_after = time.time() - self.ttl
+        found: Dict[str, bytes] = {}
+        with self._get_connection() as conn:
+            for i in range(0, len(words), 500):
+                chunk = words[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT word, body FROM dict_cache
+                    WHERE kind = ? AND word IN ({placeholders}) AND fetched_at > ? AND status = 200
+                ''', [kind] + chunk + [fresh_after]).fetchall()
+                found.update((row['word'], row['body']) for row in rows)
+        return found
+    
+    def get_cached_in_text(self, language: str, text: str) -> Dict[str, bytes]:
+        """读取出现在文本中的所有未过期缓存词条（日语没有分词，按子串匹配）"""
+        kind = dictionary_kind(language)
+        with self._get_connection() as conn:
+            rows = conn.execute('''
+                SELECT word, body FROM dict_cache
+                WHERE kind = ? AND fetched_at > ? AND status = 200 AND instr(?, word) > 0
+            ''', (kind, time.time() - self.ttl, text)).fetchall()
+        return {row['word']: row['body'] for row in rows}
+    
+    def _touch(self, kind: str, word: str, last_access: float, now: float) -> None:
+        """更新最近访问时间（一分钟内重复命中不再写库）"""
+        if now - last_access < 60:
+            return
+        with self._get_connection() as conn:
+            conn.execute('UPDATE dict_cache SET last_access = ? WHERE kind = ? AND word = ?', (now, kind, word))
+    
+    def _store(self, kind: str, word: str, status: int, body: bytes) -> None:
+        now = time.time()
+        with self._get_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO dict_cache (kind, word, status, body, fetched_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (kind, word, status, body, now, now))
+        
+        with self._lock:
+            self._writes_since_evict += 1
+            should_evict = self._writes_since_evict >= 100
+            if should_evict:
+                self._writes_since_evict = 0
+        if should_evict:
+            self.evict()
+    
+    def evict(self) -> int:
+        """删除过期条目，并按最近访问时间淘汰超出上限的条目，返回删除的条目数"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM dict_cache WHERE fetched_at < ?', (time.time() - self.ttl,))
+            removed = cursor.rowcount
+            
+            cursor.execute('SELECT COUNT(*) FROM dict_cache')
+            excess = cursor.fetchone()[0] - self.max_entries
+            if excess > 0:
+                cursor.execute('''
+                    DELETE FROM dict_cache WHERE rowid IN (
+                        SELECT rowid FROM dict_cache ORDER BY last_access LIMIT ?
+                    )
+                ''', (excess,))
+                removed += cursor.rowcount
+        
+        if removed:
+            print(f"🗑️ [DictionaryProxy] 淘汰缓存条目: {removed}")
+        return removed
+    
+    def clear(self) -> None:
+        with self._get_connection() as conn:
+            conn.execute('DELETE FROM dict_cache')
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM dict_cache')
+            entries, size = cursor.fetchone()
+        
+        with self._lock:
+            return {
+                'entries': entries,
+                'bytes': size,
+                'maxEntries': self.max_entries,
+                'ttl': self.ttl,
+                'inflight': len(self._inflight),
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+                'staleServed': self._stale_served,
+                'upstreamErrors': self._upstream_errors
+            }
+
+
+# 全局词典代理实例
+dictionary_proxy = None
+
+
+def get_dictionary_proxy(db_file: str = 'dictionary_cache.db') -> DictionaryProxy:
+    """获取全局词典代理实例"""
+    global dictionary_proxy
+    if dictionary_proxy is None:
+        dictionary_proxy = DictionaryProxy(db_file)
+    return dictionary_proxy
+
+
+if __name__ == '__main__':
+    # 自检：使用本地替代上游，验证缓存命中和并发请求合并
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    
+    calls = []
+    
+    def fake_upstream(kind: str, word: str) -> Tuple[int, bytes]:
+        calls.append((kind, word))
+        time.sleep(0.2)
+        return 200, json.dumps({'success': True, 'found': True, 'data': {'headword': word}}).encode('utf-8')
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        proxy = DictionaryProxy(os.path.join(temp_dir, 'dict.db'), upstream=fake_upstream)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            states = [state for _, _, state in pool.map(lambda _: proxy.lookup('ja', '猫'), range(8))]
+        print(f"并发查询 8 次: 上游调用 {len(calls)} 次, 状态 {sorted(set(states))}")
+        
+        rounds = 1000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            proxy.lookup('ja', '猫')
+        print(f"缓存命中: 平均 {(time.perf_counter() - start) * 1000 / rounds:.3f}ms/次")
+        print(json.dumps(proxy.get_stats(), ensure_ascii=False, indent=2))
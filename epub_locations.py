@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+EPUB 位置索引（locations）模块
+在服务端生成与 epub.js `book.locations.generate(chars)` 相同的 CFI 列表
+
+生成结果按"文件内容哈希 + 分段字符数"缓存到 books/locations/ 目录，
+上传后由后台线程预先计算，阅读器打开书籍时直接从 /api/book/<id>/locations 读取。
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, Optional, List, Tuple
+
+from epub_parser import EpubBook, EpubParseError, Element
+from file_cache import atomic_write_bytes
+
+
+# 与前端 book.locations.generate(1024) 保持一致
+DEFAULT_CHARS = 1024
+
+LOCATIONS_DIR = 'books/locations'
+
+# 一个路径步骤：('element', 元素序号, id) 或 ('text', 文本节点序号, '')
+Step = Tuple[str, int, str]
+
+
+def _js_length(text: str) -> int:
+    """JavaScript 字符串长度（UTF-16 码元数），CFI 偏移量以此计算"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _js_is_blank(text: str) -> bool:
+    """等价于 JavaScript 的 text.trim().length === 0"""
+    return not text.strip().strip('\ufeff')
+
+
+def _iter_text_steps(element: Element, steps: List[Step]):
+    """按文档顺序遍历元素下的文本节点，产出 (到该文本节点的步骤列表, 文本)"""
+    element_index = 0
+    text_index = 0
+    for child in element.children:
+        if isinstance(child, str):
+            yield steps + [('text', text_index, '')], child
+            text_index += 1
+        elif isinstance(child, Element):
+            yield from _iter_text_steps(child, steps + [('element', element_index, child.id)])
+            element_index += 1
+
+
+def _join_steps(steps: List[Step]) -> str:
+    parts = []
+    for step_type, index, step_id in steps:
+        segment = str((index + 1) * 2) if step_type == 'element' else str(1 + 2 * index)
+        if step_id:
+            segment += f"[{step_id}]"
+        parts.append(segment)
+    return '/'.join(parts)
+
+
+def _range_cfi(cfi_base: str, start: Tuple[List[Step], int], end: Tuple[List[Step], int]) -> str:
+    """按 epub.js EpubCFI(range, base).toString() 的规则生成区间 CFI"""
+    start_steps, start_offset = start
+    end_steps, end_offset = end
+    
+    common = 0
+    for i in range(len(start_steps) - 1):
+        if i < len(end_steps) and start_steps[i] == end_steps[i]:
+            common += 1
+        else:
+            break
+    if start_steps == end_steps and start_offset == end_offset:
+        # 起止完全相同时 epub.js 退化为不带偏移量的路径
+        return f"epubcfi({cfi_base}!/{_join_steps(start_steps)})"
+    
+    return (f"epubcfi({cfi_base}!/{_join_steps(start_steps[:common])},"
+            f"/{_join_steps(start_steps[common:])}:{start_offset},"
+            f"/{_join_steps(end_steps[common:])}:{end_offset})")
+
+
+def parse_section_locations(root: Element, cfi_base: str, chars: int = DEFAULT_CHARS) -> List[str]:
+    """
+    为单个章节生成位置 CFI，逐行对应 epub.js Locations.parse 的算法
+    
+    Args:
+        root: 章节根元素（html）
+        cfi_base: 章节 CFI 基础路径，如 /6/4[chap01]
+        chars: 每个位置包含的字符数
+    """
+    locations = []
+    # 与 querySelector('body') 一致；正常的 XHTML 中 body 是 html 的直接子元素
+    body_index = next((i for i, child in enumerate(root.element_children()) if child.tag == 'body'), None)
+    if body_index is None:
+        return locations
+    
+    body = root.element_children()[body_index]
+    counter = 0
+    range_start = None
+    prev = None
+    
+    for steps, text in _iter_text_steps(body, [('element', body_index, body.id)]):
+        if _js_is_blank(text):
+            continue
+        length = _js_length(text)
+        
+        if counter == 0:
+            range_start = (steps, 0)
+        
+        pos = 0
+        dist = chars - counter
+        if dist > length:
+            # 文本节点比一个分段还短，整体跳过
+            counter += length
+            pos = length
+        
+        while pos < length:
+            dist = chars - counter
+            if counter == 0:
+                # 开始新的区间
+                pos += 1
+                range_start = (steps, pos)
+            
+            if pos + dist >= length:
+                # 剩余部分计入下一个文本节点
+                counter += length - pos
+                pos = length
+            else:
+                pos += dist
+                locations.append(_range_cfi(cfi_base, range_start, (steps, pos)))
+                counter = 0
+        
+        prev = (steps, length)
+    
+    if range_start is not None and prev is not None:
+        locations.append(_range_cfi(cfi_base, range_start, prev))
+    
+    return locations
+
+
+def generate_locations(file_path: str, chars: int = DEFAULT_CHARS) -> List[str]:
+    """为整本书生成位置 CFI 列表（只处理 linear 的 spine 条目）"""
+    locations = []
+    with EpubBook(file_path) as book:
+        for spine_item in book.spine:
+            if not spine_item['linear']:
+                continue
+            try:
+                root = book.load_document(spine_item)
+            except EpubParseError as e:
+                print(f"⚠️ [Locations] 跳过无法解析的章节 {spine_item.get('href')}: {e}")
+                continue
+            locations.extend(parse_section_locations(root, spine_item['cfiBase'], chars))
+    return locations
+
+
+class LocationsIndex:
+    """按内容哈希缓存位置索引，并在后台线程中生成"""
+    
+    def __init__(self, cache_dir: str = LOCATIONS_DIR):
+        self.cache_dir = cache_dir
+        self._hashes: Dict[str, Tuple[Tuple[int, int], str]] = {}  # 文件路径 -> ((大小, mtime), 哈希)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._queue: 'queue.Queue[Tuple[str, int]]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+    
+    def content_hash(self, file_path: str) -> str:
+        """文件内容的 SHA-256（按大小和修改时间记忆，避免重复读取）"""
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._hashes.get(file_path)
+            if cached and cached[0] == signature:
+                return cached[1]
+        
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        
+        with self._lock:
+            self._hashes[file_path] = (signature, content_hash)
+        return content_hash
+    
+    def _cache_path(self, content_hash: str, chars: int) -> str:
+        return os.path.join(self.cache_dir, f"{content_hash}_{chars}.json")
+    
+    def get(self, file_path: str, chars: int = DEFAULT_CHARS) -> Optional[Dict[str, Any]]:
+        """读取已缓存的位置索引，不存在时返回 None"""
+        cache_path = self._cache_path(self.content_hash(file_path), chars)
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def build(self, file_path: str, chars: int = DEFAULT_CHARS) -> Dict[str, Any]:
+        """生成位置索引并写入缓存"""
+        content_hash = self.content_hash(file_path)
+        start = time.time()
+        locations = generate_locations(file_path, chars)
+        index = {
+            'contentHash': content_hash,
+            'chars': chars,
+            'locations': locations,
+            # 与 epub.js 一致：total = 位置数 - 1
+            'total': len(locations) - 1,
+            'generatedAt': int(time.time() * 1000)
+        }
+        
+        os.makedirs(self.cache_dir, exist_ok=True)
+        atomic_write_bytes(self._cache_path(content_hash, chars),
+                           json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        print(f"📍 [Locations] 生成位置索引: {file_path} ({len(locations)} 个, {time.time() - start:.2f}s)")
+        return index
+    
+    def is_pending(self, file_path: str, chars: int = DEFAULT_CHARS) -> bool:
+        with self._lock:
+            return (file_path, chars) in self._pending
+    
+    def schedule(self, file_path: str, chars: int = DEFAULT_CHARS) -> None:
+        """把书籍加入后台生成队列（重复提交会被忽略）"""
+        with self._lock:
+            if (file_path, chars) in self._pending:
+                return
+            self._pending.add((file_path, chars))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='locations-indexer', daemon=True)
+                self._worker.start()
+        self._queue.put((file_path, chars))
+    
+    def _run(self) -> None:
+        while True:
+            file_path, chars = self._queue.get()
+            try:
+                if os.path.exists(file_path) and self.get(file_path, chars) is None:
+                    self.build(file_path, chars)
+            except Exception as e:
+                print(f"❌ [Locations] 生成位置索引失败: {file_path} ({e})")
+            finally:
+                with self._lock:
+                    self._pending.discard((file_path, chars))
+                self._queue.task_done()
+
+
+# 全局位置索引实例
+locations_index = LocationsIndex()
+
+
+def get_locations_index() -> LocationsIndex:
+    """获取全局位置索引实例"""
+    return locations_index
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+EPUB优化模块
+为体积较大的书籍（扫描漫画、插图本）生成优化版本，与原文件放在同一目录
+
+- 缩小过大的图片并重新压缩（需要 Pillow，未安装时跳过图片处理）
+- 未压缩（stored）的文本条目改为 deflate 压缩
+- 删除内容完全相同的重复资源，并改写引用它们的路径
+- 每本书的节省情况记录在 <书籍>.optimized.json 中
+
+章节 XHTML 的节点结构不变，原文件上生成的 CFI / locations 对优化版本同样有效。
+"""
+
+import hashlib
+import io
+import json
+import os
+import posixpath
+import queue
+import re
+import threading
+import time
+import zipfile
+from typing import Dict, Any, Optional, List, Tuple
+
+from file_cache import atomic_write_bytes
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+
+# 设置 EPUB_OPTIMIZE=0 可关闭优化版本（始终提供原文件）
+OPTIMIZE_ENABLED = os.environ.get('EPUB_OPTIMIZE', '1') != '0'
+
+# 图片长边上限和 JPEG 质量（可通过环境变量调整）
+MAX_IMAGE_DIMENSION = int(os.environ.get('EPUB_OPTIMIZE_MAX_DIMENSION', '2048'))
+JPEG_QUALITY = int(os.environ.get('EPUB_OPTIMIZE_JPEG_QUALITY', '80'))
+
+VARIANT_SUFFIX = '.optimized.epub'
+REPORT_SUFFIX = '.optimized.json'
+
+_JPEG_EXTENSIONS = {'.jpg', '.jpeg'}
+_PNG_EXTENSIONS = {'.png'}
+
+# 本身已压缩的格式，再做 deflate 几乎没有收益，保持 stored
+_COMPRESSED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp3', '.mp4', '.m4a',
+    '.ogg', '.woff', '.woff2', '.zip'
+}
+
+# 可能引用其他资源的文本文件
+_TEXT_EXTENSIONS = {
+    '.xhtml', '.html', '.htm', '.xml', '.opf', '.ncx', '.css', '.svg', '.smil', '.js'
+}
+
+# 只对这些二进制资源做去重（文本文件去重需要改写 spine，得不偿失）
+_DEDUPE_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ttf', '.otf', '.woff', '.woff2', '.mp3'
+}
+
+_ITEM_TAG_RE = re.compile(r'<(?:\w+:)?item\b[^>]*?/>', re.IGNORECASE)
+# 删除 manifest 条目时连同所在行的缩进和换行一起删除
+_ITEM_LINE_RE = re.compile(r'[ \t]*(<(?:\w+:)?item\b[^>]*?/>)[ \t]*(?:\r?\n)?', re.IGNORECASE)
+_ATTR_RE = re.compile(r'([\w:-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+
+
+def _extension(path: str) -> str:
+    return posixpath.splitext(path)[1].lower()
+
+
+def _reference_pattern(relative_path: str) -> 're.Pattern':
+    """匹配被引号或括号包围的相对路径（属性值、CSS url()），允许带片段或查询参数"""
+    return re.compile(r'(["\'(])' + re.escape(relative_path) + r'(?=["\')#?])')
+
+
+def recompress_image(data: bytes, extension: str,
+                     max_dimension: int = MAX_IMAGE_DIMENSION,
+                     jpeg_quality: int = JPEG_QUALITY) -> Tuple[bytes, bool]:
+    """
+    缩小并重新压缩单张图片，格式保持不变（OPF 和章节中的引用无需修改）
+    
+    Returns:
+        (新的图片数据, 是否缩小了尺寸)；结果没有变小时返回原数据
+    """
+    if not PIL_AVAILABLE:
+        return data, False
+    
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            resized = max(image.size) > max_dimension
+            if resized:
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            
+            output = io.BytesIO()
+            if extension in _JPEG_EXTENSIONS:
+                if image.mode not in ('RGB', 'L', 'CMYK'):
+                    image = image.convert('RGB')
+                image.save(output, 'JPEG', quality=jpeg_quality, optimize=True, progressive=True)
+            else:
+                image.save(output, 'PNG', optimize=True)
+    except Exception as e:
+        print(f"⚠️ [EpubOptimizer] 图片处理失败，保留原图: {e}")
+        return data, False
+    
+    optimized = output.getvalue()
+    if len(optimized) >= len(data):
+        return data, False
+    return optimized, resized
+
+
+def _find_opf_path(source: zipfile.ZipFile) -> Optional[str]:
+    try:
+        container = source.read('META-INF/container.xml').decode('utf-8', errors='replace')
+    except KeyError:
+        return None
+    match = re.search(r'full-path\s*=\s*["\']([^"\']+)["\']', container)
+    return match.group(1) if match else None
+
+
+def _plan_dedupe(names: List[str], contents: Dict[str, bytes], opf_path: Optional[str]) -> Dict[str, str]:
+    """找出内容重复的资源，返回 {重复路径: 保留路径}"""
+    first_by_hash: Dict[str, str] = {}
+    duplicates: Dict[str, str] = {}
+    for name in names:
+        if _extension(name) not in _DEDUPE_EXTENSIONS:
+            continue
+        digest = hashlib.sha256(contents[name]).hexdigest()
+        canonical = first_by_hash.setdefault(digest, name)
+        # 文件名相同时无法可靠判断引用是否已全部改写，跳过
+        if canonical != name and posixpath.basename(canonical) != posixpath.basename(name):
+            duplicates[name] = canonical
+    
+    if not duplicates or opf_path is None:
+        return {}
+    
+    # 只删除 manifest 中没有被其他地方引用（spine、封面 meta 等）且没有 properties 的条目
+    opf_text = contents[opf_path].decode('utf-8', errors='replace')
+    opf_dir = posixpath.dirname(opf_path)
+    for tag in _ITEM_TAG_RE.findall(opf_text):
+        attrs = {key.lower(): value for key, _, value in _ATTR_RE.findall(tag)}
+        path = posixpath.normpath(posixpath.join(opf_dir, attrs.get('href', '')))
+        if path not in duplicates:
+            continue
+        item_id = attrs.get('id', '')
+        referenced = len(re.findall(r'["\']' + re.escape(item_id) + r'["\']', opf_text)) > 1
+        if attrs.get('properties') or referenced:
+            del duplicates[path]
+    return duplicates
+
+
+def _rewrite_references(name: str, content: bytes, duplicates: Dict[str, str],
+                        opf_path: Optional[str]) -> bytes:
+    """把文本文件中对重复资源的引用改为保留的资源，OPF 中删除重复条目"""
+    try:
+        text = content.decode('utf-8')
+    except UnicodeDecodeError:
+        return content
+    
+    base_dir = posixpath.dirname(name)
+    if name == opf_path:
+        def drop_item(match):
+            attrs = {key.lower(): value for key, _, value in _ATTR_RE.findall(match.group(1))}
+            path = posixpath.normpath(posixpath.join(base_dir, attrs.get('href', '')))
+            return '' if path in duplicates else match.group(0)
+        text = _ITEM_LINE_RE.sub(drop_item, text)
+    
+    for duplicate, canonical in duplicates.items():
+        old = posixpath.relpath(duplicate, base_dir or '.')
+        new = posixpath.relpath(canonical, base_dir or '.')
+        text = _reference_pattern(old).sub(lambda match: match.group(1) + new, text)
+    return text.encode('utf-8')
+
+
+def optimize_epub(source_path: str, target_path: str,
+                  max_dimension: int = MAX_IMAGE_DIMENSION,
+                  jpeg_quality: int = JPEG_QUALITY) -> Dict[str, Any]:
+    """
+    生成优化后的 EPUB
+    
+    Args:
+        source_path: 原始 EPUB 路径
+        target_path: 优化版本的输出路径
+        max_dimension: 图片长边上限（像素）
+        jpeg_quality: JPEG 重新压缩质量
+    
+    Returns:
+        优化报告（大小、处理的图片数、删除的重复资源等）
+    """
+    start = time.time()
+    with zipfile.ZipFile(source_path) as source:
+        infos = [info for info in source.infolist() if not info.is_dir()]
+        names = [info.filename for info in infos]
+        contents = {name: source.read(name) for name in names}
+        opf_path = _find_opf_path(source)
+    
+    duplicates = _plan_dedupe(names, contents, opf_path)
+    
+    # 改写引用，并确认被删除的资源不再被任何文本文件提及；否则放弃删除该资源
+    while True:
+        rewritten = {
+            name: _rewrite_references(name, contents[name], duplicates, opf_path)
+            for name in names
+            if _extension(name) in _TEXT_EXTENSIONS and name not in duplicates
+        }
+        still_referenced = [
+            duplicate for duplicate in duplicates
+            if any(posixpath.basename(duplicate).encode('utf-8') in content for content in rewritten.values())
+        ]
+        if not still_referenced:
+            break
+        for duplicate in still_referenced:
+            del duplicates[duplicate]
+    
+    stats = {'imagesProcessed': 0, 'imagesRecompressed': 0, 'imagesResized': 0, 'deflatedEntries': 0}
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as target:
+        # mimetype 必须是第一个条目且不压缩
+        if 'mimetype' in contents:
+            target.writestr(zipfile.ZipInfo('mimetype'), contents['mimetype'], compress_type=zipfile.ZIP_STORED)
+        
+        for info in infos:
+            name = info.filename
+            if name == 'mimetype' or name in duplicates:
+                continue
+            
+            data = rewritten.get(name, contents[name])
+            extension = _extension(name)
+            if extension in _JPEG_EXTENSIONS or extension in _PNG_EXTENSIONS:
+                stats['imagesProcessed'] += 1
+                optimized, resized = recompress_image(data, extension, max_dimension, jpeg_quality)
+                if optimized is not data:
+                    stats['imagesRecompressed'] += 1
+                    stats['imagesResized'] += int(resized)
+                data = optimized
+            
+            if extension in _COMPRESSED_EXTENSIONS:
+                compress_type = zipfile.ZIP_STORED
+            else:
+                compress_type = zipfile.ZIP_DEFLATED
+                if info.compress_type == zipfile.ZIP_STORED:
+                    stats['deflatedEntries'] += 1
+            
+            entry = zipfile.ZipInfo(name, date_time=info.date_time)
+            entry.external_attr = info.external_attr
+            target.writestr(entry, data, compress_type=compress_type, compresslevel=9)
+    
+    optimized_bytes = output.getvalue()
+    atomic_write_bytes(target_path, optimized_bytes)
+    
+    original_size = os.path.getsize(source_path)
+    report = {
+        'originalSize': original_size,
+        'optimizedSize': len(optimized_bytes),
+        'savedBytes': original_size - len(optimized_bytes),
+        'savedPercent': round((original_size - len(optimized_bytes)) * 100 / original_size, 1) if original_size else 0.0,
+        'duplicatesRemoved': len(duplicates),
+        'pillowAvailable': PIL_AVAILABLE,
+        'maxDimension': max_dimension,
+        'jpegQuality': jpeg_quality,
+        'elapsed': round(time.time() - start, 3),
+        'generatedAt': int(time.time() * 1000)
+    }
+    report.update(stats)
+    return report
+
+
+class EpubOptimizer:
+    """管理书籍的优化版本：按需在后台线程中生成，并记录每本书的节省情况"""
+    
+    def __init__(self):
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+    
+    @staticmethod
+    def variant_path(book_path: str) -> str:
+        return os.path.splitext(book_path)[0] + VARIANT_SUFFIX
+    
+    @staticmethod
+    def report_path(book_path: str) -> str:
+        return os.path.splitext(book_path)[0] + REPORT_SUFFIX
+    
+    @staticmethod
+    def _source_signature(book_path: str) -> List[int]:
+        stat = os.stat(book_path)
+        return [stat.st_size, stat.st_mtime_ns]
+    
+    def get_report(self, book_path: str) -> Optional[Dict[str, Any]]:
+        """读取与当前原文件对应的优化报告，原文件已变化或尚未生成时返回 None"""
+        try:
+            with open(self.report_path(book_path), 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            if report.get('source') != self._source_signature(book_path):
+                return None
+            return report
+        except (OSError, ValueError):
+            return None
+    
+    def get_variant(self, book_path: str) -> Optional[str]:
+        """
+        获取可用的优化版本路径
+        
+        Returns:
+            优化版本路径；尚未生成、已过期或优化后没有变小时返回 None（应提供原文件）
+        """
+        report = self.get_report(book_path)
+        if report is None or report['savedBytes'] <= 0:
+            return None
+        variant = self.variant_path(book_path)
+        return variant if os.path.exists(variant) else None
+    
+    def build(self, book_path: str) -> Dict[str, Any]:
+        """生成优化版本并写入报告"""
+        signature = self._source_signature(book_path)
+        variant = self.variant_path(book_path)
+        report = optimize_epub(book_path, variant)
+        report['source'] = signature
+        
+        if report['savedBytes'] <= 0:
+            # 没有收益，不保留优化文件
+            os.remove(variant)
+        atomic_write_bytes(self.report_path(book_path),
+                           json.dumps(report, ensure_ascii=False, indent=2).encode('utf-8'))
+        
+        print(f"🗜️ [EpubOptimizer] 优化完成: {book_path} "
+              f"{report['originalSize']} -> {report['optimizedSize']} 字节 (节省 {report['savedPercent']}%)")
+        return report
+    
+    def remove(self, book_path: str) -> None:
+        """删除书籍的优化版本和报告"""
+        for path in (self.variant_path(book_path), self.report_path(book_path)):
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                    print(f"🗑️ [EpubOptimizer] 删除优化文件: {path}")
+                except OSError as e:
+                    print(f"❌ [EpubOptimizer] 删除优化文件失败: {e}")
+    
+    def is_pending(self, book_path: str) -> bool:
+        with self._lock:
+            return book_path in self._pending
+    
+    def schedule(self, book_path: str) -> None:
+        """把书籍加入后台优化队列（重复提交会被忽略）"""
+        with self._lock:
+            if book_path in self._pending:
+                return
+            self._pending.add(book_path)
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='epub-optimizer', daemon=True)
+                self._worker.start()
+        self._queue.put(book_path)
+    
+    def _run(self) -> None:
+        while True:
+            book_path = self._queue.get()
+            try:
+                if os.path.exists(book_path) and self.get_report(book_path) is None:
+                    self.build(book_path)
+            except Exception as e:
+                print(f"❌ [EpubOptimizer] 优化失败: {book_path} ({e})")
+            finally:
+                with self._lock:
+                    self._pending.discard(book_path)
+                self._queue.task_done()
+
+
+# 全局优化器实例
+epub_optimizer = EpubOptimizer()
+
+
+def get_epub_optimizer() -> EpubOptimizer:
+    """获取全局优化器实例"""
+    return epub_optimizer
+
+
+if __name__ == '__main__':
+    import sys
+    
+    if len(sys.argv) < 2:
+        print("用法: python3 epub_optimizer.py <book.epub> [...]")
+        sys.exit(1)
+    
+    if not PIL_AVAILABLE:
+        print("⚠️ 未安装 Pillow，只进行压缩和去重，不处理图片")
+    for path in sys.argv[1:]:
+        print(json.dumps(epub_optimizer.build(path), ensure_ascii=False, indent=2))
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+EPUB解析模块
+在服务端读取EPUB结构（container.xml、OPF、spine）并把章节解析为简单的节点树
+
+节点树与浏览器中 epub.js 看到的 DOM 保持一致（保留空白文本节点、注释等），
+以便服务端生成的 CFI 能直接被前端使用。
+"""
+
+import html.entities
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from typing import Dict, Any, Optional, List, Union
+from urllib.parse import unquote
+
+
+CONTAINER_PATH = 'META-INF/container.xml'
+
+# XML 自带的实体，其余 HTML 命名实体在解析失败时替换为字符
+_XML_ENTITIES = {'amp', 'lt', 'gt', 'quot', 'apos'}
+_ENTITY_RE = re.compile(r'&([A-Za-z][A-Za-z0-9]*);')
+
+# HTML 中没有结束标签的元素
+_VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+
+class EpubParseError(Exception):
+    """EPUB 结构无法解析"""
+
+
+class Element:
+    """章节文档中的元素节点"""
+    
+    __slots__ = ('tag', 'id', 'children')
+    
+    def __init__(self, tag: str, element_id: str = ''):
+        self.tag = tag
+        self.id = element_id
+        # 子节点：Element、文本（str）或 Other（注释/处理指令）
+        self.children: List[Union['Element', str, 'Other']] = []
+    
+    def element_children(self) -> List['Element']:
+        """只包含元素的子节点列表（对应 DOM 的 children）"""
+        return [child for child in self.children if isinstance(child, Element)]
+    
+    def find(self, tag: str) -> Optional['Element']:
+        """深度优先查找第一个指定标签的元素（对应 querySelector）"""
+        for child in self.element_children():
+            if child.tag == tag:
+                return child
+            found = child.find(tag)
+            if found is not None:
+                return found
+        return None
+
+
+class Other:
+    """注释、处理指令等非元素非文本节点"""
+    
+    __slots__ = ()
+
+
+def _local_name(tag: str) -> str:
+    """去掉命名空间前缀"""
+    return tag.rsplit('}', 1)[-1].lower() if isinstance(tag, str) else ''
+
+
+def _from_etree(node: ET.Element) -> Element:
+    """把 ElementTree 节点转换为节点树"""
+    element = Element(_local_name(node.tag), node.get('id', ''))
+    if node.text:
+        element.children.append(node.text)
+    for child in node:
+        if child.tag is ET.Comment or child.tag is ET.ProcessingInstruction:
+            element.children.append(Other())
+        else:
+            element.children.append(_from_etree(child))
+        if child.tail:
+            element.children.append(child.tail)
+    return element
+
+
+def _replace_html_entities(text: str) -> str:
+    """把 XML 不认识的 HTML 命名实体（如 &nbsp;）替换为对应字符"""
+    def replace(match):
+        name = match.group(1)
+        if name in _XML_ENTITIES:
+            return match.group(0)
+        char = html.entities.html5.get(name + ';')
+        return char if char is not None else match.group(0)
+    return _ENTITY_RE.sub(replace, text)
+
+
+class _HTMLTreeBuilder(HTMLParser):
+    """宽松的 HTML 解析，作为 XML 解析失败时的后备"""
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Element('#document')
+        self.stack = [self.root]
+    
+    def handle_starttag(self, tag, attrs):
+        element = Element(tag.lower(), dict(attrs).get('id') or '')
+        self.stack[-1].children.append(element)
+        if element.tag not in _VOID_ELEMENTS:
+            self.stack.append(element)
+    
+    def handle_startendtag(self, tag, attrs):
+        self.stack[-1].children.append(Element(tag.lower(), dict(attrs).get('id') or ''))
+    
+    def handle_endtag(self, tag):
+        tag = tag.lower()
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                del self.stack[i:]
+                break
+    
+    def handle_data(self, data):
+        children = self.stack[-1].children
+        if children and isinstance(children[-1], str):
+            children[-1] += data
+        else:
+            children.append(data)
+    
+    def handle_comment(self, data):
+        self.stack[-1].children.append(Other())
+
+
+def parse_document(content: bytes) -> Element:
+    """
+    解析章节（XHTML/HTML）为节点树
+    
+    Returns:
+        根元素（html）
+    """
+    try:
+        parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True, insert_pis=True))
+        try:
+            parser.feed(content)
+            return _from_etree(parser.close())
+        except ET.ParseError:
+            # 常见原因是使用了 &nbsp; 等 HTML 实体
+            text = content.decode('utf-8', errors='replace')
+            parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True, insert_pis=True))
+            parser.feed(_replace_html_entities(text))
+            return _from_etree(parser.close())
+    except ET.ParseError:
+        builder = _HTMLTreeBuilder()
+        builder.feed(content.decode('utf-8', errors='replace'))
+        builder.close()
+        html_element = builder.root.find('html')
+        return html_element if html_element is not None else builder.root
+
+
+def iter_text_nodes(element: Element):
+    """按文档顺序遍历文本节点，产出 (父元素, 文本, 文本节点在父元素文本子节点中的序号)"""
+    text_index = 0
+    for child in element.children:
+        if isinstance(child, str):
+            yield element, child, text_index
+            text_index += 1
+        elif isinstance(child, Element):
+            yield from iter_text_nodes(child)
+
+
+# 提取正文时跳过的元素（注音假名、脚本、样式）
+_NON_TEXT_ELEMENTS = {'rt', 'rp', 'script', 'style', 'head'}
+
+
+# 块级元素，提取文本时可在其后插入分隔符以保留段落边界
+_BLOCK_ELEMENTS = {
+    'p', 'div', 'br', 'li', 'tr', 'dt', 'dd', 'blockquote', 'pre', 'section', 'article',
+    'aside', 'header', 'footer', 'figure', 'figcaption', 'table', 'ul', 'ol', 'dl', 'hr',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6'
+}
+
+
+def extract_text(element: Element, block_separator: str = '') -> str:
+    """
+    提取元素下的纯文本（跳过 ruby 注音等，与 dictionary.js 的 getTextWithoutRuby 一致）
+    
+    Args:
+        block_separator: 每个块级元素之后追加的分隔符（默认不追加）
+    """
+    parts = []
+    for child in element.children:
+        if isinstance(child, str):
+            parts.append(child)
+        elif isinstance(child, Element) and child.tag not in _NON_TEXT_ELEMENTS:
+            parts.append(extract_text(child, block_separator))
+            if block_separator and child.tag in _BLOCK_ELEMENTS:
+                parts.append(block_separator)
+    return ''.join(parts)
+
+
+class EpubBook:
+    """只读打开的 EPUB 文件，提供 OPF 元数据、manifest 和 spine"""
+    
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        try:
+            self.zip = zipfile.ZipFile(file_path)
+        except (zipfile.BadZipFile, OSError) as e:
+            raise EpubParseError(f"无法打开EPUB文件: {e}")
+        
+        self.opf_path = self._find_opf_path()
+        self.opf_dir = posixpath.dirname(self.opf_path)
+        self.metadata: Dict[str, Any] = {}
+        self.manifest: Dict[str, Dict[str, Any]] = {}  # id -> {href, path, mediaType, properties}
+        self.spine: List[Dict[str, Any]] = []
+        self.spine_node_index = 2
+        self.cover_id: Optional[str] = None  # EPUB2 <meta name="cover">
+        self._parse_opf()
+    
+    def close(self) -> None:
+        self.zip.close()
+    
+    def __enter__(self) -> 'EpubBook':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def read(self, path: str) -> bytes:
+        """读取 EPUB 内的文件（路径相对于压缩包根目录）"""
+        try:
+            return self.zip.read(path)
+        except KeyError:
+            raise EpubParseError(f"EPUB中缺少文件: {path}")
+    
+    def _find_opf_path(self) -> str:
+        """从 container.xml 找到 OPF 文件路径"""
+        try:
+            root = ET.fromstring(self.read(CONTAINER_PATH))
+        except ET.ParseError as e:
+            raise EpubParseError(f"container.xml 解析失败: {e}")
+        
+        for node in root.iter():
+            if _local_name(node.tag) == 'rootfile' and node.get('full-path'):
+                return node.get('full-path')
+        raise EpubParseError("container.xml 中没有 rootfile")
+    
+    def resolve(self, href: str) -> str:
+        """把 OPF 中的相对 href 转为压缩包内路径"""
+        href = unquote(href.split('#', 1)[0])
+        return posixpath.normpath(posixpath.join(self.opf_dir, href))
+    
+    def _parse_opf(self) -> None:
+        try:
+            package = ET.fromstring(self.read(self.opf_path))
+        except ET.ParseError as e:
+            raise EpubParseError(f"OPF 解析失败: {e}")
+        
+        spine_node = None
+        for index, child in enumerate(package):
+            name = _local_name(child.tag)
+            if name == 'metadata':
+                self._parse_metadata(child)
+            elif name == 'manifest':
+                for item in child:
+                    if _local_name(item.tag) != 'item' or not item.get('id'):
+                        continue
+                    href = item.get('href', '')
+                    self.manifest[item.get('id')] = {
+                        'id': item.get('id'),
+                        'href': href,
+                        'path': self.resolve(href),
+                        'mediaType': item.get('media-type', ''),
+                        'properties': (item.get('properties') or '').split()
+                    }
+            elif name == 'spine':
+                spine_node = child
+                # epub.js 以 spine 在 package 中的元素序号生成 CFI 基础路径
+                self.spine_node_index = index
+        
+        if spine_node is None:
+            raise EpubParseError("OPF 中没有 spine")
+        
+        self.toc_id = spine_node.get('toc')
+        for index, itemref in enumerate(node for node in spine_node if _local_name(node.tag) == 'itemref'):
+            idref = itemref.get('idref')
+            manifest_item = self.manifest.get(idref, {})
+            self.spine.append({
+                'index': index,
+                'idref': idref,
+                'id': itemref.get('id'),
+                'linear': (itemref.get('linear') or 'yes') == 'yes',
+                'href': manifest_item.get('href'),
+                'path': manifest_item.get('path'),
+                'mediaType': manifest_item.get('mediaType'),
+                'cfiBase': self.cfi_base(index, itemref.get('id'))
+            })
+    
+    def _parse_metadata(self, metadata: ET.Element) -> None:
+        for node in metadata:
+            name = _local_name(node.tag)
+            if name == 'meta' and node.get('name') == 'cover' and node.get('content'):
+                self.cover_id = node.get('content')
+            if name in ('title', 'creator', 'language', 'publisher', 'description', 'identifier') \
+                    and name not in self.metadata and node.text:
+                self.metadata[name] = node.text.strip()
+    
+    def cover_item(self) -> Optional[Dict[str, Any]]:
+        """封面图片的 manifest 条目（EPUB3 cover-image 属性优先，其次 EPUB2 meta）"""
+        for item in self.manifest.values():
+            if 'cover-image' in item['properties']:
+                return item
+        item = self.manifest.get(self.cover_id) if self.cover_id else None
+        if item and item['mediaType'].startswith('image/'):
+            return item
+        return None
+    
+    def cfi_base(self, spine_index: int, itemref_id: Optional[str]) -> str:
+        """与 epub.js generateChapterComponent 相同的章节 CFI 基础路径"""
+        cfi = f"/{(self.spine_node_index + 1) * 2}/{(spine_index + 1) * 2}"
+        if itemref_id:
+            cfi += f"[{itemref_id}]"
+        return cfi
+    
+    def load_document(self, spine_item: Dict[str, Any]) -> Element:
+        """读取并解析 spine 中的章节"""
+        if not spine_item.get('path'):
+            raise EpubParseError(f"spine 条目没有对应的 manifest 项: {spine_item.get('idref')}")
+        return parse_document(self.read(spine_item['path']))
+    
+    def entry_size(self, path: str) -> Dict[str, int]:
+        """压缩包内文件的原始大小和压缩后大小（文件不存在时为 0）"""
+        try:
+            info = self.zip.getinfo(path)
+        except KeyError:
+            return {'size': 0, 'compressedSize': 0}
+        return {'size': info.file_size, 'compressedSize': info.compress_size}
+    
+    def _toc_href(self, document_path: str, href: str) -> str:
+        """把目录文件中的链接转为相对 OPF 目录的 href（与 epub.js rendition.display 一致）"""
+        target, _, fragment = href.partition('#')
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(document_path), unquote(target))) \
+            if target else document_path
+        relative = posixpath.relpath(path, self.opf_dir or '.')
+        return f"{relative}#{fragment}" if fragment else relative
+    
+    def table_of_contents(self) -> List[Dict[str, Any]]:
+        """
+        读取目录：EPUB3 nav 文档优先，其次 EPUB2 的 NCX
+        
+        Returns:
+            [{'label', 'href', 'children': [...]}]，无法解析时返回空列表
+        """
+        nav_item = next((item for item in self.manifest.values() if 'nav' in item['properties']), None)
+        if nav_item:
+            toc = self._parse_nav(nav_item['path'])
+            if toc:
+                return toc
+        
+        ncx_item = self.manifest.get(self.toc_id) if self.toc_id else None
+        if ncx_item is None:
+            ncx_item = next((item for item in self.manifest.values()
+                             if item['mediaType'] == 'application/x-dtbncx+xml'), None)
+        if ncx_item:
+            return self._parse_ncx(ncx_item['path'])
+        return []
+    
+    def _parse_nav(self, nav_path: str) -> List[Dict[str, Any]]:
+        try:
+            root = ET.fromstring(self.read(nav_path))
+        except (ET.ParseError, EpubParseError):
+            return []
+        
+        navs = [node for node in root.iter() if _local_name(node.tag) == 'nav']
+        toc_nav = next((node for node in navs
+                        if any(_local_name(key) == 'type' and 'toc' in value.split()
+                               for key, value in node.attrib.items())), navs[0] if navs else None)
+        if toc_nav is None:
+            return []
+        ol = next((child for child in toc_nav if _local_name(child.tag) == 'ol'), None)
+        return self._parse_nav_list(ol, nav_path) if ol is not None else []
+    
+    def _parse_nav_list(self, ol: ET.Element, nav_path: str) -> List[Dict[str, Any]]:
+        entries = []
+        for li in ol:
+            if _local_name(li.tag) != 'li':
+                continue
+            label_node = next((child for child in li if _local_name(child.tag) in ('a', 'span')), None)
+            children_ol = next((child for child in li if _local_name(child.tag) == 'ol'), None)
+            href = label_node.get('href') if label_node is not None else None
+            entries.append({
+                'label': ' '.join(''.join(label_node.itertext()).split()) if label_node is not None else '',
+                'href': self._toc_href(nav_path, href) if href else None,
+                'children': self._parse_nav_list(children_ol, nav_path) if children_ol is not None else []
+            })
+        return entries
+    
+    def _parse_ncx(self, ncx_path: str) -> List[Dict[str, Any]]:
+        try:
+            root = ET.fromstring(self.read(ncx_path))
+        except (ET.ParseError, EpubParseError):
+            return []
+        nav_map = next((node for node in root.iter() if _local_name(node.tag) == 'navmap'), None)
+        return self._parse_nav_points(nav_map, ncx_path) if nav_map is not None else []
+    
+    def _parse_nav_points(self, parent: ET.Element, ncx_path: str) -> List[Dict[str, Any]]:
+        entries = []
+        for point in parent:
+            if _local_name(point.tag) != 'navpoint':
+                continue
+            label = ''
+            href = None
+            for child in point:
+                name = _local_name(child.tag)
+                if name == 'navlabel':
+                    label = ' '.join(''.join(child.itertext()).split())
+                elif name == 'content' and child.get('src'):
+                    href = self._toc_href(ncx_path, child.get('src'))
+            entries.append({
+                'label': label,
+                'href': href,
+                'children': self._parse_nav_points(point, ncx_path)
+            })
+        return entries
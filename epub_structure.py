@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+书籍结构模块
+从 OPF 和目录文件中读取 spine（含各章节大小）、目录和 manifest，序列化为紧凑 JSON 并按书缓存，
+阅读器在整本 EPUB 下载完成之前就可以显示目录。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from epub_parser import EpubBook
+
+
+# 内存中最多缓存的书籍结构数
+MAX_CACHED_STRUCTURES = 256
+
+
+def build_structure(file_path: str) -> Dict[str, Any]:
+    """
+    解析书籍结构
+    
+    Raises:
+        EpubParseError: EPUB 无法解析
+    """
+    with EpubBook(file_path) as book:
+        spine = []
+        for item in book.spine:
+            entry = {
+                'index': item['index'],
+                'idref': item['idref'],
+                'href': item['href'],
+                'path': item['path'],
+                'linear': item['linear'],
+                'cfiBase': item['cfiBase']
+            }
+            entry.update(book.entry_size(item['path']) if item['path'] else {'size': 0, 'compressedSize': 0})
+            spine.append(entry)
+        
+        manifest = []
+        for item in book.manifest.values():
+            entry = {
+                'id': item['id'],
+                'href': item['href'],
+                'path': item['path'],
+                'mediaType': item['mediaType']
+            }
+            if item['properties']:
+                entry['properties'] = item['properties']
+            entry.update(book.entry_size(item['path']))
+            manifest.append(entry)
+        
+        cover_item = book.cover_item()
+        return {
+            'opfPath': book.opf_path,
+            'metadata': book.metadata,
+            'spine': spine,
+            'toc': book.table_of_contents(),
+            'manifest': manifest,
+            'cover': cover_item['path'] if cover_item else None,
+            'textSize': sum(entry['size'] for entry in spine),
+            'fileSize': os.path.getsize(file_path)
+        }
+
+
+def first_chapter(structure: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """第一个线性阅读的章节（阅读器打开时首先显示）"""
+    for entry in structure['spine']:
+        if entry['linear'] and entry['path']:
+            return entry
+    return structure['spine'][0] if structure['spine'] else None
+
+
+class BookStructureCache:
+    """按文件（大小、修改时间）缓存序列化后的书籍结构"""
+    
+    def __init__(self, max_entries: int = MAX_CACHED_STRUCTURES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[Tuple[int, int], Dict[str, Any], bytes, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    def get(self, file_path: str) -> Tuple[Dict[str, Any], bytes, str]:
+        """
+        获取书籍结构
+        
+        Returns:
+            (结构, 紧凑 JSON, ETag)
+        """
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._entries.get(file_path)
+            if cached and cached[0] == signature:
+                self._entries.move_to_end(file_path)
+                self._hits += 1
+                return cached[1], cached[2], cached[3]
+        
+        structure = build_structure(file_path)
+        body = json.dumps(structure, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        
+        with self._lock:
+            self._misses += 1
+            self._entries[file_path] = (signature, structure, body, etag)
+            self._entries.move_to_end(file_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return structure, body, etag
+    
+    def invalidate(self, file_path: str) -> None:
+        with self._lock:
+            self._entries.pop(file_path, None)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+
+
+# 全局书籍结构缓存实例
+structure_cache = BookStructureCache()
+
+
+def get_structure_cache() -> BookStructureCache:
+    """获取全局书籍结构缓存实例"""
+    return structure_cache
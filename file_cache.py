@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+内存映射文件缓存模块
+为热门书籍（EPUB）和封面提供基于 mmap 的共享缓存
+
+- 同一文件只映射一次，所有请求线程共享同一份页缓存
+- 引用计数：正在发送的文件不会被淘汰
+- 按映射总字节数做 LRU 淘汰
+- 以 memoryview 切片的方式提供数据，发送时不复制
+"""
+
+import mmap
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+
+
+class MappedFile:
+    """一个已映射的文件（缓存条目）"""
+    
+    def __init__(self, path: str, stat: os.stat_result):
+        self.path = path
+        self.size = stat.st_size
+        self.signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        self.refcount = 0
+        self.hits = 0
+        self.stale = False  # 文件已变化或被淘汰，等引用归零后关闭
+        self.last_used = time.time()
+        
+        if self.size:
+            with open(path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self._mmap)
+        else:
+            # 空文件无法映射
+            self._mmap = None
+            self.view = memoryview(b'')
+    
+    def close(self) -> bool:
+        """关闭映射，仍有外部 memoryview 未释放时返回 False"""
+        try:
+            self.view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+            return True
+        except BufferError:
+            return False
+
+
+class MappedFileHandle:
+    """对缓存条目的一次引用，使用完毕后必须 release（支持 with 语句）"""
+    
+    def __init__(self, cache: 'MappedFileCache', entry: MappedFile):
+        self._cache = cache
+        self._entry = entry
+        self._released = False
+    
+    @property
+    def size(self) -> int:
+        return self._entry.size
+    
+    @property
+    def view(self) -> memoryview:
+        """整个文件的只读 memoryview"""
+        return self._entry.view
+    
+    def slice(self, start: int, end: Optional[int] = None) -> memoryview:
+        """返回 [start, end) 区间的 memoryview，不复制数据"""
+        return self._entry.view[start:end]
+    
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._cache._release(self._entry)
+    
+    def __enter__(self) -> 'MappedFileHandle':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+
+class MappedFileCache:
+    """按映射字节数做 LRU 淘汰的共享 mmap 缓存"""
+    
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, MappedFile]' = OrderedDict()  # 最近使用的在末尾
+        self._retired: List[MappedFile] = []  # 已移出缓存但仍被引用的条目
+        self._mapped_bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._bypassed = 0
+    
+    def acquire(self, path: str) -> Optional[MappedFileHandle]:
+        """
+        获取文件的映射句柄
+        
+        Returns:
+            MappedFileHandle；文件不存在或单个文件超过缓存上限时返回 None，
+            调用方应退回普通的文件读取
+        """
+        key = os.path.abspath(path)
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return None
+        
+        if stat.st_size > self.max_bytes:
+            with self._lock:
+                self._bypassed += 1
+            return None
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature != (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+                # 文件已被替换，旧映射退役
+                self._retire(key)
+                entry = None
+            
+            if entry is None:
+                self._misses += 1
+                try:
+                    entry = MappedFile(key, stat)
+                except (OSError, ValueError) as e:
+                    print(f"❌ [MappedFileCache] 映射文件失败: {key} ({e})")
+                    return None
+                self._entries[key] = entry
+                self._mapped_bytes += entry.size
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+            
+            entry.refcount += 1
+            entry.hits += 1
+            entry.last_used = time.time()
+            self._evict()
+            return MappedFileHandle(self, entry)
+    
+    def invalidate(self, path: str) -> None:
+        """文件被删除或改写时调用，移除对应的映射"""
+        key = os.path.abspath(path)
+        with self._lock:
+            if key in self._entries:
+                self._retire(key)
+                self._evict()
+    
+    def clear(self) -> None:
+        """移除所有映射（仍被引用的条目在释放后关闭）"""
+        with self._lock:
+            for key in list(self._entries):
+                self._retire(key)
+            self._evict()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'mappedBytes': self._mapped_bytes,
+                'maxBytes': self.max_bytes,
+                'activeRefs': sum(entry.refcount for entry in self._entries.values())
+                              + sum(entry.refcount for entry in self._retired),
+                'retired': len(self._retired),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'bypassed': self._bypassed,
+                'files': [
+                    {
+                        'path': entry.path,
+                        'size': entry.size,
+                        'refcount': entry.refcount,
+                        'hits': entry.hits,
+                        'lastUsed': int(entry.last_used * 1000)
+                    }
+                    for entry in reversed(self._entries.values())
+                ]
+            }
+    
+    def _release(self, entry: MappedFile) -> None:
+        with self._lock:
+            entry.refcount -= 1
+            self._evict()
+    
+    def _retire(self, key: str) -> None:
+        """把条目移出缓存（调用方需持有锁）"""
+        entry = self._entries.pop(key)
+        entry.stale = True
+        self._retired.append(entry)
+    
+    def _evict(self) -> None:
+        """关闭退役条目，并按 LRU 淘汰未被引用的条目直到不超过字节上限（调用方需持有锁）"""
+        self._close_retired()
+        for key in list(self._entries):
+            if self._mapped_bytes <= self.max_bytes:
+                break
+            if self._entries[key].refcount == 0:
+                self._retire(key)
+                self._evictions += 1
+                self._close_retired()
+    
+    def _close_retired(self) -> None:
+        """关闭不再被引用的退役条目（调用方需持有锁）"""
+        still_retired = []
+        for entry in self._retired:
+            if entry.refcount == 0 and entry.close():
+                self._mapped_bytes -= entry.size
+            else:
+                still_retired.append(entry)
+        self._retired = still_retired
+
+
+def atomic_write_bytes(path: str, content: bytes) -> None:
+    """
+    写入临时文件后重命名替换目标文件
+    
+    已映射的旧文件 inode 保持不变，避免截断正在被 mmap 读取的文件（会导致 SIGBUS）
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+# 全局文件缓存实例（大小可通过环境变量 EPUB_MMAP_CACHE_MB 调整）
+file_cache = MappedFileCache(int(os.environ.get('EPUB_MMAP_CACHE_MB', '512')) * 1024 * 1024)
+
+
+def get_file_cache() -> MappedFileCache:
+    """获取全局文件缓存实例"""
+    return file_cache
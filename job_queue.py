@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+持久化后台任务队列模块
+请求处理中耗时的工作（删除书籍文件、生成位置索引和章节文本等）写入 jobs 表后立即返回，
+由后台线程池执行。任务保存在数据库中，服务重启后继续执行未完成的任务。
+
+- 任务类型用 register 注册处理函数，处理函数必须幂等（重复执行结果相同），失败后按指数退避重试
+- 同一类型同一 key 同时只有一个未完成的任务，重复提交直接返回已有任务
+- 服务异常退出时处于 running 状态的任务在下次启动时重新排队
+- 任务状态可通过 /api/jobs 和 /api/jobs/<id> 查看
+"""
+
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+
+from models import HotQueries
+
+
+# 工作线程数（可通过环境变量 EPUB_JOB_WORKERS 调整）
+JOB_WORKERS = int(os.environ.get('EPUB_JOB_WORKERS', '2'))
+
+# 默认最大尝试次数，以及重试退避的基数和上限（秒）
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+# 没有到期任务时的最长等待时间（秒）
+POLL_INTERVAL = 5.0
+
+# 已完成任务保留的时间（毫秒）
+FINISHED_RETENTION_MS = 7 * 24 * 3600 * 1000
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class JobQueue:
+    """持久化任务队列和工作线程池"""
+    
+    def __init__(self, db_path: str, workers: int = JOB_WORKERS):
+        self.db_path = db_path
+        self.workers = max(1, workers)
+        self._handlers: Dict[str, Dict[str, Any]] = {}
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        self._notified = False
+        self._completed = 0
+        self._retried = 0
+        self._failed = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        # 手动管理事务（BEGIN IMMEDIATE），领取任务时不会被其他线程抢走
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def register(self, job_type: str, handler: Callable[[Dict[str, Any]], None],
+                 max_attempts: int = MAX_ATTEMPTS) -> None:
+        """注册任务类型的处理函数 handler(payload)，抛出异常表示失败（稍后重试）"""
+        self._handlers[job_type] = {'handler': handler, 'max_attempts': max(1, max_attempts)}
+    
+    def enqueue(self, job_type: str, payload: Optional[Dict[str, Any]] = None, key: Optional[str] = None,
+                delay: float = 0) -> int:
+        """
+        提交任务，返回任务ID
+        
+        Args:
+            key: 去重键，同一类型同一 key 已有未完成的任务时直接返回该任务（默认为 payload 本身）
+            delay: 延迟执行的秒数
+        """
+        if job_type not in self._handlers:
+            raise ValueError(f'未注册的任务类型: {job_type}')
+        payload_json = json.dumps(payload or {}, ensure_ascii=False, sort_keys=True)
+        key = key if key is not None else payload_json
+        now = _now_ms()
+        with self._connect() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO jobs (type, key, payload, status, max_attempts, run_after, created_at, updated_at)
+                VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)
+            ''', (job_type, key, payload_json, self._handlers[job_type]['max_attempts'],
+                  now + int(delay * 1000), now, now))
+            row = conn.execute('''
+                SELECT id FROM jobs WHERE type = ? AND key = ? AND status IN ('queued', 'running')
+            ''', (job_type, key)).fetchone()
+        with self._wakeup:
+            self._notified = True
+            self._wakeup.notify()
+        return row['id']
+    
+    def start(self) -> None:
+        """重新排队上次未执行完的任务，并启动工作线程"""
+        with self._connect() as conn:
+            recovered = conn.execute('''
+                UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'
+            ''', (_now_ms(),)).rowcount
+            conn.execute("DELETE FROM jobs WHERE status = 'done' AND finished_at < ?",
+                         (_now_ms() - FINISHED_RETENTION_MS,))
+        if recovered:
+            print(f"🔁 [JobQueue] 重新排队未完成的任务: {recovered} 个")
+        
+        with self._lock:
+            self._stopping = False
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"⚙️ [JobQueue] 后台任务线程已启动: {self.workers} 个")
+    
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+    
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._job_to_dict(row) if row else None
+    
+    def list_jobs(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            if status:
+                rows = conn.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?',
+                                    (status, limit)).fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        return [self._job_to_dict(row) for row in rows]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            counts = {row['status']: row['count'] for row in conn.execute(
+                'SELECT status, COUNT(*) AS count FROM jobs GROUP BY status')}
+        with self._lock:
+            return {
+                'workers': sum(1 for thread in self._threads if thread.is_alive()),
+                'types': sorted(self._handlers),
+                'counts': counts,
+                'completed': self._completed,
+                'retried': self._retried,
+                'failed': self._failed
+            }
+    
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"❌ [JobQueue] 领取任务失败: {e}")
+                job = None
+            if job is None:
+                timeout = self._next_wait()
+                with self._wakeup:
+                    # 计算等待时间期间提交的任务不会错过
+                    if not self._stopping and not self._notified:
+                        self._wakeup.wait(timeout)
+                    self._notified = False
+                continue
+            try:
+                self._execute(job)
+            except sqlite3.Error as e:
+                # 任务状态没有写入（例如数据库长时间被锁），工作线程继续运行
+                print(f"❌ [JobQueue] 更新任务状态失败: #{job['id']} {job['type']} ({e})")
+                self._requeue(job)
+    
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """领取一个到期的任务（标记为 running 并增加尝试次数）"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            now = _now_ms()
+            job = conn.execute(HotQueries.CLAIM_JOB, (now,)).fetchone()
+            if job is not None:
+                conn.execute('''
+                    UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?
+                ''', (now, job['id']))
+            conn.execute('COMMIT')
+            return job
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+    
+    def _next_wait(self) -> float:
+        """距离下一个排队任务到期的秒数（不超过 POLL_INTERVAL）"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute("SELECT MIN(run_after) AS run_after FROM jobs WHERE status = 'queued'").fetchone()
+        except sqlite3.Error:
+            return POLL_INTERVAL
+        if row['run_after'] is None:
+            return POLL_INTERVAL
+        return min(POLL_INTERVAL, max(0.05, (row['run_after'] - _now_ms()) / 1000))
+    
+    def _execute(self, job: sqlite3.Row) -> None:
+        entry = self._handlers.get(job['type'])
+        attempts = job['attempts'] + 1
+        start = time.time()
+        try:
+            if entry is None:
+                raise ValueError(f"未注册的任务类型: {job['type']}")
+            entry['handler'](json.loads(job['payload'] or '{}'))
+        except Exception as e:
+            self._fail(job, attempts, e)
+            return
+        
+        now = _now_ms()
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'done', error = NULL, updated_at = ?, finished_at = ? WHERE id = ?
+            ''', (now, now, job['id']))
+        with self._lock:
+            self._completed += 1
+        print(f"✅ [JobQueue] 任务完成: #{job['id']} {job['type']} ({time.time() - start:.2f}s)")
+    
+    def _fail(self, job: sqlite3.Row, attempts: int, error: Exception) -> None:
+        now = _now_ms()
+        if attempts >= job['max_attempts']:
+            status, run_after = 'failed', job['run_after']
+            print(f"❌ [JobQueue] 任务失败（已尝试 {attempts} 次）: #{job['id']} {job['type']} ({error})")
+        else:
+            # 指数退避，加随机抖动避免同时重试
+            delay = min(BACKOFF_MAX, BACKOFF_BASE ** attempts) * random.uniform(0.8, 1.2)
+            status, run_after = 'queued', now + int(delay * 1000)
+            print(f"⚠️ [JobQueue] 任务出错，{delay:.1f}s 后重试: #{job['id']} {job['type']} ({error})")
+        with self._connect() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = ?, run_after = ?, error = ?, updated_at = ?,
+                    finished_at = CASE WHEN ? = 'failed' THEN ? ELSE NULL END
+                WHERE id = ?
+            ''', (status, run_after, str(error), now, status, now, job['id']))
+        with self._lock:
+            if status == 'failed':
+                self._failed += 1
+            else:
+                self._retried += 1
+    
+    def _requeue(self, job: sqlite3.Row) -> None:
+        """状态更新失败的任务稍后重新执行（处理函数幂等）；仍然失败时保持 running，下次启动时重新排队"""
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    UPDATE jobs SET status = 'queued', run_after = ?, updated_at = ? WHERE id = ? AND status = 'running'
+                ''', (_now_ms() + int(BACKOFF_BASE * 1000), _now_ms(), job['id']))
+        except sqlite3.Error as e:
+            print(f"❌ [JobQueue] 任务重新排队失败: #{job['id']} {job['type']} ({e})")
+    
+    @staticmethod
+    def _job_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'type': row['type'],
+            'key': row['key'],
+            'payload': json.loads(row['payload'] or '{}'),
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'maxAttempts': row['max_attempts'],
+            'runAfter': row['run_after'],
+            'error': row['error'],
+            'createdAt': row['created_at'],
+            'updatedAt': row['updated_at'],
+            'finishedAt': row['finished_at']
+        }
+
+
+# 全局任务队列实例
+job_queue = None
+
+
+def get_job_queue(db_path: str = 'books_data.db') -> JobQueue:
+    """获取全局任务队列实例"""
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue(db_path)
+    return job_queue
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+HTTP/1.1 长连接模块
+KeepAliveMixin 放在请求处理类的最前面，让一个连接依次处理多个请求：
+
+- 声明了 Content-Length 的响应直接发送
+- 没有声明长度的响应先写入内存缓冲区，处理完后补上 Content-Length 再发送
+- 流式响应（书库导出、NDJSON 上传进度）使用 start_stream / write_stream / end_stream，
+  HTTP/1.1 客户端使用 chunked 编码，HTTP/1.0 客户端写完后关闭连接
+- 请求体没有读完的请求（例如出错提前返回）在响应后关闭连接，剩余数据不会被当作下一个请求解析
+- 空闲超过 KEEP_ALIVE_TIMEOUT 秒或处理满 KEEP_ALIVE_MAX_REQUESTS 个请求后关闭连接
+- socket 超时限制的是单次 sendall 的总时间，响应体按 WRITE_CHUNK_SIZE 分段写入，每段单独计算超时，
+  慢速客户端下载大文件时不会被中途截断
+"""
+
+import io
+import os
+from typing import Optional
+
+
+# 连接空闲超时（秒），也是读取请求和发送响应时单次 socket 操作的超时
+KEEP_ALIVE_TIMEOUT = int(os.environ.get('EPUB_KEEPALIVE_TIMEOUT', '15'))
+
+# 每个连接最多处理的请求数
+KEEP_ALIVE_MAX_REQUESTS = int(os.environ.get('EPUB_KEEPALIVE_MAX', '100'))
+
+# 未读完的请求体不超过该大小时直接读掉，连接可以继续使用
+MAX_DRAIN_BYTES = 64 * 1024
+
+# 每次写入 socket 的最大字节数（超时相当于连续 KEEP_ALIVE_TIMEOUT 秒发送不出一段数据）
+WRITE_CHUNK_SIZE = 64 * 1024
+
+
+class RequestBody:
+    """当前请求的请求体，读取不会越过 Content-Length，并记录剩余未读的字节数"""
+    
+    def __init__(self, rfile, length: int):
+        self.rfile = rfile
+        self.remaining = length
+    
+    def read(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        if size <= 0:
+            return b''
+        data = self.rfile.read(size)
+        self.remaining -= len(data)
+        return data
+    
+    def readline(self, size: Optional[int] = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        if size <= 0:
+            return b''
+        data = self.rfile.readline(size)
+        self.remaining -= len(data)
+        return data
+    
+    def drain(self) -> bool:
+        """读掉剩余的请求体（不超过 MAX_DRAIN_BYTES），返回是否已读完"""
+        if self.remaining > MAX_DRAIN_BYTES:
+            return False
+        while self.remaining > 0:
+            if not self.read(self.remaining):
+                return False
+        return True
+
+
+class SegmentedWriter:
+    """socket 写入包装：大块数据分段写入，每段的发送时间单独受 socket 超时限制"""
+    
+    def __init__(self, wfile, chunk_size: int = WRITE_CHUNK_SIZE):
+        self._wfile = wfile
+        self.chunk_size = chunk_size
+    
+    def write(self, data) -> int:
+        view = memoryview(data).cast('B')
+        if len(view) <= self.chunk_size:
+            return self._wfile.write(view)
+        for start in range(0, len(view), self.chunk_size):
+            self._wfile.write(view[start:start + self.chunk_size])
+        return len(view)
+    
+    def __getattr__(self, name):
+        return getattr(self._wfile, name)
+
+
+class KeepAliveMixin:
+    """HTTP/1.1 长连接支持（需放在 BaseHTTPRequestHandler 子类之前）"""
+    
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+    
+    def setup(self):
+        super().setup()
+        self.wfile = SegmentedWriter(self.wfile)
+        self.requests_handled = 0
+        self._stream_chunked = False
+        self._reset_response_state()
+    
+    def _reset_response_state(self) -> None:
+        self._response_status = None
+        self._response_framed = False
+        self._connection_header_sent = False
+        self._response_buffer: Optional[io.BytesIO] = None
+        self._socket_wfile = None
+    
+    def handle_one_request(self):
+        self.requests_handled += 1
+        self._reset_response_state()
+        # 读到请求行之前的超时是空闲超时
+        self._awaiting_request = True
+        socket_rfile = self.rfile
+        try:
+            super().handle_one_request()
+        finally:
+            self.rfile = socket_rfile
+        
+        body = getattr(self, '_request_body', None)
+        self._request_body = None
+        if body is not None and not body.drain():
+            # 请求体没有读完，剩余数据无法和下一个请求区分，只能关闭连接
+            self.close_connection = True
+        if self._response_buffer is not None:
+            self._send_buffered_response()
+    
+    def parse_request(self):
+        self._awaiting_request = False
+        if not super().parse_request():
+            return False
+        self._request_body = None
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = 0
+        if length > 0:
+            self._request_body = RequestBody(self.rfile, length)
+            self.rfile = self._request_body
+        elif self.headers.get('Transfer-Encoding'):
+            # 不支持 chunked 请求体，处理完后关闭连接
+            self.close_connection = True
+        return True
+    
+    def send_response(self, code, message=None):
+        if self._response_buffer is not None:
+            # 缓冲中的响应还没有发出（处理过程中出错后改为发送错误响应），直接丢弃
+            self._discard_buffered_response()
+        self._response_status = code
+        self._response_framed = False
+        self._connection_header_sent = False
+        super().send_response(code, message)
+    
+    def send_header(self, keyword, value):
+        lowered = keyword.lower()
+        if lowered in ('content-length', 'transfer-encoding'):
+            self._response_framed = True
+        elif lowered == 'connection':
+            self._connection_header_sent = True
+        super().send_header(keyword, value)
+    
+    def end_headers(self):
+        has_body = self.command != 'HEAD' and self._response_status is not None and \
+            self._response_status >= 200 and self._response_status not in (204, 304)
+        if has_body and not self._response_framed:
+            # 长度未知：先缓冲响应体，处理完后补上 Content-Length
+            self._socket_wfile = self.wfile
+            self._response_buffer = io.BytesIO()
+            self.wfile = self._response_buffer
+            return
+        self._send_connection_headers()
+        super().end_headers()
+    
+    def start_stream(self) -> None:
+        """结束响应头并开始流式响应体（代替 end_headers）"""
+        if self.request_version == 'HTTP/1.1':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self._stream_chunked = True
+        else:
+            self.send_header('Connection', 'close')
+            self._stream_chunked = False
+        self.end_headers()
+    
+    def write_stream(self, data: bytes) -> None:
+        if not data:
+            # 空的 chunk 表示响应结束，不能发送
+            return
+        if self._stream_chunked:
+            self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+        else:
+            self.wfile.write(data)
+    
+    def end_stream(self) -> None:
+        if self._stream_chunked:
+            self.wfile.write(b'0\r\n\r\n')
+        self._stream_chunked = False
+    
+    def log_error(self, format, *args):
+        if format.startswith('Request timed out') and getattr(self, '_awaiting_request', False):
+            # 长连接空闲超时关闭是正常情况，不记录；处理请求或发送响应过程中的超时照常记录
+            return
+        super().log_error(format, *args)
+    
+    def _send_connection_headers(self) -> None:
+        if self._connection_header_sent:
+            return
+        body = getattr(self, '_request_body', None)
+        if body is not None and body.remaining > MAX_DRAIN_BYTES:
+            # 请求体没有读完且无法读掉（例如提前返回错误），响应后关闭连接
+            self.close_connection = True
+        if self.close_connection:
+            if self.request_version == 'HTTP/1.1':
+                self.send_header('Connection', 'close')
+        elif self.requests_handled >= KEEP_ALIVE_MAX_REQUESTS:
+            self.send_header('Connection', 'close')
+        else:
+            if self.request_version != 'HTTP/1.1':
+                self.send_header('Connection', 'keep-alive')
+            self.send_header('Keep-Alive', f'timeout={KEEP_ALIVE_TIMEOUT}, '
+                                           f'max={KEEP_ALIVE_MAX_REQUESTS - self.requests_handled}')
+    
+    def _send_buffered_response(self) -> None:
+        body = self._response_buffer.getvalue()
+        self.wfile = self._socket_wfile
+        self._response_buffer = None
+        self.send_header('Content-Length', str(len(body)))
+        self._send_connection_headers()
+        super().end_headers()
+        self.wfile.write(body)
+    
+    def _discard_buffered_response(self) -> None:
+        self.wfile = self._socket_wfile
+        self._response_buffer = None
+        self._headers_buffer = []
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+书库导出/导入模块
+把所有 EPUB、封面和数据库快照打包为一个 zip，边生成边发送，不在内存中缓存整个归档
+
+- 数据库通过 SQLite 在线备份 API 分批复制，得到一致的快照，复制期间不长时间阻塞写入
+- EPUB 和图片本身已压缩，直接存储（ZIP_STORED）；数据库使用 deflate 压缩
+- 导入时请求体分块写入临时文件，逐个条目解压恢复，数据库同样通过备份 API 替换
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import zipfile
+from typing import Dict, Any, Iterator, BinaryIO
+
+from models import DatabaseSchema
+
+
+# 归档格式版本（写入 manifest.json）
+ARCHIVE_FORMAT = 1
+
+# 读写文件时的分块大小
+CHUNK_SIZE = 256 * 1024
+
+# 在线备份每一步复制的页数，步与步之间释放锁，其他连接可以继续写入
+BACKUP_PAGES = 256
+
+DB_ENTRY = 'books_data.db'
+MANIFEST_ENTRY = 'manifest.json'
+BOOKS_PREFIX = 'books/'
+
+# 本身已压缩的文件类型，不再压缩
+_STORED_EXTENSIONS = {'.epub', '.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+class LibraryArchiveError(Exception):
+    """归档格式错误或内容不合法"""
+
+
+class _StreamSink:
+    """只追加的输出缓冲，zipfile 写入后由生成器取走，不支持 seek"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def snapshot_database(db_path: str, dest_path: str) -> None:
+    """使用在线备份 API 把数据库复制为一致的快照"""
+    source = sqlite3.connect(db_path)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=BACKUP_PAGES)
+    finally:
+        dest.close()
+        source.close()
+
+
+def _archive_name(file_path: str) -> str:
+    """书库文件在归档中的名称（books/ 下的相对路径）"""
+    name = os.path.relpath(file_path).replace(os.sep, '/')
+    if not name.startswith(BOOKS_PREFIX) or '/../' in f'/{name}':
+        name = BOOKS_PREFIX + os.path.basename(file_path)
+    return name
+
+
+def _prepare_snapshot(snapshot_path: str) -> Dict[str, str]:
+    """
+    整理快照中的文件路径，使其与归档条目一致
+    
+    Returns:
+        {归档条目名: 本地文件路径}
+    """
+    files = {}
+    conn = sqlite3.connect(snapshot_path)
+    try:
+        rows = conn.execute('SELECT book_id, file_path, cover_path FROM books').fetchall()
+        for book_id, file_path, cover_path in rows:
+            for column, local_path in (('file_path', file_path), ('cover_path', cover_path)):
+                if not local_path or not os.path.isfile(local_path):
+                    continue
+                name = _archive_name(local_path)
+                files[name] = local_path
+                if name != local_path:
+                    conn.execute(f'UPDATE books SET {column} = ? WHERE book_id = ?', (name, book_id))
+        conn.commit()
+    finally:
+        conn.close()
+    return files
+
+
+def _write_file(archive: zipfile.ZipFile, sink: _StreamSink, local_path: str, name: str,
+                compress_type: int) -> Iterator[bytes]:
+    """把一个文件分块写入归档，每写一块就交出已生成的数据"""
+    info = zipfile.ZipInfo.from_file(local_path, name)
+    info.compress_type = compress_type
+    with open(local_path, 'rb') as source, archive.open(info, 'w') as target:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            target.write(chunk)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def iter_export_archive(db_path: str) -> Iterator[bytes]:
+    """
+    生成整个书库的 zip 归档
+    
+    Args:
+        db_path: 书库数据库路径
+    
+    Yields:
+        归档数据块
+    """
+    fd, snapshot_path = tempfile.mkstemp(prefix='.export-', suffix='.db')
+    os.close(fd)
+    try:
+        snapshot_database(db_path, snapshot_path)
+        files = _prepare_snapshot(snapshot_path)
+        
+        sink = _StreamSink()
+        with zipfile.ZipFile(sink, 'w', allowZip64=True) as archive:
+            manifest = {
+                'format': ARCHIVE_FORMAT,
+                'schemaVersion': DatabaseSchema.VERSION,
+                'createdAt': int(time.time() * 1000),
+                'files': sorted(files)
+            }
+            archive.writestr(MANIFEST_ENTRY, json.dumps(manifest, ensure_ascii=False, indent=2))
+            yield from _write_file(archive, sink, snapshot_path, DB_ENTRY, zipfile.ZIP_DEFLATED)
+            
+            for name, local_path in sorted(files.items()):
+                extension = os.path.splitext(name)[1].lower()
+                compress_type = zipfile.ZIP_STORED if extension in _STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                yield from _write_file(archive, sink, local_path, name, compress_type)
+        
+        # 中央目录
+        yield sink.drain()
+        print(f"📦 [LibraryArchive] 导出完成: {len(files)} 个文件")
+    finally:
+        os.remove(snapshot_path)
+
+
+def spool_upload(stream: BinaryIO, length: int, directory: str) -> str:
+    """把请求体分块写入临时文件，返回临时文件路径"""
+    fd, temp_path = tempfile.mkstemp(prefix='.import-', suffix='.zip', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            remaining = length
+            while remaining > 0:
+                chunk = stream.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise LibraryArchiveError("请求体不完整")
+                f.write(chunk)
+                remaining -= len(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def _check_entry_name(name: str) -> None:
+    """只允许 manifest、数据库和 books/ 下的文件，拒绝路径穿越"""
+    if name in (MANIFEST_ENTRY, DB_ENTRY):
+        return
+    parts = name.split('/')
+    if not name.startswith(BOOKS_PREFIX) or name.endswith('/') or '..' in parts or '' in parts or '\\' in name:
+        raise LibraryArchiveError(f"不允许的归档条目: {name}")
+
+
+def _extract_entry(archive: zipfile.ZipFile, name: str, dest_path: str) -> None:
+    """把一个条目分块解压到临时文件后替换目标文件（已映射的旧文件不受影响）"""
+    directory = os.path.dirname(os.path.abspath(dest_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as target, archive.open(name) as source:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                target.write(chunk)
+        os.replace(temp_path, dest_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def import_archive(archive_path: str, db_path: str) -> Dict[str, Any]:
+    """
+    从归档恢复书库：写入所有书籍和封面文件，再用归档中的数据库替换当前数据库
+    
+    Raises:
+        LibraryArchiveError: 归档格式错误
+    """
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile as e:
+        raise LibraryArchiveError(f"不是有效的 zip 文件: {e}")
+    
+    with archive:
+        names = [info.filename for info in archive.infolist() if not info.is_dir()]
+        if DB_ENTRY not in names or MANIFEST_ENTRY not in names:
+            raise LibraryArchiveError("归档缺少 manifest.json 或 books_data.db")
+        for name in names:
+            _check_entry_name(name)
+        
+        try:
+            manifest = json.loads(archive.read(MANIFEST_ENTRY).decode('utf-8'))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise LibraryArchiveError(f"manifest.json 无法解析: {e}")
+        if manifest.get('format') != ARCHIVE_FORMAT:
+            raise LibraryArchiveError(f"不支持的归档格式: {manifest.get('format')}")
+        
+        book_files = [name for name in names if name.startswith(BOOKS_PREFIX)]
+        for name in book_files:
+            _extract_entry(archive, name, name)
+        
+        directory = os.path.dirname(os.path.abspath(db_path))
+        fd, snapshot_path = tempfile.mkstemp(prefix='.import-', suffix='.db', dir=directory)
+        os.close(fd)
+        try:
+            _extract_entry(archive, DB_ENTRY, snapshot_path)
+            # 备份 API 在一个事务内替换当前数据库的全部页面
+            snapshot_database(snapshot_path, db_path)
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+    
+    # 旧版本导出的数据库升级到当前版本
+    DatabaseSchema.init_database(db_path)
+    
+    print(f"📦 [LibraryArchive] 导入完成: {len(book_files)} 个文件")
+    return {
+        'files': len(book_files),
+        'schemaVersion': manifest.get('schemaVersion'),
+        'createdAt': manifest.get('createdAt')
+    }
@@ -12,7 +12,7 @@ class DatabaseSchema:
     """数据库模式管理"""
     
     # 当前数据库版本
-    VERSION = 2
+    VERSION = 6
     
     @staticmethod
     def init_database(db_path: str) -> None:
@@ -133,8 +133,105 @@ class DatabaseSchema:
             )
         ''')
         
+        # 创建阅读历史和统计汇总表
+        DatabaseSchema._create_reading_stats_tables(cursor)
+        
+        # 创建后台数据迁移进度表
+        DatabaseSchema._create_data_migrations_table(cursor)
+        
+        # 创建后台任务队列表
+        DatabaseSchema._create_jobs_table(cursor)
+        
         print("📚 [DatabaseSchema] 所有表创建完成")
     
+    @staticmethod
+    def _create_reading_stats_tables(cursor: sqlite3.Cursor) -> None:
+        """创建阅读事件表（只追加）及按天、按书的汇总表"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reading_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                book_id TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
+                cfi TEXT,
+                percentage REAL DEFAULT 0.0,
+                chapter_title TEXT,
+                duration_ms INTEGER DEFAULT 0,
+                pages INTEGER DEFAULT 0,
+                percentage_delta REAL DEFAULT 0.0,
+                FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reading_daily_stats (
+                day TEXT NOT NULL,
+                book_id TEXT NOT NULL,
+                duration_ms INTEGER DEFAULT 0,
+                pages INTEGER DEFAULT 0,
+                percentage_gained REAL DEFAULT 0.0,
+                events INTEGER DEFAULT 0,
+                PRIMARY KEY (day, book_id)
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS reading_book_stats (
+                book_id TEXT PRIMARY KEY,
+                duration_ms INTEGER DEFAULT 0,
+                pages INTEGER DEFAULT 0,
+                percentage_gained REAL DEFAULT 0.0,
+                events INTEGER DEFAULT 0,
+                sessions INTEGER DEFAULT 0,
+                first_read INTEGER,
+                last_read INTEGER,
+                FOREIGN KEY (book_id) REFERENCES books (book_id) ON DELETE CASCADE
+            )
+        ''')
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reading_events_book_time ON reading_events (book_id, timestamp)')
+    
+    @staticmethod
+    def _create_data_migrations_table(cursor: sqlite3.Cursor) -> None:
+        """创建后台数据迁移进度表（每个迁移一行，记录处理到的 rowid）"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_migrations (
+                name TEXT PRIMARY KEY,
+                status TEXT NOT NULL DEFAULT 'pending',
+                position INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                total INTEGER DEFAULT 0,
+                error TEXT,
+                started_at INTEGER,
+                updated_at INTEGER,
+                finished_at INTEGER
+            )
+        ''')
+    
+    @staticmethod
+    def _create_jobs_table(cursor: sqlite3.Cursor) -> None:
+        """创建后台任务队列表（job_queue.JobQueue），同一类型同一 key 同时只有一个未完成的任务"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER DEFAULT 0,
+                max_attempts INTEGER DEFAULT 5,
+                run_after INTEGER NOT NULL,
+                error TEXT,
+                created_at INTEGER,
+                updated_at INTEGER,
+                finished_at INTEGER
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs (status, run_after)')
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending_key ON jobs (type, key)
+            WHERE status IN ('queued', 'running')
+        ''')
+    
     @staticmethod
     def _create_all_indexes(cursor: sqlite3.Cursor) -> None:
         """创建所有索引"""
@@ -145,12 +242,25 @@ class DatabaseSchema:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_books_added_date ON books (added_date)')
         
         # 注释表索引
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annotations_book_id ON annotations (book_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_annotations_type ON annotations (type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_annotations_timestamp ON annotations (timestamp)')
         
+        # 与查询条件和排序一致的复合索引
+        DatabaseSchema._create_query_indexes(cursor)
+        
         print("📚 [DatabaseSchema] 所有索引创建完成")
     
+    @staticmethod
+    def _create_query_indexes(cursor: sqlite3.Cursor) -> None:
+        """创建与 SQLiteDataManager 热点查询匹配的复合索引"""
+        # 按书籍（和类型）获取注释，并按时间排序
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annotations_book_type_time ON annotations (book_id, type, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_annotations_book_time ON annotations (book_id, timestamp)')
+        
+        # 阅读统计：单本书的每日统计，以及按最近阅读时间排序的书籍统计
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reading_daily_stats_book_day ON reading_daily_stats (book_id, day)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_reading_book_stats_last_read ON reading_book_stats (last_read)')
+    
     @staticmethod
     def _migrate(cursor: sqlite3.Cursor, from_version: int, to_version: int) -> None:
         """
@@ -166,6 +276,14 @@ class DatabaseSchema:
         # 版本迁移逻辑
         if from_version < 2:
             DatabaseSchema._migrate_v1_to_v2(cursor)
+        if from_version < 3:
+            DatabaseSchema._migrate_v2_to_v3(cursor)
+        if from_version < 4:
+            DatabaseSchema._migrate_v3_to_v4(cursor)
+        if from_version < 5:
+            DatabaseSchema._migrate_v4_to_v5(cursor)
+        if from_version < 6:
+            DatabaseSchema._migrate_v5_to_v6(cursor)
         
         # 更新版本号
         DatabaseSchema._set_version(cursor, to_version)
@@ -182,6 +300,33 @@ class DatabaseSchema:
                 print("📚 [DatabaseSchema] font_size 列已存在，跳过")
             else:
                 raise
+    
+    @staticmethod
+    def _migrate_v2_to_v3(cursor: sqlite3.Cursor) -> None:
+        """从版本2迁移到版本3：添加阅读事件表和统计汇总表"""
+        DatabaseSchema._create_reading_stats_tables(cursor)
+        print("📚 [DatabaseSchema] 已添加阅读历史和统计表")
+    
+    @staticmethod
+    def _migrate_v3_to_v4(cursor: sqlite3.Cursor) -> None:
+        """从版本3迁移到版本4：添加复合索引，删除被复合索引覆盖的单列索引，并更新统计信息"""
+        DatabaseSchema._create_query_indexes(cursor)
+        # (book_id) 是 (book_id, timestamp) 的前缀，单列索引不再需要
+        cursor.execute('DROP INDEX IF EXISTS idx_annotations_book_id')
+        cursor.execute('ANALYZE')
+        print("📚 [DatabaseSchema] 已添加复合索引并更新统计信息")
+    
+    @staticmethod
+    def _migrate_v4_to_v5(cursor: sqlite3.Cursor) -> None:
+        """从版本4迁移到版本5：添加后台数据迁移进度表（逐行改写数据的迁移见 online_migrations）"""
+        DatabaseSchema._create_data_migrations_table(cursor)
+        print("📚 [DatabaseSchema] 已添加数据迁移进度表")
+    
+    @staticmethod
+    def _migrate_v5_to_v6(cursor: sqlite3.Cursor) -> None:
+        """从版本5迁移到版本6：添加后台任务队列表"""
+        DatabaseSchema._create_jobs_table(cursor)
+        print("📚 [DatabaseSchema] 已添加后台任务队列表")
 
 
 class BookModel:
@@ -214,6 +359,20 @@ class ReadingProgressModel:
         ]
 
 
+class ReadingEventModel:
+    """阅读事件模型（只追加）"""
+    
+    TABLE_NAME = 'reading_events'
+    
+    @staticmethod
+    def get_columns() -> list:
+        """获取所有列名"""
+        return [
+            'id', 'book_id', 'timestamp', 'cfi', 'percentage',
+            'chapter_title', 'duration_ms', 'pages', 'percentage_delta'
+        ]
+
+
 class AnnotationModel:
     """注释模型"""
     
@@ -233,3 +392,92 @@ class AnnotationModel:
     def get_valid_types() -> list:
         """获取有效的注释类型"""
         return ['highlight', 'underline', 'note', 'mark']
+
+
+class HotQueries:
+    """
+    热点查询的 SQL：SQLiteDataManager 和 JobQueue 执行的就是这里的语句，
+    check_query_plans 检查的也是同一份，修改查询时执行计划检查随之更新
+    
+    {columns} 为查询的列，执行时填入
+    """
+    
+    BOOK = 'SELECT * FROM books WHERE book_id = ?'
+    BOOK_FONT = 'SELECT font_family, font_mode, font_size FROM books WHERE book_id = ?'
+    PROGRESS = 'SELECT * FROM reading_progress WHERE book_id = ?'
+    BOOK_ANNOTATIONS = 'SELECT {columns} FROM annotations WHERE book_id = ? ORDER BY timestamp'
+    BOOK_ANNOTATIONS_BY_TYPE = 'SELECT {columns} FROM annotations WHERE book_id = ? AND type = ? ORDER BY timestamp'
+    DELETE_ANNOTATION = 'DELETE FROM annotations WHERE book_id = ? AND id = ?'
+    CLEAR_ANNOTATIONS_BY_TYPE = 'DELETE FROM annotations WHERE book_id = ? AND type = ?'
+    ANNOTATED_BOOKS_COUNT = 'SELECT COUNT(DISTINCT book_id) FROM annotations'
+    LAST_READING_EVENT = '''
+        SELECT timestamp, cfi, percentage FROM reading_events
+        WHERE book_id = ? ORDER BY timestamp DESC LIMIT 1
+    '''
+    DAILY_STATS = '''
+        SELECT day, SUM(duration_ms) AS duration_ms, SUM(pages) AS pages,
+               SUM(percentage_gained) AS percentage_gained, COUNT(*) AS books
+        FROM reading_daily_stats
+        WHERE day >= ?
+        GROUP BY day ORDER BY day
+    '''
+    BOOK_DAILY_STATS = DAILY_STATS.replace('WHERE day >= ?', 'WHERE day >= ? AND book_id = ?')
+    BOOK_STATS = '''
+        SELECT s.*, b.title FROM reading_book_stats s
+        LEFT JOIN books b ON b.book_id = s.book_id
+        ORDER BY s.last_read DESC
+    '''
+    SINGLE_BOOK_STATS = BOOK_STATS.replace('ORDER BY', 'WHERE s.book_id = ? ORDER BY')
+    DELETE_READING_EVENTS = 'DELETE FROM reading_events WHERE book_id = ?'
+    DELETE_DAILY_STATS = 'DELETE FROM reading_daily_stats WHERE book_id = ?'
+    CLAIM_JOB = '''
+        SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY run_after LIMIT 1
+    '''
+
+
+# 执行计划检查的查询和示例参数，名称为 * 开头的查询本身返回整张表，允许按索引顺序扫描
+HOT_QUERIES = [
+    ('书籍详情', HotQueries.BOOK, ('b',)),
+    ('字体设置', HotQueries.BOOK_FONT, ('b',)),
+    ('阅读进度', HotQueries.PROGRESS, ('b',)),
+    ('按类型获取注释', HotQueries.BOOK_ANNOTATIONS_BY_TYPE, ('b', 'note')),
+    ('获取书籍注释', HotQueries.BOOK_ANNOTATIONS, ('b',)),
+    ('删除注释', HotQueries.DELETE_ANNOTATION, ('b', 'a')),
+    ('按类型清除注释', HotQueries.CLEAR_ANNOTATIONS_BY_TYPE, ('b', 'note')),
+    ('有注释的书籍数', HotQueries.ANNOTATED_BOOKS_COUNT, ()),
+    ('最近阅读事件', HotQueries.LAST_READING_EVENT, ('b',)),
+    ('每日统计', HotQueries.DAILY_STATS, ('2024-01-01',)),
+    ('单本书每日统计', HotQueries.BOOK_DAILY_STATS, ('2024-01-01', 'b')),
+    ('*书籍统计', HotQueries.BOOK_STATS, ()),
+    ('单本书统计', HotQueries.SINGLE_BOOK_STATS, ('b',)),
+    ('删除阅读事件', HotQueries.DELETE_READING_EVENTS, ('b',)),
+    ('删除书籍每日统计', HotQueries.DELETE_DAILY_STATS, ('b',)),
+    ('领取后台任务', HotQueries.CLAIM_JOB, (0,)),
+]
+
+
+def check_query_plans(conn: sqlite3.Connection, queries: Optional[list] = None) -> list:
+    """
+    检查热点查询的执行计划（tests/test_query_plans.py 在迁移后的数据库上执行）
+    
+    Args:
+        conn: 数据库连接
+        queries: 要检查的 [(名称, SQL, 示例参数)]，默认为 HOT_QUERIES
+    
+    Returns:
+        不合格的查询列表 [(名称, 执行计划)]：出现全表扫描（覆盖索引扫描除外）或临时 B 树排序/去重
+    """
+    failures = []
+    for name, sql, params in (HOT_QUERIES if queries is None else queries):
+        sql = sql.format(columns='*')
+        details = [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+        for detail in details:
+            if detail.startswith('SCAN '):
+                allowed = ' COVERING INDEX ' in detail or (name.startswith('*') and ' USING INDEX ' in detail)
+            else:
+                allowed = 'USE TEMP B-TREE' not in detail
+            if not allowed:
+                failures.append((name, details))
+                break
+    return failures
+
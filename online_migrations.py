@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+在线数据迁移模块
+表结构变更（建表、加列、加索引）仍由 DatabaseSchema 在启动时完成；需要逐行改写数据的迁移
+在这里注册，由后台线程分批执行，每批一个短事务，批次之间释放写锁，服务照常读写。
+
+- 按 rowid 顺序分批处理，批次数据和进度（处理到的 rowid）在同一事务中提交，中断后从断点继续
+- 每个迁移的状态和进度记录在 data_migrations 表中，可通过 /api/migrations 查看
+- 新迁移追加到 MIGRATIONS 末尾，按顺序执行；已完成的迁移不会再次执行
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+
+
+# 每批处理的行数（可通过环境变量 EPUB_MIGRATION_BATCH 调整）
+BATCH_SIZE = int(os.environ.get('EPUB_MIGRATION_BATCH', '500'))
+
+# 批次之间的间隔（秒），让请求线程的写入有机会拿到锁
+BATCH_PAUSE = 0.05
+
+
+class DataMigration:
+    """
+    分批数据迁移基类
+    
+    子类设置 name（唯一且不可修改）、description、table，并实现 migrate_batch
+    """
+    
+    name = ''
+    description = ''
+    table = ''
+    
+    def count(self, conn: sqlite3.Connection) -> int:
+        """需要处理的总行数（仅用于显示进度）"""
+        return conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+    
+    def migrate_batch(self, conn: sqlite3.Connection, first_rowid: int, last_rowid: int) -> None:
+        """处理 rowid 在 [first_rowid, last_rowid] 之间的行（在调用方的事务中执行）"""
+        raise NotImplementedError
+
+
+class BackfillAnnotationTimestamps(DataMigration):
+    """旧数据中 timestamp 为空的注释无法按时间排序，用创建时间补上"""
+    
+    name = 'annotations_timestamp_backfill'
+    description = '为缺少 timestamp 的注释补上创建时间（毫秒）'
+    table = 'annotations'
+    
+    def migrate_batch(self, conn: sqlite3.Connection, first_rowid: int, last_rowid: int) -> None:
+        conn.execute('''
+            UPDATE annotations
+            SET timestamp = CAST(strftime('%s', COALESCE(created_at, CURRENT_TIMESTAMP)) AS INTEGER) * 1000
+            WHERE rowid BETWEEN ? AND ? AND timestamp IS NULL
+        ''', (first_rowid, last_rowid))
+
+
+# 已注册的数据迁移（按顺序执行）
+MIGRATIONS: List[DataMigration] = [
+    BackfillAnnotationTimestamps(),
+]
+
+
+class MigrationRunner:
+    """后台数据迁移执行器"""
+    
+    def __init__(self, db_path: str, migrations: Optional[List[DataMigration]] = None,
+                 batch_size: int = BATCH_SIZE, pause: float = BATCH_PAUSE,
+                 on_batch: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            on_batch: 每批提交后的回调 (表名)，用于使依赖该表的缓存失效
+        """
+        self.db_path = db_path
+        self.migrations = MIGRATIONS if migrations is None else migrations
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self.on_batch = on_batch
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._rescan = False
+        self._current: Optional[str] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        # 手动管理事务（BEGIN IMMEDIATE），避免批次之间残留未提交的事务
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def start(self) -> None:
+        """在后台线程中执行所有未完成的迁移；已在执行时，完成后重新检查一遍（如导入书库之后）"""
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                self._rescan = True
+                return
+            self._rescan = False
+            self._worker = threading.Thread(target=self._run, name='data-migrations', daemon=True)
+            self._worker.start()
+    
+    def run_pending(self) -> int:
+        """在当前线程中执行所有未完成的迁移，返回本次完成的迁移数"""
+        completed = 0
+        for migration in self.migrations:
+            try:
+                if self._run_migration(migration):
+                    completed += 1
+            except Exception as e:
+                print(f"❌ [MigrationRunner] 迁移失败: {migration.name} ({e})")
+                self._record_failure(migration, e)
+        return completed
+    
+    def get_status(self) -> Dict[str, Any]:
+        """所有已注册迁移的状态和进度"""
+        with self._connect() as conn:
+            rows = {row['name']: row for row in conn.execute('SELECT * FROM data_migrations')}
+        with self._lock:
+            running = self._worker is not None and self._worker.is_alive()
+            current = self._current
+        
+        migrations = []
+        for migration in self.migrations:
+            row = rows.get(migration.name)
+            migrations.append({
+                'name': migration.name,
+                'description': migration.description,
+                'table': migration.table,
+                'status': row['status'] if row else 'pending',
+                'processed': row['processed'] if row else 0,
+                'total': row['total'] if row else None,
+                'position': row['position'] if row else 0,
+                'error': row['error'] if row else None,
+                'startedAt': row['started_at'] if row else None,
+                'updatedAt': row['updated_at'] if row else None,
+                'finishedAt': row['finished_at'] if row else None
+            })
+        return {
+            'running': running,
+            'current': current,
+            'batchSize': self.batch_size,
+            'pending': sum(1 for item in migrations if item['status'] != 'done'),
+            'migrations': migrations
+        }
+    
+    def _run(self) -> None:
+        while True:
+            self.run_pending()
+            with self._lock:
+                if not self._rescan:
+                    self._worker = None
+                    return
+                self._rescan = False
+    
+    def _run_migration(self, migration: DataMigration) -> bool:
+        """执行一个迁移直到完成，已完成的直接返回 False"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT status FROM data_migrations WHERE name = ?', (migration.name,)).fetchone()
+            if row and row['status'] == 'done':
+                return False
+            
+            now = int(time.time() * 1000)
+            total = migration.count(conn)
+            conn.execute('''
+                INSERT INTO data_migrations (name, status, total, started_at, updated_at)
+                VALUES (?, 'running', ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET status = 'running', total = excluded.total,
+                    error = NULL, updated_at = excluded.updated_at
+            ''', (migration.name, total, now, now))
+            
+            with self._lock:
+                self._current = migration.name
+            print(f"🔧 [MigrationRunner] 开始迁移: {migration.name} (约 {total} 行)")
+            start = time.time()
+            while self._run_batch(conn, migration):
+                if self.on_batch:
+                    self.on_batch(migration.table)
+                time.sleep(self.pause)
+            print(f"✅ [MigrationRunner] 迁移完成: {migration.name} ({time.time() - start:.2f}s)")
+            return True
+        finally:
+            with self._lock:
+                self._current = None
+            conn.close()
+    
+    def _run_batch(self, conn: sqlite3.Connection, migration: DataMigration) -> bool:
+        """在一个事务中处理一批行并记录进度，返回是否还有剩余"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # 每批从数据库读取断点（数据库可能已被导入的书库整体替换）
+            row = conn.execute('SELECT position FROM data_migrations WHERE name = ?',
+                               (migration.name,)).fetchone()
+            position = row['position'] if row else 0
+            rowids = [r[0] for r in conn.execute(
+                f'SELECT rowid FROM {migration.table} WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (position, self.batch_size))]
+            now = int(time.time() * 1000)
+            
+            if not rowids:
+                conn.execute('''
+                    UPDATE data_migrations SET status = 'done', total = MAX(total, processed),
+                        updated_at = ?, finished_at = ?
+                    WHERE name = ?
+                ''', (now, now, migration.name))
+                conn.execute('COMMIT')
+                return False
+            
+            migration.migrate_batch(conn, rowids[0], rowids[-1])
+            conn.execute('''
+                INSERT INTO data_migrations (name, status, position, processed, total, started_at, updated_at)
+                VALUES (?, 'running', ?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET position = excluded.position,
+                    processed = processed + excluded.processed,
+                    total = MAX(total, processed + excluded.processed),
+                    updated_at = excluded.updated_at
+            ''', (migration.name, rowids[-1], len(rowids), len(rowids), now, now))
+            conn.execute('COMMIT')
+            return True
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def _record_failure(self, migration: DataMigration, error: Exception) -> None:
+        try:
+            with self._connect() as conn:
+                conn.execute('''
+                    UPDATE data_migrations SET status = 'failed', error = ?, updated_at = ?
+                    WHERE name = ?
+                ''', (str(error), int(time.time() * 1000), migration.name))
+        except sqlite3.Error as e:
+            print(f"❌ [MigrationRunner] 记录迁移失败状态出错: {e}")
+
+
+# 全局数据迁移执行器实例
+migration_runner = None
+
+
+def get_migration_runner(db_path: str = 'books_data.db',
+                         on_batch: Optional[Callable[[str], None]] = None) -> MigrationRunner:
+    """获取全局数据迁移执行器实例"""
+    global migration_runner
+    if migration_runner is None:
+        migration_runner = MigrationRunner(db_path, on_batch=on_batch)
+    return migration_runner
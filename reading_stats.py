@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+阅读历史记录模块
+把 /api/progress 的每次保存记录为一条阅读事件，在内存中缓冲后批量写入数据库
+
+写入时计算相对上一条事件的增量（阅读时长、翻页数、进度增加），
+同一事务内累加到按天、按书的汇总表，统计接口只需读取汇总表。
+"""
+
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+from data_sqlite import SQLiteDataManager
+
+
+# 缓冲的事件达到该数量时立即写入
+BATCH_SIZE = 50
+
+# 缓冲事件最长等待时间（秒）
+FLUSH_INTERVAL = 5.0
+
+# 两次进度保存间隔超过该值视为中途离开，不计入阅读时长，并开始新的阅读会话
+IDLE_GAP_MS = 5 * 60 * 1000
+
+
+class ReadingEventLog:
+    """阅读事件缓冲区，后台线程定期批量写入"""
+    
+    def __init__(self, data_manager: SQLiteDataManager, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL):
+        self.data_manager = data_manager
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[Dict[str, Any]] = []
+        self._last_events: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._written = 0
+        self._flushes = 0
+        
+        worker = threading.Thread(target=self._run, name='reading-event-log', daemon=True)
+        worker.start()
+    
+    def record(self, book_id: str, progress: Dict[str, Any]) -> None:
+        """
+        记录一次进度保存
+        
+        Args:
+            book_id: 书籍ID
+            progress: 包含 cfi、percentage、chapterTitle、timestamp（毫秒）
+        """
+        timestamp = progress.get('timestamp') or int(time.time() * 1000)
+        percentage = progress.get('percentage') or 0.0
+        cfi = progress.get('cfi') or ''
+        
+        with self._lock:
+            known = book_id in self._last_events
+        # 服务启动后第一次见到这本书时，在锁外从数据库取上一条事件（查询期间不阻塞其他书籍的记录）
+        baseline = None if known else self.data_manager.get_last_reading_event(book_id)
+        
+        with self._lock:
+            # 并发的第一次记录中只有先到的使用数据库中的基准
+            last = self._last_events.setdefault(book_id, baseline)
+            
+            gap = timestamp - last['timestamp'] if last else None
+            new_session = gap is None or gap > IDLE_GAP_MS
+            self._pending.append({
+                'bookId': book_id,
+                'timestamp': timestamp,
+                'cfi': cfi,
+                'percentage': percentage,
+                'chapterTitle': progress.get('chapterTitle', ''),
+                'durationMs': 0 if new_session else max(gap, 0),
+                'pages': 1 if last and cfi != last['cfi'] else 0,
+                'percentageDelta': max(percentage - last['percentage'], 0.0) if last else 0.0,
+                'newSession': new_session
+            })
+            self._last_events[book_id] = {'timestamp': timestamp, 'cfi': cfi, 'percentage': percentage}
+            full = len(self._pending) >= self.batch_size
+        
+        if full:
+            self._wakeup.set()
+    
+    def flush(self) -> int:
+        """把缓冲的事件写入数据库，返回写入的事件数"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+            if not events:
+                return 0
+            
+            try:
+                self.data_manager.add_reading_events(events)
+            except Exception as e:
+                print(f"❌ [ReadingEventLog] 写入阅读事件失败: {e}")
+                with self._lock:
+                    self._pending[:0] = events
+                return 0
+            
+            self._written += len(events)
+            self._flushes += 1
+            return len(events)
+    
+    def forget_book(self, book_id: str) -> None:
+        """书籍删除后丢弃其缓冲事件和增量基准"""
+        with self._lock:
+            self._pending = [event for event in self._pending if event['bookId'] != book_id]
+            self._last_events.pop(book_id, None)
+    
+    def reset(self) -> None:
+        """数据库被整体替换（导入书库）后丢弃缓冲事件和所有增量基准"""
+        with self._lock:
+            self._pending = []
+            self._last_events.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓冲区统计信息"""
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'written': self._written,
+            'flushes': self._flushes,
+            'batchSize': self.batch_size,
+            'flushInterval': self.flush_interval
+        }
+    
+    def _run(self) -> None:
+        """后台写入线程：攒满一批或等待超时后写入"""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+# 全局阅读事件记录实例
+reading_event_log = None
+
+
+def get_reading_event_log(data_manager: SQLiteDataManager) -> ReadingEventLog:
+    """获取全局阅读事件记录实例"""
+    global reading_event_log
+    if reading_event_log is None:
+        reading_event_log = ReadingEventLog(data_manager)
+    return reading_event_log
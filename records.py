@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+数据记录类型
+书籍、阅读进度、注释的查询结果直接构造为基于元组的记录（namedtuple 子类，__slots__ 为空，没有逐行字典），
+接口响应按预先生成的 JSON 模板逐条编码，不再经过 sqlite3.Row -> dict -> 响应 dict -> json.dumps 的多层转换。
+
+直接运行本模块可对比 10 万行时新旧两种方式的耗时和内存峰值。
+"""
+
+import json
+import math
+import os
+from collections import namedtuple
+from json.encoder import encode_basestring
+from typing import Dict, Any, Iterable, Tuple
+
+
+def _encode_float(value: float) -> str:
+    # 与 json.dumps 一致：非有限值编码为 NaN / Infinity
+    return float.__repr__(value) if math.isfinite(value) else json.dumps(value)
+
+
+def _encode_other(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+# 按类型选择编码函数（SQLite 只会返回 str/int/float/bytes/None）
+_ENCODERS = {
+    str: encode_basestring,
+    int: int.__repr__,
+    float: _encode_float,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+}
+
+
+class JsonRecordEncoder:
+    """按固定字段顺序把值元组编码为 JSON 对象"""
+    
+    def __init__(self, keys: Tuple[str, ...]):
+        self.keys = keys
+        self.template = '{' + ', '.join(f'{encode_basestring(key)}: %s' for key in keys) + '}'
+    
+    def encode(self, values: Iterable[Any]) -> str:
+        return self.template % tuple([_ENCODERS.get(type(value), _encode_other)(value) for value in values])
+
+
+class BookRecord(namedtuple('BookRecord', [
+        'book_id', 'title', 'author', 'filename', 'file_path', 'added_date', 'language', 'file_size',
+        'publisher', 'description', 'identifier', 'cover_path', 'font_family', 'font_mode', 'font_size'])):
+    """books 表的一行"""
+    
+    __slots__ = ()
+    
+    # /api/books 列表中每本书的字段
+    JSON_KEYS = ('id', 'title', 'author', 'filename', 'language', 'fileSize', 'addedDate', 'publisher',
+                 'description', 'identifier', 'hasCover', 'coverUrl', 'fontFamily', 'fontMode')
+    
+    def json_values(self) -> tuple:
+        # 按数据库记录判断，缓存的书籍列表不依赖编码时的文件状态（封面文件缺失时记录会被清除）
+        has_cover = bool(self.cover_path)
+        return (self.book_id, self.title, self.author, self.filename, self.language, self.file_size,
+                str(self.added_date), self.publisher, self.description, self.identifier, has_cover,
+                f'/api/cover/{self.book_id}' if has_cover else None, self.font_family, self.font_mode)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """旧接口使用的书籍信息字典（data_manager.books 等）"""
+        return {
+            'title': self.title,
+            'author': self.author,
+            'filename': self.filename,
+            'addedDate': str(self.added_date),
+            'language': self.language,
+            'fileSize': self.file_size,
+            'publisher': self.publisher,
+            'description': self.description,
+            'identifier': self.identifier,
+            'coverPath': self.cover_path,
+            'fontFamily': self.font_family,
+            'fontMode': self.font_mode,
+            'fontSize': self.font_size
+        }
+
+
+class ProgressRecord(namedtuple('ProgressRecord', ['book_id', 'cfi', 'percentage', 'chapter_title', 'timestamp'])):
+    """reading_progress 表的一行"""
+    
+    __slots__ = ()
+    
+    JSON_KEYS = ('bookId', 'cfi', 'percentage', 'chapterTitle', 'timestamp')
+    
+    def json_values(self) -> tuple:
+        return self
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'cfi': self.cfi,
+            'percentage': self.percentage,
+            'chapterTitle': self.chapter_title,
+            'timestamp': self.timestamp
+        }
+
+
+class AnnotationRecord(namedtuple('AnnotationRecord', [
+        'id', 'book_id', 'type', 'cfi_range', 'text', 'color', 'class_name', 'note', 'source',
+        'chapter_title', 'chapter_index', 'timestamp'])):
+    """annotations 表的一行（字段顺序与 JSON 字段一一对应）"""
+    
+    __slots__ = ()
+    
+    JSON_KEYS = ('id', 'bookId', 'type', 'cfiRange', 'text', 'color', 'className', 'note', 'source',
+                 'chapterTitle', 'chapterIndex', 'timestamp')
+    
+    def json_values(self) -> tuple:
+        return self
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self.JSON_KEYS, self))
+
+
+_RECORD_ENCODERS = {
+    record_type: JsonRecordEncoder(record_type.JSON_KEYS)
+    for record_type in (BookRecord, ProgressRecord, AnnotationRecord)
+}
+
+
+def select_columns(record_type) -> str:
+    """记录类型对应的 SELECT 列表（按字段顺序）"""
+    return ', '.join(record_type._fields)
+
+
+def encode_records(records: Iterable[tuple]) -> str:
+    """把同一类型的记录列表编码为 JSON 数组"""
+    records = list(records)
+    if not records:
+        return '[]'
+    encode = _RECORD_ENCODERS[type(records[0])].encode
+    return '[' + ', '.join([encode(record.json_values()) for record in records]) + ']'
+
+
+def encode_response(response: Dict[str, Any], key: str, records: Iterable[tuple]) -> bytes:
+    """
+    编码接口响应：response 中的普通字段用 json.dumps，records 作为 key 字段追加在最后
+    
+    Returns:
+        UTF-8 编码的 JSON
+    """
+    head = json.dumps(response, ensure_ascii=False)[:-1]
+    separator = ', ' if response else ''
+    return f'{head}{separator}{encode_basestring(key)}: {encode_records(records)}}}'.encode('utf-8')
+
+
+if __name__ == "__main__":
+    # 基准测试：10 万条注释 / 书籍，对比旧的逐行字典方式和记录 + 模板编码方式
+    import sqlite3
+    import tempfile
+    import time
+    import tracemalloc
+    
+    from models import DatabaseSchema
+    
+    ROWS = 100000
+    
+    def measure(func, repeat: int = 3):
+        best = min(_timed(func) for _ in range(repeat))
+        tracemalloc.start()
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return best, peak, result
+    
+    def _timed(func) -> float:
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, 'bench.db')
+        DatabaseSchema.init_database(db_path)
+        with sqlite3.connect(db_path) as conn:
+            conn.executemany('INSERT INTO books (book_id, title, author, filename, added_date, language, file_size) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             [(f'book_{i:08x}', f'书名 {i}', '作者', f'book{i}.epub', 1700000000000 + i, 'zh', 1024 * i)
+                              for i in range(ROWS)])
+            conn.executemany('INSERT INTO annotations (id, book_id, type, cfi_range, text, color, note, source, '
+                             'chapter_title, chapter_index, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             [(f'ann_{i}', 'book_bench', 'highlight', f'epubcfi(/6/4!/4/{i},/1:0,/1:20)',
+                               '划线的文字 highlighted text', '#ffeb3b', '笔记' if i % 2 else None, 'user',
+                               '第一章', i % 30, 1700000000000 + i) for i in range(ROWS)])
+        
+        def old_annotations() -> bytes:
+            conn = sqlite3.connect(db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('SELECT * FROM annotations WHERE book_id = ? ORDER BY timestamp',
+                                ('book_bench',)).fetchall()
+            conn.close()
+            annotations = [{
+                'id': row['id'], 'bookId': row['book_id'], 'type': row['type'], 'cfiRange': row['cfi_range'],
+                'text': row['text'], 'color': row['color'], 'className': row['class_name'], 'note': row['note'],
+                'source': row['source'], 'chapterTitle': row['chapter_title'],
+                'chapterIndex': row['chapter_index'], 'timestamp': row['timestamp']
+            } for row in rows]
+            response = {'success': True, 'bookId': 'book_bench', 'count': len(annotations), 'annotations': annotations}
+            return json.dumps(response, ensure_ascii=False).encode('utf-8')
+        
+        def new_annotations() -> bytes:
+            conn = sqlite3.connect(db_path)
+            records = list(map(AnnotationRecord._make, conn.execute(
+                f'SELECT {select_columns(AnnotationRecord)} FROM annotations WHERE book_id = ? ORDER BY timestamp',
+                ('book_bench',))))
+            conn.close()
+            return encode_response({'success': True, 'bookId': 'book_bench', 'count': len(records)},
+                                   'annotations', records)
+        
+        def old_books() -> bytes:
+            conn = sqlite3.connect(db_path)
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute('SELECT * FROM books').fetchall()
+            conn.close()
+            books = {row['book_id']: {
+                'title': row['title'], 'author': row['author'], 'filename': row['filename'],
+                'addedDate': str(row['added_date']), 'language': row['language'], 'fileSize': row['file_size'],
+                'publisher': row['publisher'], 'description': row['description'], 'identifier': row['identifier'],
+                'coverPath': row['cover_path'], 'fontFamily': row['font_family'], 'fontMode': row['font_mode'],
+                'fontSize': row['font_size']
+            } for row in rows}
+            books_list = []
+            for book_id, info in books.items():
+                has_cover = info.get('coverPath') and os.path.exists(info.get('coverPath', ''))
+                books_list.append({
+                    'id': book_id, 'title': info['title'], 'author': info['author'], 'filename': info['filename'],
+                    'language': info['language'], 'fileSize': info['fileSize'], 'addedDate': info['addedDate'],
+                    'publisher': info.get('publisher', '未知出版商'), 'description': info.get('description', ''),
+                    'identifier': info.get('identifier', ''), 'hasCover': has_cover,
+                    'coverUrl': f'/api/cover/{book_id}' if has_cover else None,
+                    'fontFamily': info.get('fontFamily'), 'fontMode': info.get('fontMode', 'auto')
+                })
+            return json.dumps({'success': True, 'books': books_list, 'count': len(books_list)},
+                              ensure_ascii=False).encode('utf-8')
+        
+        def new_books() -> bytes:
+            conn = sqlite3.connect(db_path)
+            records = list(map(BookRecord._make, conn.execute(f'SELECT {select_columns(BookRecord)} FROM books')))
+            conn.close()
+            return encode_response({'success': True, 'count': len(records)}, 'books', records)
+        
+        for name, old, new in (('注释', old_annotations, new_annotations), ('书籍', old_books, new_books)):
+            old_time, old_peak, old_body = measure(old)
+            new_time, new_peak, new_body = measure(new)
+            assert json.loads(old_body) == json.loads(new_body), f"{name}: 编码结果不一致"
+            print(f"📊 {name} {ROWS} 行: 旧 {old_time * 1000:.0f}ms / 峰值 {old_peak / 1048576:.1f}MB, "
+                  f"新 {new_time * 1000:.0f}ms / 峰值 {new_peak / 1048576:.1f}MB "
+                  f"(耗时 -{(1 - new_time / old_time) * 100:.0f}%, 内存 -{(1 - new_peak / old_peak) * 100:.0f}%)")
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+请求性能分析模块（默认关闭）
+用 cProfile 包裹单个请求的处理函数，把每个请求的分析结果写入 profiles/<路由>/ 目录，
+并记录最近最耗时的请求，供 /api/profiles 查看。
+
+开启方式：
+- 环境变量 EPUB_PROFILE=1：分析所有请求
+- 环境变量 EPUB_PROFILE_TOKEN=<口令>：只分析带 X-Profile: <口令> 请求头的请求
+
+分析结果可用 `python3 -m pstats profiles/<路由>/<文件>.prof` 查看。
+"""
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+
+PROFILE_ALL = os.environ.get('EPUB_PROFILE') == '1'
+PROFILE_TOKEN = os.environ.get('EPUB_PROFILE_TOKEN') or None
+PROFILE_DIR = os.environ.get('EPUB_PROFILE_DIR', 'profiles')
+
+# 内存中保留的最近请求记录数
+MAX_RECORDS = 500
+
+# 每个路由目录最多保留的分析文件数（超出时删除最旧的）
+MAX_FILES_PER_ROUTE = 50
+
+# 每个记录保留的最耗时函数数
+TOP_FUNCTIONS = 8
+
+# 路由中的变量部分（书籍ID、数字、词典查询词）归并为占位符
+_ROUTE_PATTERNS = [
+    (re.compile(r'/book_[0-9a-f]+_[0-9a-f]+'), '/{id}'),
+    (re.compile(r'^/api/dict/([^/]+)/.+$'), r'/api/dict/\1/{word}'),
+    (re.compile(r'^/api/book/\{id\}/file/.+$'), '/api/book/{id}/file/{path}'),
+    (re.compile(r'/\d+(?=/|$)'), '/{n}'),
+]
+
+
+def route_key(path: str) -> str:
+    """把请求路径归并为路由模板，例如 /api/book/{id}/locations"""
+    for pattern, replacement in _ROUTE_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def _file_name(route: str) -> str:
+    """路由模板转为目录名"""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', route).strip('_') or 'root'
+
+
+class RequestProfiler:
+    """请求分析器"""
+    
+    def __init__(self, profile_all: bool = PROFILE_ALL, token: Optional[str] = PROFILE_TOKEN,
+                 profile_dir: str = PROFILE_DIR, max_records: int = MAX_RECORDS):
+        self.profile_all = profile_all
+        self.token = token
+        self.profile_dir = profile_dir
+        self._records: 'deque[Dict[str, Any]]' = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        # 同一时间只分析一个请求（多个 cProfile 同时启用时结果会互相干扰）
+        self._active = threading.Lock()
+        self._skipped = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.profile_all or self.token is not None
+    
+    def should_profile(self, headers) -> bool:
+        """判断当前请求是否需要分析"""
+        if self.profile_all:
+            return True
+        return self.token is not None and headers.get('X-Profile') == self.token
+    
+    def is_authorized(self, headers) -> bool:
+        """能否查看分析结果（设置了口令时必须带口令）"""
+        if self.token is not None:
+            return headers.get('X-Profile') == self.token
+        return self.profile_all
+    
+    def run(self, method: str, path: str, func, *args, **kwargs):
+        """在 cProfile 下执行请求处理函数，并保存结果"""
+        if not self._active.acquire(blocking=False):
+            with self._lock:
+                self._skipped += 1
+            return func(*args, **kwargs)
+        
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._active.release()
+            try:
+                self._save(method, path, profiler, elapsed)
+            except Exception as e:
+                print(f"❌ [RequestProfiler] 保存分析结果失败: {e}")
+    
+    def _save(self, method: str, path: str, profiler: cProfile.Profile, elapsed: float) -> None:
+        route = route_key(path)
+        directory = os.path.join(self.profile_dir, f"{method}_{_file_name(route)}")
+        os.makedirs(directory, exist_ok=True)
+        timestamp = int(time.time() * 1000)
+        file_path = os.path.join(directory, f"{timestamp}_{int(elapsed * 1000)}ms.prof")
+        profiler.dump_stats(file_path)
+        
+        # 文件名以时间戳开头，按名称排序即按时间排序
+        files = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+        for name in files[:-MAX_FILES_PER_ROUTE]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+        
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        top = []
+        for (filename, line, function), (_, calls, total, cumulative, _) in sorted(
+                stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]:
+            top.append({
+                'function': f"{os.path.basename(filename)}:{line}({function})",
+                'calls': calls,
+                'totalMs': round(total * 1000, 3),
+                'cumulativeMs': round(cumulative * 1000, 3)
+            })
+        
+        with self._lock:
+            self._records.append({
+                'method': method,
+                'path': path,
+                'route': route,
+                'elapsedMs': round(elapsed * 1000, 3),
+                'timestamp': timestamp,
+                'file': file_path,
+                'top': top
+            })
+    
+    def get_slowest(self, limit: int = 20, route: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最近记录中最耗时的请求"""
+        with self._lock:
+            records = [record for record in self._records if route is None or record['route'] == route]
+        return sorted(records, key=lambda record: record['elapsedMs'], reverse=True)[:limit]
+    
+    def get_route_summary(self) -> List[Dict[str, Any]]:
+        """按路由汇总最近记录：次数、平均和最大耗时"""
+        summary: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            records = list(self._records)
+        for record in records:
+            key = f"{record['method']} {record['route']}"
+            item = summary.setdefault(key, {'route': key, 'count': 0, 'totalMs': 0.0, 'maxMs': 0.0})
+            item['count'] += 1
+            item['totalMs'] += record['elapsedMs']
+            item['maxMs'] = max(item['maxMs'], record['elapsedMs'])
+        for item in summary.values():
+            item['avgMs'] = round(item.pop('totalMs') / item['count'], 3)
+        return sorted(summary.values(), key=lambda item: item['maxMs'], reverse=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'profileAll': self.profile_all,
+                'tokenRequired': self.token is not None,
+                'directory': self.profile_dir,
+                'records': len(self._records),
+                'skipped': self._skipped
+            }
+
+
+# 全局请求分析器实例
+request_profiler = RequestProfiler()
+
+
+def get_request_profiler() -> RequestProfiler:
+    """获取全局请求分析器实例"""
+    return request_profiler
+
+
+def profiled(method):
+    """
+    请求处理方法装饰器（用于 do_GET/do_POST 等）
+    未开启分析时直接调用原方法
+    """
+    @functools.wraps(method)
+    def wrapper(handler, *args, **kwargs):
+        profiler = request_profiler
+        if not profiler.enabled or not profiler.should_profile(handler.headers) \
+                or handler.path.startswith('/api/profiles'):
+            return method(handler, *args, **kwargs)
+        return profiler.run(handler.command, handler.path.split('?', 1)[0], method, handler, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+接口响应缓存模块
+按"接口 + 参数"缓存编码好的 JSON 字节及其 gzip 压缩版本，
+缓存项记录生成时依赖的数据表版本号（SQLiteDataManager.get_generation），
+版本号变化即视为失效，重复读取只需一次字典查找和一次写 socket。
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional
+
+
+# 缓存的最大条目数和总字节数
+MAX_ENTRIES = 512
+MAX_BYTES = 64 * 1024 * 1024
+
+# 小于该大小的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+
+
+class CachedResponse:
+    """一个缓存的响应"""
+    
+    __slots__ = ('generation', 'body', 'gzip_body', 'etag')
+    
+    def __init__(self, generation: tuple, body: bytes):
+        self.generation = generation
+        self.body = body
+        # 太小的响应压缩收益不大，gzip_body 为 None
+        self.gzip_body: Optional[bytes] = (
+            gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= MIN_COMPRESS_SIZE else None
+        )
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+    
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip_body or b'')
+
+
+class ResponseCache:
+    """按数据表版本号失效的响应缓存（LRU）"""
+    
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, CachedResponse]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    def get(self, key: Hashable, generation: tuple, build: Callable[[], bytes]) -> CachedResponse:
+        """
+        获取缓存的响应，版本号不一致时调用 build 重新生成
+        
+        Args:
+            key: 接口和参数，例如 ('annotations', book_id, type)
+            generation: 生成前读取的数据表版本号（必须在查询数据之前读取）
+            build: 生成响应字节的函数
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation == generation:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+        
+        entry = CachedResponse(generation, build())
+        self._store(key, entry)
+        return entry
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses
+            }
+    
+    def _store(self, key: Hashable, entry: CachedResponse) -> None:
+        if entry.size > self.max_bytes // 4:
+            # 特别大的响应不缓存，避免挤掉其他所有条目
+            return
+        with self._lock:
+            old = self._entries.get(key)
+            if old is not None:
+                # 并发生成时，较慢的请求可能拿着旧版本号的结果，不覆盖较新的条目
+                if old.generation > entry.generation:
+                    return
+                del self._entries[key]
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            self._evict()
+    
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.size
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存实例"""
+    return response_cache
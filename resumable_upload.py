@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+可续传的分块上传模块
+大文件（例如几百 MB 的漫画 EPUB）分块上传，连接中断后查询已写入的偏移量，从断点继续：
+
+1. POST /api/uploads                  创建上传会话 {filename, size, sha256?, metadata?}
+2. PUT /api/uploads/<id>              写入一块，请求头 Upload-Offset 为该块的起始偏移量
+3. GET /api/uploads/<id>              查询会话状态（offset 为已写入的字节数）
+4. POST /api/uploads/<id>/complete    校验大小和 SHA-256 后按普通上传流程登记书籍（登记完成前会话保持占用）
+5. DELETE /api/uploads/<id>           取消上传
+
+数据直接追加写入暂存文件 books/.uploads/<id>.part，会话信息保存在同目录的 <id>.json，
+服务重启后未完成的会话仍可继续；暂存文件的大小即已写入的偏移量。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Any, BinaryIO, Optional, Tuple
+
+from file_cache import atomic_write_bytes
+
+
+# 暂存目录
+UPLOAD_DIR = os.path.join('books', '.uploads')
+
+# 单个文件的最大大小、单次 PUT 的最大块大小和建议的块大小
+MAX_UPLOAD_SIZE = int(os.environ.get('EPUB_MAX_UPLOAD_MB', '2048')) * 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# 未完成的会话在最后一次写入后保留的时间（秒）
+SESSION_TTL = 24 * 3600
+
+# 从请求体读取和计算哈希时每次读取的大小
+READ_SIZE = 256 * 1024
+
+
+class UploadSessionError(Exception):
+    """上传会话操作失败，status 为对应的 HTTP 状态码"""
+    
+    def __init__(self, message: str, status: int = 400, offset: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class UploadSessionStore:
+    """上传会话存储（会话信息和暂存文件都在 directory 中）"""
+    
+    def __init__(self, directory: str = UPLOAD_DIR, ttl: int = SESSION_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # 同一会话同一时间只允许一个请求写入
+        self._busy = set()
+    
+    def _meta_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f'{upload_id}.json')
+    
+    def _part_path(self, upload_id: str) -> str:
+        return os.path.join(self.directory, f'{upload_id}.part')
+    
+    def create(self, filename: str, size: int, sha256: Optional[str] = None,
+               metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """创建上传会话"""
+        if not filename or not filename.lower().endswith('.epub'):
+            raise UploadSessionError('filename must be an .epub file')
+        if not isinstance(size, int) or size <= 0 or size > MAX_UPLOAD_SIZE:
+            raise UploadSessionError(f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes')
+        if sha256 is not None and (not isinstance(sha256, str) or len(sha256) != 64):
+            raise UploadSessionError('sha256 must be a hex digest')
+        
+        os.makedirs(self.directory, exist_ok=True)
+        self.cleanup_expired()
+        
+        upload_id = uuid.uuid4().hex
+        now = int(time.time() * 1000)
+        session = {
+            'uploadId': upload_id,
+            'filename': os.path.basename(filename),
+            'size': size,
+            'sha256': sha256.lower() if sha256 else None,
+            'metadata': metadata or {},
+            'createdAt': now
+        }
+        open(self._part_path(upload_id), 'wb').close()
+        atomic_write_bytes(self._meta_path(upload_id), json.dumps(session, ensure_ascii=False).encode('utf-8'))
+        print(f"📤 [UploadSession] 创建上传会话: {session['filename']} ({size} 字节) -> {upload_id}")
+        return self._status(session)
+    
+    def get(self, upload_id: str) -> Dict[str, Any]:
+        """查询会话状态"""
+        return self._status(self._load(upload_id))
+    
+    def write_chunk(self, upload_id: str, offset: int, stream: BinaryIO, length: int) -> Dict[str, Any]:
+        """
+        从 stream 读取 length 字节追加到暂存文件
+        
+        offset 必须等于已写入的字节数，否则返回 409 和当前偏移量；
+        传输中途断开时已收到的数据保留，客户端查询偏移量后继续。
+        """
+        session = self._load(upload_id)
+        if length <= 0 or length > MAX_CHUNK_SIZE:
+            raise UploadSessionError(f'chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes')
+        
+        self._acquire(upload_id)
+        try:
+            part_path = self._part_path(upload_id)
+            current = self._part_size(upload_id)
+            if offset != current:
+                raise UploadSessionError('offset mismatch', status=409, offset=current)
+            if current + length > session['size']:
+                raise UploadSessionError('chunk exceeds declared size', status=413, offset=current)
+            
+            with open(part_path, 'ab') as f:
+                remaining = length
+                while remaining > 0:
+                    data = stream.read(min(READ_SIZE, remaining))
+                    if not data:
+                        break
+                    f.write(data)
+                    remaining -= len(data)
+            os.utime(self._meta_path(upload_id))
+            if remaining:
+                raise UploadSessionError('connection closed before chunk was complete', status=400,
+                                         offset=current + length - remaining)
+        finally:
+            self._release(upload_id)
+        return self._status(session)
+    
+    def finalize(self, upload_id: str) -> Tuple[Dict[str, Any], str, str]:
+        """
+        校验暂存文件（大小和 SHA-256），返回 (会话信息, 暂存文件路径, 文件内容的 MD5)
+        
+        校验通过后会话保持占用（其他 complete、PUT、DELETE 返回 409），调用方登记书籍成功后调用 discard，
+        无论成功与否最后都要调用 release
+        """
+        session = self._load(upload_id)
+        self._acquire(upload_id)
+        try:
+            part_path = self._part_path(upload_id)
+            current = self._part_size(upload_id)
+            if current != session['size']:
+                raise UploadSessionError('upload is incomplete', status=409, offset=current)
+            
+            sha256 = hashlib.sha256()
+            md5 = hashlib.md5()
+            with open(part_path, 'rb') as f:
+                for data in iter(lambda: f.read(READ_SIZE), b''):
+                    sha256.update(data)
+                    md5.update(data)
+            if session['sha256'] and sha256.hexdigest() != session['sha256']:
+                # 内容已损坏，只能重新上传
+                self.discard(upload_id)
+                raise UploadSessionError('sha256 mismatch', status=422)
+        except BaseException:
+            self._release(upload_id)
+            raise
+        return session, part_path, md5.hexdigest()
+    
+    def release(self, upload_id: str) -> None:
+        """结束 finalize 开始的占用"""
+        self._release(upload_id)
+    
+    def cancel(self, upload_id: str) -> None:
+        """取消上传（正在写入或登记的会话返回 409）"""
+        self._load(upload_id)
+        self._acquire(upload_id)
+        try:
+            self.discard(upload_id)
+        finally:
+            self._release(upload_id)
+    
+    def discard(self, upload_id: str) -> None:
+        """删除会话和暂存文件"""
+        for path in (self._part_path(upload_id), self._meta_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def cleanup_expired(self) -> int:
+        """删除超过 ttl 没有写入的会话，返回删除的数量"""
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        deadline = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            upload_id = name[:-len('.json')]
+            try:
+                if os.path.getmtime(self._meta_path(upload_id)) < deadline:
+                    self.discard(upload_id)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            print(f"🧹 [UploadSession] 清理过期上传会话: {removed} 个")
+        return removed
+    
+    def _load(self, upload_id: str) -> Dict[str, Any]:
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadSessionError('upload session not found', status=404)
+        try:
+            with open(self._meta_path(upload_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise UploadSessionError('upload session not found', status=404)
+    
+    def _part_size(self, upload_id: str) -> int:
+        """暂存文件的大小（已写入的偏移量），暂存文件不存在（会话已完成或已取消）时返回 404"""
+        try:
+            return os.path.getsize(self._part_path(upload_id))
+        except OSError:
+            raise UploadSessionError('upload session not found', status=404)
+    
+    def _status(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        offset = self._part_size(session['uploadId'])
+        return {
+            'uploadId': session['uploadId'],
+            'filename': session['filename'],
+            'size': session['size'],
+            'offset': offset,
+            'complete': offset == session['size'],
+            'chunkSize': CHUNK_SIZE,
+            'maxChunkSize': MAX_CHUNK_SIZE
+        }
+    
+    def _acquire(self, upload_id: str) -> None:
+        with self._lock:
+            if upload_id in self._busy:
+                raise UploadSessionError('another request is writing this upload', status=409)
+            self._busy.add(upload_id)
+    
+    def _release(self, upload_id: str) -> None:
+        with self._lock:
+            self._busy.discard(upload_id)
+
+
+# 全局上传会话存储实例
+upload_session_store = UploadSessionStore()
+
+
+def get_upload_session_store() -> UploadSessionStore:
+    """获取全局上传会话存储实例"""
+    return upload_session_store
@@ -15,7 +15,6 @@ import signal
 import urllib.parse
 from urllib.parse import urlparse, parse_qs
 import json
-import hashlib
 import tempfile
 import time
 from io import BytesIO
@@ -25,10 +24,85 @@ DEFAULT_PORTS = [8080, 8000, 8888, 9000, 3000, 5000]
 
 # 导入数据管理器
 from data import get_data_manager, save_books_data, load_books_data
+from file_cache import get_file_cache, atomic_write_bytes
+from epub_locations import get_locations_index, DEFAULT_CHARS
+from epub_optimizer import get_epub_optimizer, OPTIMIZE_ENABLED
+from dictionary_proxy import get_dictionary_proxy, UpstreamError
+from dictionary_local import get_local_dictionary
+from dictionary_prefetch import prefetch_chapter, encode_prefetch_response
+from chapter_text import get_chapter_text_cache, MAX_RANGE
+from epub_structure import get_structure_cache, first_chapter
+from request_profiler import get_request_profiler, profiled
+from epub_parser import EpubBook, EpubParseError
+from reading_stats import get_reading_event_log
+from library_archive import iter_export_archive, spool_upload, import_archive, LibraryArchiveError
+from upload_pipeline import UploadPipeline
+from online_migrations import get_migration_runner
+from records import encode_response
+from response_cache import get_response_cache
+from cover_sprites import get_cover_sprite_builder, SPRITE_PAGE_SIZE, MAX_SPRITE_PAGE_SIZE
+from admission import get_admission_controller, admission_controlled
+from keep_alive import KeepAliveMixin
+from resumable_upload import get_upload_session_store, UploadSessionError
+from job_queue import get_job_queue
+from change_events import get_change_event_bus
+from static_assets import get_static_assets, PRECACHE_PATH, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
 
 # 全局数据管理器
 data_manager = get_data_manager()
 
+# 全局内存映射文件缓存（书籍和封面）
+file_cache = get_file_cache()
+
+# 全局位置索引（服务端预生成的 epub.js locations）
+locations_index = get_locations_index()
+
+# 全局EPUB优化器（生成图片重新压缩后的优化版本）
+epub_optimizer = get_epub_optimizer()
+
+# 全局词典代理（请求线程并发访问，需在启动时创建）
+dictionary_proxy = get_dictionary_proxy()
+
+# 全局本地词典（离线索引，优先于远程词典）
+local_dictionary = get_local_dictionary()
+
+# 全局阅读事件记录（进度保存批量写入阅读历史）
+reading_event_log = get_reading_event_log(data_manager)
+
+# 全局请求分析器（通过 EPUB_PROFILE / EPUB_PROFILE_TOKEN 开启）
+request_profiler = get_request_profiler()
+
+# 全局书籍结构缓存（spine、目录、manifest）
+structure_cache = get_structure_cache()
+
+# 全局章节纯文本缓存（供词典预取、文本接口等使用）
+chapter_text_cache = get_chapter_text_cache()
+
+# 全局后台数据迁移执行器（分批改写大表，不阻塞请求；每批提交后使对应表的响应缓存失效）
+migration_runner = get_migration_runner(data_manager.db_file, on_batch=data_manager.bump_generation)
+
+# 全局接口响应缓存（/api/books、/api/annotations/<id>，按数据表版本号失效）
+response_cache = get_response_cache()
+
+# 全局书架封面拼图生成器（需要 Pillow）
+cover_sprite_builder = get_cover_sprite_builder()
+
+# 全局请求准入控制器（按请求类别限制并发，过载时返回 503）
+admission_controller = get_admission_controller()
+
+# 全局分块上传会话存储（books/.uploads）
+upload_session_store = get_upload_session_store()
+
+# 全局后台任务队列（任务保存在 jobs 表中，main() 中启动工作线程）
+job_queue = get_job_queue(data_manager.db_file)
+
+# 全局变更事件总线（阅读进度和注释写入后通过 /api/events 推送）
+change_event_bus = get_change_event_bus()
+data_manager.add_change_listener(change_event_bus.publish)
+
+# 全局静态资源指纹清单（页面中的资源引用改写为带内容哈希的地址）
+static_assets = get_static_assets()
+
 # 为了兼容现有代码，保留全局变量引用
 BOOKS_STORAGE = data_manager.books
 BOOK_FILES = data_manager.book_files
@@ -36,12 +110,6 @@ READING_PROGRESS = data_manager.reading_progress
 BOOKS_DIR = 'books'  # 书籍存储目录
 COVERS_DIR = 'books/covers'  # 封面存储目录
 
-def generate_book_id(file_content, filename):
-    """基于文件内容生成唯一的bookId"""
-    content_hash = hashlib.md5(file_content).hexdigest()
-    name_hash = hashlib.md5(filename.encode('utf-8')).hexdigest()
-    return f"book_{content_hash[:8]}_{name_hash[:8]}"
-
 def ensure_books_directory():
     """确保书籍存储目录存在"""
     if not os.path.exists(BOOKS_DIR):
@@ -52,12 +120,212 @@ def ensure_books_directory():
         os.makedirs(COVERS_DIR)
         print(f"📁 创建封面存储目录: {COVERS_DIR}")
 
+def release_cached_files(book_info):
+    """书籍删除后释放其文件映射和结构缓存，并删除优化版本"""
+    for file_path in (book_info.get('file_path'), book_info.get('coverPath')):
+        if file_path:
+            file_cache.invalidate(file_path)
+    
+    if book_info.get('file_path'):
+        structure_cache.invalidate(book_info['file_path'])
+        file_cache.invalidate(epub_optimizer.variant_path(book_info['file_path']))
+        epub_optimizer.remove(book_info['file_path'])
+
+def schedule_book_indexing(book_id, book_file_path):
+    """书籍写入后提交后台任务，预生成位置索引和章节文本"""
+    job_queue.enqueue('index_book', {'filePath': book_file_path}, key=book_file_path)
+
+def run_index_book_job(payload):
+    """后台任务：生成位置索引和章节文本（已有缓存时跳过）"""
+    book_file_path = payload['filePath']
+    if not os.path.exists(book_file_path):
+        return
+    if locations_index.get(book_file_path) is None:
+        locations_index.build(book_file_path)
+    chapter_text_cache.build(book_file_path)
+
+def run_remove_book_files_job(payload):
+    """后台任务：删除已从书库移除的书籍文件（书籍已重新上传时跳过）"""
+    # 持有书籍锁检查并删除，重新上传同一本书时不会在写入文件和登记书籍之间删掉新文件
+    with data_manager.book_lock(payload['bookId']):
+        if data_manager.get_book(payload['bookId']):
+            print(f"⏭️ 书籍已重新添加，跳过文件清理: {payload['bookId']}")
+            return
+        data_manager.remove_book_files(payload.get('filePath'), payload.get('coverPath'))
+    if payload.get('filePath') and os.path.exists(payload['filePath']):
+        raise OSError(f"书籍文件删除失败: {payload['filePath']}")
+
+job_queue.register('index_book', run_index_book_job)
+job_queue.register('remove_book_files', run_remove_book_files_job)
+
 # save_books_data 和 load_books_data 函数已从 data.py 导入，不需要重复定义
 
-class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def version_string(self):
-        """Return server version string."""
-        return f"HTTP/1.1 Server"
+class MyHTTPRequestHandler(KeepAliveMixin, http.server.SimpleHTTPRequestHandler):
+    # 由默认处理返回的静态文件附加的 Cache-Control
+    static_cache_control = None
+    
+    def send_file_response(self, file_path, content_type, extra_headers=None):
+        """通过内存映射缓存发送文件，支持单区间 Range 请求"""
+        handle = file_cache.acquire(file_path)
+        try:
+            size = handle.size if handle else os.path.getsize(file_path)
+            byte_range = self.parse_range_header(self.headers.get('Range'), size)
+            if byte_range == 'invalid':
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            
+            if byte_range:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end - 1}/{size}')
+            else:
+                start, end = 0, size
+                self.send_response(200)
+            
+            self.send_header('Content-type', content_type)
+            self.send_header('Content-Length', str(end - start))
+            self.send_header('Accept-Ranges', 'bytes')
+            for name, value in (extra_headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            
+            if handle:
+                # 直接发送映射内存的切片，不复制数据
+                self.wfile.write(handle.slice(start, end))
+            else:
+                # 文件超过缓存上限，退回分块读取
+                with open(file_path, 'rb') as f:
+                    f.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = f.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            break
+                        self.wfile.write(chunk)
+                        remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            print(f"⚠️ 客户端提前断开: {file_path}")
+        finally:
+            if handle:
+                handle.release()
+    
+    def send_cached_json(self, entry):
+        """发送缓存的 JSON 响应：ETag 一致时返回 304，客户端接受 gzip 时发送压缩版本"""
+        if self.headers.get('If-None-Match') == entry.etag:
+            self.send_response(304)
+            self.send_header('ETag', entry.etag)
+            self.end_headers()
+            return
+        
+        body = entry.body
+        accepts_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        if entry.gzip_body is not None and accepts_gzip:
+            body = entry.gzip_body
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', entry.etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def send_upload_session_error(self, error):
+        """分块上传出错时返回 JSON（带当前偏移量，客户端据此续传）"""
+        body = json.dumps({
+            'success': False,
+            'error': str(error),
+            'offset': error.offset
+        }).encode('utf-8')
+        self.send_response(error.status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if error.offset is not None:
+            self.send_header('Upload-Offset', str(error.offset))
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 块传输中途断开时客户端已经不在，下次查询偏移量后续传
+            print(f"⚠️ 客户端提前断开: {self.path}")
+    
+    def send_static_asset(self, path):
+        """发送页面、预缓存清单或指纹资源，path 不属于这几类时返回 False（GET 和 HEAD 共用）"""
+        if path == PRECACHE_PATH:
+            response = static_assets.render_precache()
+        else:
+            response = static_assets.render_page(path)
+        
+        if response is not None:
+            if self.headers.get('If-None-Match') == response.etag:
+                self.send_response(304)
+                self.send_header('ETag', response.etag)
+                self.send_header('Cache-Control', REVALIDATE_CACHE_CONTROL)
+                self.end_headers()
+                return True
+            self.send_response(200)
+            self.send_header('Content-type', response.content_type)
+            self.send_header('Content-Length', str(len(response.body)))
+            self.send_header('ETag', response.etag)
+            self.send_header('Cache-Control', REVALIDATE_CACHE_CONTROL)
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(response.body)
+            return True
+        
+        entry = static_assets.resolve(path)
+        if entry is None:
+            return False
+        etag = f'"{entry.digest}"'
+        headers = {'ETag': etag, 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+        elif self.command == 'HEAD':
+            self.send_response(200)
+            self.send_header('Content-type', self.guess_type(entry.file_path))
+            self.send_header('Content-Length', str(entry.signature[0]))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+        else:
+            self.send_file_response(entry.file_path, self.guess_type(entry.file_path), headers)
+        return True
+    
+    @staticmethod
+    def parse_range_header(range_header, size):
+        """解析 Range 头，返回 (start, end) 半开区间；无 Range 返回 None，无法满足返回 'invalid'"""
+        if not range_header or not range_header.startswith('bytes='):
+            return None
+        spec = range_header[6:].strip()
+        if ',' in spec:
+            # 不支持多区间，按完整文件返回
+            return None
+        try:
+            start_text, end_text = spec.split('-', 1)
+            if start_text:
+                start = int(start_text)
+                end = int(end_text) + 1 if end_text else size
+            else:
+                # bytes=-N 表示最后 N 个字节
+                start = max(size - int(end_text), 0)
+                end = size
+        except ValueError:
+            return None
+        
+        end = min(end, size)
+        if start >= size or start >= end:
+            return 'invalid'
+        return start, end
+    
+    @admission_controlled
+    @profiled
     def do_GET(self):
         # 解析URL路径
         parsed_path = urlparse(self.path)
@@ -65,18 +333,11 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         print(f"📍 GET请求路径: {path}")
         
-        # 处理根路径，返回书架页面
+        # 处理根路径（书架页面）、阅读器页面和带指纹的静态资源
+        if self.send_static_asset(path):
+            return
         if path == '/':
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html; charset=utf-8')
-            self.end_headers()
-            
-            try:
-                with open('index.html', 'r', encoding='utf-8') as f:
-                    content = f.read()
-                self.wfile.write(content.encode('utf-8'))
-            except FileNotFoundError:
-                self.send_error(404, "index.html not found")
+            self.send_error(404, "index.html not found")
             return
         
         # 处理API路由 /api/cover/<bookId> - 获取书籍封面
@@ -89,15 +350,13 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 if cover_path and os.path.exists(cover_path):
                     print(f"📸 提供封面: {book_id}")
                     
-                    self.send_response(200)
-                    self.send_header('Content-type', 'image/jpeg')
-                    self.send_header('Cache-Control', 'public, max-age=86400')  # 缓存1天
-                    self.end_headers()
-                    
-                    with open(cover_path, 'rb') as f:
-                        self.wfile.write(f.read())
+                    self.send_file_response(cover_path, 'image/jpeg', {
+                        'Cache-Control': 'public, max-age=86400'  # 缓存1天
+                    })
                     return
                 else:
+                    # 封面文件在服务运行期间被删除：清除记录，缓存的书籍列表不再标记 hasCover
+                    data_manager.clear_missing_cover(book_id, cover_path)
                     self.send_error(404, f"Cover not found: {book_id}")
                     return
             else:
@@ -106,45 +365,345 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         # 处理API路由 /api/books - 获取所有书籍列表
         if path == '/api/books':
-            books = data_manager.get_all_books()
-            print(f"📚 [API] 获取书籍列表，共 {len(books)} 本书")
+            def build_books_response():
+                books = data_manager.get_book_records()
+                print(f"📚 [API] 获取书籍列表，共 {len(books)} 本书")
+                # 书籍记录直接编码为响应（封面是否存在在编码时检查）
+                response = {
+                    'success': True,
+                    'count': len(books)
+                }
+                return encode_response(response, 'books', books)
+            
+            entry = response_cache.get(('books',), data_manager.get_generation('books'), build_books_response)
+            self.send_cached_json(entry)
+            return
+        
+        # 处理API路由 /api/covers/sprite?offset=<起始>&limit=<数量> - 一页书籍（顺序与 /api/books 一致）的封面拼图坐标
+        # 处理API路由 /api/covers/sprite.jpg?offset=&limit=&v=<版本> - 拼图图片
+        if path in ('/api/covers/sprite', '/api/covers/sprite.jpg'):
+            query_params = parse_qs(parsed_path.query)
+            try:
+                offset = max(0, int(query_params.get('offset', ['0'])[0]))
+                limit = max(1, min(int(query_params.get('limit', [str(SPRITE_PAGE_SIZE)])[0]), MAX_SPRITE_PAGE_SIZE))
+            except ValueError:
+                self.send_error(400, "Invalid offset or limit")
+                return
+            want_image = path.endswith('.jpg')
+            
+            if not cover_sprite_builder.available:
+                # 未安装 Pillow，书架退回逐本请求封面
+                if want_image:
+                    self.send_error(404, "Cover sprites unavailable")
+                    return
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json; charset=utf-8')
+                self.end_headers()
+                self.wfile.write(json.dumps({'success': True, 'available': False}).encode('utf-8'))
+                return
+            
+            try:
+                books = data_manager.get_book_records()
+                page = books[offset:offset + limit]
+                sprite = cover_sprite_builder.get_sprite([(book.book_id, book.cover_path) for book in page])
+            except Exception as e:
+                print(f"❌ 生成封面拼图失败: {e}")
+                self.send_error(500, "Cover sprite failed")
+                return
+            
+            if want_image:
+                etag = f'"{sprite.version}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                # 带当前版本号的地址内容不会再变，可以长期缓存
+                immutable = query_params.get('v', [None])[0] == sprite.version
+                self.send_response(200)
+                self.send_header('Content-type', 'image/jpeg')
+                self.send_header('Content-Length', str(len(sprite.image)))
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', 'public, max-age=31536000, immutable' if immutable else 'no-cache')
+                self.end_headers()
+                self.wfile.write(sprite.image)
+                return
             
             self.send_response(200)
             self.send_header('Content-type', 'application/json; charset=utf-8')
             self.end_headers()
             
-            # 构建书籍列表响应
-            books_list = []
-            for book_id, book_info in books.items():
-                # 检查是否有封面
-                has_cover = book_info.get('coverPath') and os.path.exists(book_info.get('coverPath', ''))
-                
-                books_list.append({
-                    'id': book_id,
-                    'title': book_info['title'],
-                    'author': book_info['author'],
-                    'filename': book_info['filename'],
-                    'language': book_info['language'],
-                    'fileSize': book_info['fileSize'],
-                    'addedDate': book_info['addedDate'],
-                    'publisher': book_info.get('publisher', '未知出版商'),
-                    'description': book_info.get('description', ''),
-                    'identifier': book_info.get('identifier', ''),
-                    'hasCover': has_cover,
-                    'coverUrl': f'/api/cover/{book_id}' if has_cover else None,
-                    'fontFamily': book_info.get('fontFamily'),
-                    'fontMode': book_info.get('fontMode', 'auto')
-                })
+            response = {
+                'success': True,
+                'available': True,
+                'offset': offset,
+                'limit': limit,
+                'total': len(books),
+                'image': f'/api/covers/sprite.jpg?offset={offset}&limit={limit}&v={sprite.version}',
+                **sprite.to_json()
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/cache/stats - 获取文件映射缓存统计
+        if path == '/api/cache/stats':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
             
             response = {
                 'success': True,
-                'books': books_list,
-                'count': len(books_list)
+                'fileCache': file_cache.get_stats(),
+                'dictCache': dictionary_proxy.get_stats(),
+                'localDictionary': local_dictionary.get_stats(),
+                'chapterText': chapter_text_cache.get_stats(),
+                'structure': structure_cache.get_stats(),
+                'responses': response_cache.get_stats(),
+                'coverSprites': cover_sprite_builder.get_stats()
             }
             
             self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
             return
         
+        # 处理API路由 /api/profiles?limit=<数量>&route=<路由> - 最近最耗时的请求及其分析文件
+        if path == '/api/profiles':
+            if not request_profiler.is_authorized(self.headers):
+                self.send_error(404, "Profiling disabled")
+                return
+            
+            query_params = parse_qs(parsed_path.query)
+            try:
+                limit = max(1, min(int(query_params.get('limit', ['20'])[0]), 500))
+            except ValueError:
+                limit = 20
+            route = query_params.get('route', [None])[0]
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **request_profiler.get_stats(),
+                'routes': request_profiler.get_route_summary(),
+                'slowest': request_profiler.get_slowest(limit, route)
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/export - 流式导出整个书库（EPUB、封面和数据库快照）
+        if path == '/api/export':
+            filename = f"epub-library-{time.strftime('%Y%m%d-%H%M%S')}.zip"
+            print(f"📦 [API] 开始导出书库: {filename}")
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/zip')
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+            self.start_stream()
+            
+            try:
+                for chunk in iter_export_archive(data_manager.db_file):
+                    self.write_stream(chunk)
+                self.end_stream()
+            except Exception as e:
+                # 响应头已发出，只能中断连接，客户端得到的是不完整的归档
+                print(f"❌ 导出书库失败: {e}")
+                self.close_connection = True
+            return
+        
+        # 处理API路由 /api/stats/reading?days=<天数>&bookId=<书籍ID> - 阅读统计（只读汇总表）
+        if path == '/api/stats/reading':
+            query_params = parse_qs(parsed_path.query)
+            try:
+                days = max(1, min(int(query_params.get('days', ['30'])[0]), 3650))
+            except ValueError:
+                self.send_error(400, "Invalid days")
+                return
+            book_id = query_params.get('bookId', [None])[0]
+            
+            # 先写入缓冲中的事件，统计包含刚刚的阅读
+            reading_event_log.flush()
+            stats = data_manager.get_reading_stats(days, book_id)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                'days': days,
+                **stats,
+                'buffer': reading_event_log.get_stats()
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/migrations - 后台数据迁移状态和进度
+        if path == '/api/migrations':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **migration_runner.get_status()
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/uploads/<uploadId> - 分块上传会话状态（已写入的偏移量）
+        if path.startswith('/api/uploads/'):
+            try:
+                status = upload_session_store.get(path[len('/api/uploads/'):])
+            except UploadSessionError as e:
+                self.send_upload_session_error(e)
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Upload-Offset', str(status['offset']))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **status
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/jobs?status=<状态>&limit=<数量> - 后台任务队列统计和最近的任务
+        if path == '/api/jobs':
+            query_params = parse_qs(parsed_path.query)
+            try:
+                limit = max(1, min(int(query_params.get('limit', ['50'])[0]), 500))
+            except ValueError:
+                limit = 50
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **job_queue.get_stats(),
+                'jobs': job_queue.list_jobs(query_params.get('status', [None])[0], limit)
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/jobs/<jobId> - 单个后台任务的状态
+        if path.startswith('/api/jobs/'):
+            try:
+                job = job_queue.get_job(int(path[len('/api/jobs/'):]))
+            except ValueError:
+                job = None
+            if not job:
+                self.send_error(404, "Job not found")
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                'job': job
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/events?bookId=<书籍ID> - 以 SSE 推送阅读进度和注释变更（不传 bookId 时推送整个书库）
+        if path == '/api/events':
+            query_params = parse_qs(parsed_path.query)
+            book_id = query_params.get('bookId', [None])[0]
+            last_event_id = self.headers.get('Last-Event-ID') or query_params.get('lastEventId', [None])[0]
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+            self.send_header('Cache-Control', 'no-cache')
+            self.start_stream()
+            
+            try:
+                for data in change_event_bus.stream(last_event_id, book_id):
+                    self.write_stream(data)
+                self.end_stream()
+            except (BrokenPipeError, ConnectionResetError, TimeoutError):
+                # 客户端断开后 EventSource 会带着 Last-Event-ID 重连
+                self.close_connection = True
+            return
+        
+        # 处理API路由 /api/events/stats - 变更事件缓冲区和订阅连接数
+        if path == '/api/events/stats':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **change_event_bus.get_stats()
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/admission - 各请求类别的并发、排队和拒绝统计
+        if path == '/api/admission':
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **admission_controller.get_stats()
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/dict/<lang>/<word> - 词典查询（本地词典优先，未收录时走带缓存的上游代理）
+        if path.startswith('/api/dict/'):
+            lang, _, word = path[10:].partition('/')  # 移除 '/api/dict/' 前缀
+            word = urllib.parse.unquote(word)
+            if not lang or not word.strip():
+                self.send_error(400, "Missing language or word")
+                return
+            
+            try:
+                body = local_dictionary.lookup(lang, word)
+                if body is not None:
+                    status, cache_state = 200, 'LOCAL'
+                else:
+                    status, body, cache_state = dictionary_proxy.lookup(lang, word)
+            except UpstreamError as e:
+                print(f"❌ [API] 词典上游不可用: {word} ({e})")
+                body = json.dumps({'success': False, 'error': f'Dictionary upstream unavailable: {e}'},
+                                  ensure_ascii=False).encode('utf-8')
+                self.send_response(502)
+                self.send_header('Content-type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            
+            print(f"📖 [API] 词典查询: {lang}/{word} ({cache_state})")
+            
+            # 上游响应原样返回，前端的解析逻辑不变
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('X-Cache', cache_state)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        
         # 处理API路由 /api/book-font/<bookId> - 获取书籍字体设置
         if path.startswith('/api/book-font/'):
             book_id = path[15:]  # 移除 '/api/book-font/' 前缀 (15个字符)
@@ -176,7 +735,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             
             self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
             return
-
+        
         # 处理API路由 /api/progress/<bookId> - 获取阅读进度
         if path.startswith('/api/progress/'):
             book_id = path[14:]  # 移除 '/api/progress/' 前缀 (14个字符)
@@ -209,24 +768,255 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
             
             print(f"📝 [API] 获取注释请求: '{book_id}', type: {annotation_type}")
             
+            def build_annotations_response():
+                # 使用数据管理器获取注释记录，直接编码为响应
+                annotations = data_manager.get_annotation_records(book_id, annotation_type)
+                print(f"📝 [API] 返回注释数据: {len(annotations)} 个注释")
+                response = {
+                    'success': True,
+                    'bookId': book_id,
+                    'count': len(annotations)
+                }
+                return encode_response(response, 'annotations', annotations)
+            
+            entry = response_cache.get(('annotations', book_id, annotation_type),
+                                       data_manager.get_generation('annotations'), build_annotations_response)
+            self.send_cached_json(entry)
+            return
+        
+        # 处理API路由 /api/book/<bookId>/file/<path> - 获取EPUB内的单个文件（章节、样式、图片）
+        # 先于其他子路由匹配：文件路径可能以 /locations、/text 等结尾
+        if path.startswith('/api/book/') and '/file/' in path:
+            book_id, _, entry_path = path[10:].partition('/file/')
+            entry_path = urllib.parse.unquote(entry_path)
+            book_path = data_manager.get_book_file_path(book_id)
+            if not book_path or not os.path.exists(book_path):
+                self.send_error(404, f"Book not found: {book_id}")
+                return
+            
+            try:
+                with EpubBook(book_path) as epub:
+                    media_type = next((item['mediaType'] for item in epub.manifest.values()
+                                       if item['path'] == entry_path), None)
+                    content = epub.read(entry_path) if media_type else None
+            except EpubParseError:
+                content = None
+            if content is None:
+                # 只提供 manifest 中列出的文件
+                self.send_error(404, "Entry not found")
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', media_type)
+            self.send_header('Content-Length', str(len(content)))
+            self.send_header('Cache-Control', 'private, max-age=3600')
+            self.end_headers()
+            self.wfile.write(content)
+            return
+        
+        # 处理API路由 /api/book/<bookId>/locations - 获取预生成的位置索引
+        if path.startswith('/api/book/') and path.endswith('/locations'):
+            book_id = path[10:-10]  # 移除 '/api/book/' 前缀和 '/locations' 后缀
+            book_path = data_manager.get_book_file_path(book_id)
+            if not book_path or not os.path.exists(book_path):
+                self.send_error(404, f"Book not found: {book_id}")
+                return
+            
+            query_params = parse_qs(parsed_path.query)
+            try:
+                chars = int(query_params.get('chars', [DEFAULT_CHARS])[0])
+            except ValueError:
+                chars = DEFAULT_CHARS
+            chars = max(16, min(chars, 100000))
+            
+            index = locations_index.get(book_path, chars)
+            if index is None:
+                # 尚未生成：放入后台队列，客户端可先自行生成
+                locations_index.schedule(book_path, chars)
+                print(f"📍 [API] 位置索引生成中: {book_id} (chars={chars})")
+                
+                self.send_response(202)
+                self.send_header('Content-type', 'application/json; charset=utf-8')
+                self.end_headers()
+                
+                response = {
+                    'success': False,
+                    'bookId': book_id,
+                    'chars': chars,
+                    'status': 'pending'
+                }
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+                return
+            
+            etag = f'"{index["contentHash"]}-{chars}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            
+            print(f"📍 [API] 返回位置索引: {book_id}, 共 {len(index['locations'])} 个")
+            
+            response = {
+                'success': True,
+                'bookId': book_id,
+                'chars': chars,
+                'contentHash': index['contentHash'],
+                'total': index['total'],
+                'locations': index['locations']
+            }
+            body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+            
             self.send_response(200)
             self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
             self.end_headers()
+            self.wfile.write(body)
+            return
+        
+        # 处理API路由 /api/book/<bookId>/structure - 获取书籍结构（spine、目录、manifest），无需下载整本书
+        if path.startswith('/api/book/') and path.endswith('/structure'):
+            book_id = path[10:-10]  # 移除 '/api/book/' 前缀和 '/structure' 后缀
+            book_path = data_manager.get_book_file_path(book_id)
+            if not book_path or not os.path.exists(book_path):
+                self.send_error(404, f"Book not found: {book_id}")
+                return
+            
+            try:
+                structure, body, etag = structure_cache.get(book_path)
+            except EpubParseError:
+                self.send_error(500, "Failed to parse book")
+                return
+            
+            # 提示浏览器预加载第一个章节
+            chapter = first_chapter(structure)
+            preload = None
+            if chapter:
+                chapter_url = f"/api/book/{urllib.parse.quote(book_id)}/file/{urllib.parse.quote(chapter['path'])}"
+                preload = f'<{chapter_url}>; rel=preload; as=fetch; crossorigin'
+            
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
             
-            # 使用数据管理器获取注释数据
-            annotations = data_manager.get_book_annotations(book_id, annotation_type)
+            print(f"🗂️ [API] 返回书籍结构: {book_id}, {len(structure['spine'])} 个章节")
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            if preload:
+                self.send_header('Link', preload)
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        
+        # 处理API路由 /api/book/<bookId>/variants - 获取优化版本的节省情况
+        if path.startswith('/api/book/') and path.endswith('/variants'):
+            book_id = path[10:-9]  # 移除 '/api/book/' 前缀和 '/variants' 后缀
+            book_path = data_manager.get_book_file_path(book_id)
+            if not book_path or not os.path.exists(book_path):
+                self.send_error(404, f"Book not found: {book_id}")
+                return
+            
+            report = epub_optimizer.get_report(book_path)
+            if report is not None:
+                status = 'ready' if report['savedBytes'] > 0 else 'unchanged'
+            elif epub_optimizer.is_pending(book_path):
+                status = 'pending'
+            else:
+                status = 'none'
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
             
             response = {
                 'success': True,
                 'bookId': book_id,
-                'annotations': annotations,
-                'count': len(annotations)
+                'originalSize': os.path.getsize(book_path),
+                'status': status,
+                'optimized': report
+            }
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理API路由 /api/book/<bookId>/text?start=<index>&end=<index> - 获取章节纯文本（end 不包含）
+        if path.startswith('/api/book/') and path.endswith('/text'):
+            book_id = path[10:-5]  # 移除 '/api/book/' 前缀和 '/text' 后缀
+            book_path = data_manager.get_book_file_path(book_id)
+            if not book_path or not os.path.exists(book_path):
+                self.send_error(404, f"Book not found: {book_id}")
+                return
+            
+            query_params = parse_qs(parsed_path.query)
+            try:
+                start = int(query_params.get('start', ['0'])[0])
+                end = int(query_params.get('end', [str(start + 1)])[0])
+                if end - start > MAX_RANGE:
+                    raise ValueError
+                result = chapter_text_cache.get_range(book_path, start, end)
+            except (ValueError, IndexError):
+                self.send_error(400, f"Invalid spine range (at most {MAX_RANGE} chapters)")
+                return
+            except EpubParseError:
+                self.send_error(500, "Failed to parse book")
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                'bookId': book_id,
+                **result
             }
             
-            print(f"📝 [API] 返回注释数据: {len(annotations)} 个注释")
             self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
             return
         
+        # 处理API路由 /api/book/<bookId>/dictionary?spine=<index> - 批量预取章节内词语的词典数据
+        if path.startswith('/api/book/') and path.endswith('/dictionary'):
+            book_id = path[10:-11]  # 移除 '/api/book/' 前缀和 '/dictionary' 后缀
+            book_info = data_manager.get_book(book_id)
+            book_path = book_info.get('file_path') if book_info else None
+            if not book_path or not os.path.exists(book_path):
+                self.send_error(404, f"Book not found: {book_id}")
+                return
+            
+            query_params = parse_qs(parsed_path.query)
+            book_language = book_info.get('language')
+            if not book_language or book_language == 'unknown':
+                book_language = 'ja'
+            language = query_params.get('lang', [book_language])[0]
+            try:
+                spine_index = int(query_params.get('spine', [''])[0])
+                text = chapter_text_cache.get_chapter(book_path, spine_index)
+            except (ValueError, IndexError):
+                self.send_error(400, f"Invalid spine index: {query_params.get('spine', [''])[0]}")
+                return
+            except EpubParseError as e:
+                self.send_error(500, f"Failed to parse book: {e}")
+                return
+            
+            result = prefetch_chapter(text, language, local_dictionary, dictionary_proxy)
+            print(f"📖 [API] 章节词典预取: {book_id} #{spine_index}, "
+                  f"{result['stats']['resolved']} 个词 ({result['stats']['elapsed']}s)")
+            
+            body = encode_prefetch_response(book_id, spine_index, language, result)
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        
         # 处理API路由 /api/book/<bookId> - 获取特定书籍的文件
         if path.startswith('/api/book/'):
             book_id = path[10:]  # 移除 '/api/book/' 前缀
@@ -235,17 +1025,27 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 book_path = data_manager.get_book_file_path(book_id)
                 
                 if book_path and os.path.exists(book_path):
-                    print(f"📚 提供书籍文件: {book_id}")
+                    served_path = book_path
+                    variant = 'original'
+                    
+                    # ?variant=optimized：有优化版本时提供优化版本，否则提供原文件并在后台生成
+                    query_params = parse_qs(parsed_path.query)
+                    if query_params.get('variant', [''])[0] == 'optimized' and OPTIMIZE_ENABLED:
+                        optimized_path = epub_optimizer.get_variant(book_path)
+                        if optimized_path:
+                            served_path = optimized_path
+                            variant = 'optimized'
+                        elif epub_optimizer.get_report(book_path) is None:
+                            epub_optimizer.schedule(book_path)
+                    
+                    print(f"📚 提供书籍文件: {book_id} ({variant})")
                     
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/epub+zip')
                     # 对文件名进行URL编码以支持中文字符
                     encoded_filename = urllib.parse.quote(book_info["filename"])
-                    self.send_header('Content-Disposition', f'inline; filename*=UTF-8\'\'{encoded_filename}')
-                    self.end_headers()
-                    
-                    with open(book_path, 'rb') as f:
-                        self.wfile.write(f.read())
+                    self.send_file_response(served_path, 'application/epub+zip', {
+                        'Content-Disposition': f'inline; filename*=UTF-8\'\'{encoded_filename}',
+                        'X-Epub-Variant': variant
+                    })
                     return
                 else:
                     self.send_error(404, f"Book file not found: {book_id}")
@@ -269,9 +1069,15 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 self.send_error(404, f"Book not found: {book_id}")
                 return
         
-        # 其他请求使用默认处理
-        super().do_GET()
+        # 其他静态文件每次向服务器确认是否修改（Last-Modified）
+        self.static_cache_control = REVALIDATE_CACHE_CONTROL
+        try:
+            super().do_GET()
+        finally:
+            self.static_cache_control = None
     
+    @admission_controlled
+    @profiled
     def do_HEAD(self):
         """处理HEAD请求 - 用于验证资源是否存在"""
         # 解析URL路径
@@ -306,9 +1112,18 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 self.send_error(404, f"Book not found: {book_id}")
                 return
         
+        if self.send_static_asset(path):
+            return
+        
         # 其他HEAD请求使用默认处理
-        super().do_HEAD()
-
+        self.static_cache_control = REVALIDATE_CACHE_CONTROL
+        try:
+            super().do_HEAD()
+        finally:
+            self.static_cache_control = None
+    
+    @admission_controlled
+    @profiled
     def do_POST(self):
         # 解析URL路径
         parsed_path = urlparse(self.path)
@@ -318,6 +1133,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         # 处理文件上传 /api/upload
         if path == '/api/upload':
+            streaming = False
             try:
                 # 解析multipart/form-data
                 content_type = self.headers.get('Content-Type', '')
@@ -364,90 +1180,74 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     self.send_error(400, "No EPUB files uploaded")
                     return
                 
-                uploaded_books = []
-                
+                uploads = []
                 for file_index, file_data in enumerate(files):
-                    filename = file_data['filename']
-                    content = file_data['content']
-                    
-                    # 生成bookId
-                    book_id = generate_book_id(content, filename)
-                    
-                    # 确保书籍目录存在
-                    ensure_books_directory()
-                    
-                    # 保存到永久文件（使用bookId作为文件名）
-                    book_file_path = os.path.join(BOOKS_DIR, f"{book_id}.epub")
-                    with open(book_file_path, 'wb') as f:
-                        f.write(content)
-                    
-                    # 处理封面
-                    cover_path = None
                     cover_data = covers_map.get(str(file_index))
-                    if cover_data:
-                        try:
-                            cover_path = os.path.join(COVERS_DIR, f"{book_id}.jpg")
-                            with open(cover_path, 'wb') as f:
-                                f.write(cover_data['content'])
-                            print(f"📸 封面保存成功: {cover_path}")
-                        except Exception as e:
-                            print(f"❌ 封面保存失败: {e}")
-                            cover_path = None
-                    
-                    # 获取对应的元数据
-                    metadata = metadata_map.get(str(file_index), {})
-                    
-                    # 使用前端解析的元数据，如果没有则使用默认值
-                    title = metadata.get('title', filename.replace('.epub', ''))
-                    author = metadata.get('creator', metadata.get('author', '未知作者'))
-                    language = metadata.get('language', 'unknown')
-                    
-                    print(f"📚 处理书籍: {title} by {author} ({language})")
-                    
-                    # 使用数据管理器存储书籍信息
-                    book_info = {
-                        'title': title,
-                        'author': author,
-                        'filename': filename,
-                        'addedDate': str(int(time.time() * 1000)),
-                        'language': language,
-                        'fileSize': len(content),
-                        'publisher': metadata.get('publisher', '未知出版商'),
-                        'description': metadata.get('description', ''),
-                        'identifier': metadata.get('identifier', ''),
-                        'coverPath': cover_path  # 添加封面路径
-                    }
-                    
-                    data_manager.add_book(book_id, book_info, book_file_path)
-                    
-                    uploaded_books.append({
-                        'id': book_id,
-                        'title': book_info['title'],
-                        'filename': filename
+                    uploads.append({
+                        'filename': file_data['filename'],
+                        'content': file_data['content'],
+                        'metadata': metadata_map.get(str(file_index), {}),
+                        'cover': cover_data['content'] if cover_data else None
                     })
-                    
-                    print(f"📚 上传成功: {filename} -> {book_id}")
-                    file_index += 1
                 
-                # 保存数据到文件
-                data_manager.save_data()
+                # 确保书籍目录存在
+                ensure_books_directory()
                 
-                # 返回成功响应
+                pipeline = UploadPipeline(data_manager, BOOKS_DIR, COVERS_DIR, on_book_saved=schedule_book_indexing)
+                events = pipeline.process(uploads)
+                
+                # 客户端请求 NDJSON 时逐本返回进度，否则处理完后一次性返回
+                stream = 'application/x-ndjson' in self.headers.get('Accept', '') \
+                    or parse_qs(parsed_path.query).get('stream', [''])[0] == '1'
+                if stream:
+                    self.send_response(200)
+                    self.send_header('Content-type', 'application/x-ndjson; charset=utf-8')
+                    self.send_header('Cache-Control', 'no-cache')
+                    self.start_stream()
+                    streaming = True
+                    for event in events:
+                        self.write_stream(json.dumps(event, ensure_ascii=False).encode('utf-8') + b'\n')
+                    self.end_stream()
+                    return
+                
+                uploaded_books = []
+                failed_books = []
+                for event in events:
+                    if event['event'] != 'book':
+                        continue
+                    if event['success']:
+                        uploaded_books.append({
+                            'id': event['id'],
+                            'title': event['title'],
+                            'filename': event['filename']
+                        })
+                    else:
+                        failed_books.append({
+                            'filename': event['filename'],
+                            'error': event['error']
+                        })
+                
+                # 返回响应（部分失败时仍返回已成功的书籍）
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json; charset=utf-8')
                 self.end_headers()
                 
                 response = {
-                    'success': True,
+                    'success': len(uploaded_books) > 0,
                     'books': uploaded_books,
+                    'failed': failed_books,
                     'message': f'成功上传 {len(uploaded_books)} 本书籍'
                 }
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-                
+            
             except Exception as e:
                 print(f"❌ 文件上传失败: {e}")
-                self.send_error(500, f"Upload failed: {str(e)}")
+                if streaming:
+                    # 200 和部分进度已经发出，不能再发送错误响应；关闭连接，客户端收到的是不完整的响应
+                    self.close_connection = True
+                else:
+                    self.send_error(500, f"Upload failed: {str(e)}")
             
             return
         
@@ -480,6 +1280,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 }
                 
                 data_manager.set_progress(book_id, progress_data)
+                reading_event_log.record(book_id, progress_data)
                 
                 # 保存数据
                 data_manager.save_data()
@@ -499,13 +1300,143 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 }
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-                
+            
             except Exception as e:
                 print(f"❌ 保存阅读进度失败: {e}")
                 self.send_error(500, f"Save progress failed: {str(e)}")
             
             return
         
+        # 创建分块上传会话 /api/uploads（请求体 {filename, size, sha256?, metadata?}）
+        if path == '/api/uploads':
+            try:
+                content_length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(content_length).decode('utf-8'))
+                status = upload_session_store.create(request.get('filename'), request.get('size'),
+                                                     request.get('sha256'), request.get('metadata'))
+            except UploadSessionError as e:
+                self.send_upload_session_error(e)
+                return
+            except (ValueError, AttributeError):
+                self.send_error(400, "Invalid JSON")
+                return
+            
+            self.send_response(201)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Location', f"/api/uploads/{status['uploadId']}")
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **status
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 完成分块上传 /api/uploads/<uploadId>/complete - 校验后按普通上传流程登记书籍
+        if path.startswith('/api/uploads/') and path.endswith('/complete'):
+            upload_id = path[len('/api/uploads/'):-len('/complete')]
+            try:
+                session, part_path, md5 = upload_session_store.finalize(upload_id)
+            except UploadSessionError as e:
+                self.send_upload_session_error(e)
+                return
+            
+            # 登记完成前会话保持占用，并发的 complete、DELETE 返回 409
+            try:
+                ensure_books_directory()
+                pipeline = UploadPipeline(data_manager, BOOKS_DIR, COVERS_DIR, on_book_saved=schedule_book_indexing)
+                events = pipeline.process([{
+                    'filename': session['filename'],
+                    'path': part_path,
+                    'md5': md5,
+                    'metadata': session['metadata'],
+                    'cover': None
+                }])
+                event = [event for event in events if event['event'] == 'book'][0]
+                
+                if not event['success']:
+                    # 保留会话：服务端错误时暂存文件已移回，客户端可以重新提交 complete
+                    status = 422 if event['invalidEpub'] else 500
+                    self.send_upload_session_error(UploadSessionError(event['error'], status=status,
+                                                                      offset=session['size']))
+                    return
+                upload_session_store.discard(upload_id)
+            finally:
+                upload_session_store.release(upload_id)
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                'book': {
+                    'id': event['id'],
+                    'title': event['title'],
+                    'filename': event['filename'],
+                    'hasCover': event['hasCover']
+                },
+                'message': '书籍上传成功'
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        # 处理书库导入 /api/import（请求体为 /api/export 生成的 zip）
+        if path == '/api/import':
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length <= 0:
+                self.send_error(411, "Content-Length required")
+                return
+            
+            archive_path = None
+            try:
+                ensure_books_directory()
+                archive_path = spool_upload(self.rfile, content_length, BOOKS_DIR)
+                
+                # 恢复期间缓冲的旧事件不再写入
+                reading_event_log.reset()
+                result = import_archive(archive_path, data_manager.db_file)
+                reading_event_log.reset()
+                file_cache.clear()
+                data_manager.bump_generation()
+                
+                # 导入的数据库可能来自旧版本，继续执行其中未完成的数据迁移
+                migration_runner.start()
+                
+                # 后台为导入的书籍生成位置索引和章节文本（已有缓存的会直接跳过）
+                for book_id, book_file_path in data_manager.get_book_files().items():
+                    if book_file_path and os.path.exists(book_file_path):
+                        schedule_book_indexing(book_id, book_file_path)
+                
+                print(f"✅ [API] 书库导入完成: {result['files']} 个文件")
+                
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json; charset=utf-8')
+                self.end_headers()
+                
+                response = {
+                    'success': True,
+                    'message': '书库导入成功',
+                    **result
+                }
+                
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            
+            except LibraryArchiveError as e:
+                print(f"❌ 书库归档无效: {e}")
+                self.send_error(400, "Invalid library archive")
+            except Exception as e:
+                print(f"❌ 导入书库失败: {e}")
+                self.send_error(500, "Import library failed")
+            finally:
+                if archive_path and os.path.exists(archive_path):
+                    os.remove(archive_path)
+            
+            return
+        
         # 处理封面上传 /api/upload-cover
         if path == '/api/upload-cover':
             try:
@@ -548,8 +1479,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 
                 # 保存封面
                 cover_path = os.path.join(COVERS_DIR, f"{book_id}.jpg")
-                with open(cover_path, 'wb') as f:
-                    f.write(cover_data['content'])
+                atomic_write_bytes(cover_path, cover_data['content'])
                 
                 # 更新书籍信息
                 book_info['coverPath'] = cover_path
@@ -572,7 +1502,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 }
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-                
+            
             except Exception as e:
                 print(f"❌ 封面上传失败: {e}")
                 self.send_error(500, f"Cover upload failed: {str(e)}")
@@ -648,7 +1578,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
                 else:
                     self.send_error(500, "Failed to set font")
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 设置字体失败: {e}")
                 self.send_error(500, f"Set font failed: {str(e)}")
@@ -704,7 +1634,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
                 else:
                     self.send_error(500, "Failed to save annotation")
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 保存注释失败: {e}")
                 self.send_error(500, f"Save annotation failed: {str(e)}")
@@ -750,7 +1680,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
                 else:
                     self.send_error(404, f"Annotation not found: {annotation_id}")
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 删除注释失败: {e}")
                 self.send_error(500, f"Delete annotation failed: {str(e)}")
@@ -798,7 +1728,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
                 else:
                     self.send_error(404, f"Annotation not found: {annotation_id}")
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 更新注释失败: {e}")
                 self.send_error(500, f"Update annotation failed: {str(e)}")
@@ -842,7 +1772,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 }
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 清除注释失败: {e}")
                 self.send_error(500, f"Clear annotations failed: {str(e)}")
@@ -872,8 +1802,15 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 
                 print(f"🗑️ [API] 删除书籍请求: {book_id} - {book_info.get('title', 'Unknown')}")
                 
-                # 使用数据管理器删除书籍（包括实际文件）
-                success = data_manager.remove_book(book_id)
+                # 立即删除数据库记录和内存缓存，文件清理交给后台任务
+                reading_event_log.forget_book(book_id)
+                success = data_manager.remove_book(book_id, remove_files=False)
+                release_cached_files(book_info)
+                job_id = job_queue.enqueue('remove_book_files', {
+                    'bookId': book_id,
+                    'filePath': book_info.get('file_path'),
+                    'coverPath': book_info.get('coverPath')
+                }, key=book_id)
                 
                 if success:
                     # 保存更新后的数据
@@ -889,13 +1826,14 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     response = {
                         'success': True,
                         'message': f'书籍 "{book_info.get("title", book_id)}" 删除成功',
-                        'bookId': book_id
+                        'bookId': book_id,
+                        'jobId': job_id
                     }
                     
                     self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
                 else:
                     self.send_error(500, "Failed to delete book")
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 删除书籍失败: {e}")
                 self.send_error(500, f"Delete failed: {str(e)}")
@@ -905,6 +1843,45 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         # 其他POST请求
         self.send_error(404, "Not Found")
     
+    @admission_controlled
+    @profiled
+    def do_PUT(self):
+        """处理PUT请求 - 写入分块上传的一块数据"""
+        path = urlparse(self.path).path
+        
+        # 处理API路由 /api/uploads/<uploadId>（请求头 Upload-Offset 为该块的起始偏移量）
+        if path.startswith('/api/uploads/'):
+            try:
+                offset = int(self.headers.get('Upload-Offset', ''))
+                content_length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                self.send_error(400, "Upload-Offset and Content-Length required")
+                return
+            
+            try:
+                status = upload_session_store.write_chunk(path[len('/api/uploads/'):], offset,
+                                                          self.rfile, content_length)
+            except UploadSessionError as e:
+                self.send_upload_session_error(e)
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.send_header('Upload-Offset', str(status['offset']))
+            self.end_headers()
+            
+            response = {
+                'success': True,
+                **status
+            }
+            
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+            return
+        
+        self.send_error(404, "API endpoint not found")
+    
+    @admission_controlled
+    @profiled
     def do_DELETE(self):
         """处理DELETE请求 - 删除书籍"""
         # 解析URL路径
@@ -913,6 +1890,21 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         
         print(f"📍 DELETE请求路径: {path}")
         
+        # 处理API路由 /api/uploads/<uploadId> - 取消分块上传
+        if path.startswith('/api/uploads/'):
+            upload_id = path[len('/api/uploads/'):]
+            try:
+                upload_session_store.cancel(upload_id)
+            except UploadSessionError as e:
+                self.send_upload_session_error(e)
+                return
+            
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json; charset=utf-8')
+            self.end_headers()
+            self.wfile.write(json.dumps({'success': True, 'uploadId': upload_id}).encode('utf-8'))
+            return
+        
         # 处理API路由 /api/book/<bookId> - 删除特定书籍
         if path.startswith('/api/book/'):
             book_id = path[10:]  # 移除 '/api/book/' 前缀
@@ -930,8 +1922,15 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 
                 print(f"🗑️ [API] 删除书籍请求: {book_id} - {book_info.get('title', 'Unknown')}")
                 
-                # 使用数据管理器删除书籍（包括实际文件）
-                success = data_manager.remove_book(book_id)
+                # 立即删除数据库记录和内存缓存，文件清理交给后台任务
+                reading_event_log.forget_book(book_id)
+                success = data_manager.remove_book(book_id, remove_files=False)
+                release_cached_files(book_info)
+                job_id = job_queue.enqueue('remove_book_files', {
+                    'bookId': book_id,
+                    'filePath': book_info.get('file_path'),
+                    'coverPath': book_info.get('coverPath')
+                }, key=book_id)
                 
                 if success:
                     # 保存更新后的数据
@@ -947,13 +1946,14 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                     response = {
                         'success': True,
                         'message': f'书籍 "{book_info.get("title", book_id)}" 删除成功',
-                        'bookId': book_id
+                        'bookId': book_id,
+                        'jobId': job_id
                     }
                     
                     self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
                 else:
                     self.send_error(500, "Failed to delete book")
-                    
+            
             except Exception as e:
                 print(f"❌ [API] 删除书籍失败: {e}")
                 self.send_error(500, f"Delete failed: {str(e)}")
@@ -981,7 +1981,7 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
                 }
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-                
+            
             except Exception as e:
                 print(f"❌ [API] 清理失败: {e}")
                 self.send_error(500, f"Cleanup failed: {str(e)}")
@@ -1001,12 +2001,12 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
         for part in parts[1:-1]:  # 跳过第一个和最后一个空部分
             if not part.strip():
                 continue
-                
+            
             # 分离头部和内容
             header_end = part.find(b'\r\n\r\n')
             if header_end == -1:
                 continue
-                
+            
             headers = part[:header_end].decode('utf-8')
             content = part[header_end + 4:]
             
@@ -1058,8 +2058,11 @@ class MyHTTPRequestHandler(http.server.SimpleHTTPRequestHandler):
     def end_headers(self):
         # 添加 CORS 头部，允许跨域访问
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Upload-Offset')
+        self.send_header('Access-Control-Expose-Headers', 'Upload-Offset')
+        if self.static_cache_control:
+            self.send_header('Cache-Control', self.static_cache_control)
         super().end_headers()
     
     def do_OPTIONS(self):
@@ -1082,7 +2085,8 @@ def find_free_port(start_port=8080):
 def signal_handler(signum, frame):
     """处理信号，确保优雅关闭"""
     print("\n👋 正在关闭服务器...")
-    # 保存数据（确保数据不丢失）
+    # 保存数据（确保数据不丢失），包括缓冲中尚未写入的阅读事件
+    reading_event_log.flush()
     data_manager.save_data()
     print("📚 数据已保存")
     sys.exit(0)
@@ -1095,6 +2099,8 @@ def main():
     # 加载保存的书籍数据
     print("🔄 启动时加载数据...")
     data_manager.validate_book_files()  # 验证文件完整性
+    migration_runner.start()  # 后台执行未完成的数据迁移
+    job_queue.start()  # 启动后台任务线程（继续执行上次未完成的任务）
     print(f"📊 数据统计: {data_manager}")
     
     # 更新全局变量引用（确保最新数据）
@@ -1107,10 +2113,11 @@ def main():
     port = 8088
     
     try:
-        # 创建服务器并设置端口重用
-        class ReusableTCPServer(socketserver.TCPServer):
+        # 创建服务器并设置端口重用（每个请求一个线程，共享文件映射缓存）
+        class ReusableTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
             allow_reuse_address = True  # 关键：允许端口重用
-            
+            daemon_threads = True  # 关闭服务器时不等待请求线程
+        
         with ReusableTCPServer(("0.0.0.0", port), MyHTTPRequestHandler) as httpd:
             # 获取本机IP地址
             try:
@@ -1141,9 +2148,7 @@ def main():
                 print("⚠️  无法自动打开浏览器，请手动访问上述地址")
             
             httpd.serve_forever()
-            
-    except KeyboardInterrupt:
-        print("\n👋 服务器已停止")
+    
     except OSError as e:
         if "Address already in use" in str(e):
             print(f"❌ 端口 {port} 已被占用")
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+静态资源指纹模块
+assets/css、assets/js 下的资源按内容哈希生成带指纹的地址（assets/js/page.js -> /assets/js/page.<哈希>.js），
+返回页面时把其中的引用改写为指纹地址：
+
+- 指纹地址的内容不会改变，响应带 Cache-Control: immutable，浏览器和 Service Worker 直接使用缓存
+- 页面（index.html、epub-reader.html）使用 no-cache + ETag，每次向服务器确认，资源修改后立即生效
+- /sw-precache.js 由清单生成 Service Worker 的缓存版本号和预缓存列表，页面或资源变化后 Service Worker 自动更新
+- 资源文件修改后最多 CHECK_INTERVAL 秒重新生成清单，不需要重启服务
+
+python3 static_assets.py 输出当前的资源清单和预缓存列表
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Any, List, Optional, Tuple
+
+
+# 生成指纹的资源目录
+ASSET_DIRS = ('assets/css', 'assets/js', 'assets/fonts')
+
+# 需要改写资源引用的页面（URL 路径 -> 文件）
+PAGES = {
+    '/': 'index.html',
+    '/index.html': 'index.html',
+    '/epub-reader.html': 'epub-reader.html'
+}
+
+# 除页面引用的资源外需要预缓存的文件（不存在的文件会被跳过）
+EXTRA_PRECACHE = ('/manifest.json',)
+
+# 预缓存清单的地址
+PRECACHE_PATH = '/sw-precache.js'
+
+# 两次检查资源文件是否修改的最短间隔（秒）
+CHECK_INTERVAL = 1.0
+
+# 指纹长度（十六进制字符数）
+HASH_LENGTH = 10
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 页面中 src/href 属性引用的本地资源（去掉已有的 ?v= 等查询参数）
+_REFERENCE_PATTERN = re.compile(
+    r'''(?P<prefix>\b(?:src|href)=)(?P<quote>["'])(?P<url>/?assets/[^"'?#]+)(?:\?[^"'#]*)?(?P=quote)''')
+
+
+StaticResponse = namedtuple('StaticResponse', ['body', 'etag', 'content_type'])
+AssetEntry = namedtuple('AssetEntry', ['file_path', 'signature', 'digest', 'url'])
+
+
+class StaticAssets:
+    """静态资源指纹清单、页面改写和预缓存清单生成"""
+    
+    def __init__(self, root: str = '.', asset_dirs: Tuple[str, ...] = ASSET_DIRS,
+                 pages: Optional[Dict[str, str]] = None, check_interval: float = CHECK_INTERVAL):
+        self.root = root
+        self.asset_dirs = asset_dirs
+        self.pages = pages if pages is not None else PAGES
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # 原始地址 -> 资源条目，指纹地址 -> 原始地址
+        self._assets: Dict[str, AssetEntry] = {}
+        self._fingerprinted: Dict[str, str] = {}
+        # 页面文件 -> (文件签名, 清单版本, 改写后的页面, 引用的指纹地址)
+        self._rendered: Dict[str, Tuple[Any, int, StaticResponse, List[str]]] = {}
+        self._precache: Optional[StaticResponse] = None
+        self._generation = 0
+        self._checked_at = 0.0
+        self._rehashed = 0
+    
+    def refresh(self, force: bool = False) -> None:
+        """检查资源文件是否修改，只对新增或修改的文件重新计算哈希"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._assets and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            
+            assets = {}
+            for url, file_path, signature in self._scan():
+                entry = self._assets.get(url)
+                if entry is None or entry.signature != signature:
+                    digest = self._hash_file(file_path)
+                    if digest is None:
+                        continue
+                    base, ext = os.path.splitext(url)
+                    entry = AssetEntry(file_path, signature, digest, f'{base}.{digest}{ext}')
+                    self._rehashed += 1
+                assets[url] = entry
+            
+            if assets != self._assets:
+                self._assets = assets
+                self._fingerprinted = {entry.url: url for url, entry in assets.items()}
+                self._generation += 1
+    
+    def fingerprint(self, url: str) -> Optional[str]:
+        """原始地址对应的指纹地址，不是指纹资源时返回 None"""
+        self.refresh()
+        entry = self._assets.get('/' + url.lstrip('/'))
+        return entry.url if entry else None
+    
+    def resolve(self, path: str) -> Optional[AssetEntry]:
+        """指纹地址对应的资源条目；不是指纹地址（或指纹已过期）时返回 None"""
+        if not path.startswith('/assets/'):
+            return None
+        self.refresh()
+        url = self._fingerprinted.get(path)
+        entry = self._assets.get(url) if url else None
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(entry.file_path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != entry.signature:
+            # 两次检查之间文件被修改，旧指纹不能再对应新内容
+            self.refresh(force=True)
+            return self.resolve(path) if path in self._fingerprinted else None
+        return entry
+    
+    def render_page(self, path: str) -> Optional[StaticResponse]:
+        """返回资源引用已改写为指纹地址的页面，path 不是页面时返回 None"""
+        page_file = self.pages.get(path)
+        if page_file is None:
+            return None
+        self.refresh()
+        rendered = self._render(page_file)
+        return rendered[0] if rendered else None
+    
+    def render_precache(self) -> StaticResponse:
+        """生成 Service Worker 的预缓存清单（版本号和地址列表）"""
+        self.refresh()
+        urls: List[str] = []
+        digest = hashlib.md5()
+        # 同一文件可能对应多个页面地址，预缓存列表中只保留第一个
+        seen_files = set()
+        for path, page_file in self.pages.items():
+            rendered = self._render(page_file)
+            if rendered is None or page_file in seen_files:
+                continue
+            seen_files.add(page_file)
+            page, references = rendered
+            urls.append(path)
+            digest.update(page.etag.encode('utf-8'))
+            urls.extend(url for url in references if url not in urls)
+        for path in EXTRA_PRECACHE:
+            if os.path.isfile(os.path.join(self.root, path.lstrip('/'))):
+                urls.append(path)
+        digest.update('\n'.join(urls).encode('utf-8'))
+        version = digest.hexdigest()[:HASH_LENGTH]
+        
+        etag = f'"{version}"'
+        with self._lock:
+            if self._precache and self._precache.etag == etag:
+                return self._precache
+        body = (
+            '// 由 static_assets.py 根据资源清单生成，不要手动修改\n'
+            f'self.PRECACHE_VERSION = {json.dumps(version)};\n'
+            f'self.PRECACHE_URLS = {json.dumps(urls, indent=2)};\n'
+        ).encode('utf-8')
+        response = StaticResponse(body, etag, 'application/javascript; charset=utf-8')
+        with self._lock:
+            self._precache = response
+        return response
+    
+    def get_manifest(self) -> Dict[str, str]:
+        """原始地址 -> 指纹地址"""
+        self.refresh()
+        return {url: entry.url for url, entry in sorted(self._assets.items())}
+    
+    def get_stats(self) -> Dict[str, Any]:
+        self.refresh()
+        with self._lock:
+            return {
+                'assets': len(self._assets),
+                'generation': self._generation,
+                'rehashed': self._rehashed,
+                'renderedPages': sorted(self._rendered)
+            }
+    
+    def _scan(self):
+        """遍历资源目录，生成 (原始地址, 文件路径, 文件签名)"""
+        for asset_dir in self.asset_dirs:
+            base = os.path.join(self.root, asset_dir)
+            if not os.path.isdir(base):
+                continue
+            for dirpath, dirnames, filenames in os.walk(base):
+                # 第三方依赖的源码目录不直接被页面引用
+                dirnames[:] = [name for name in dirnames if name != 'node_modules' and not name.startswith('.')]
+                for filename in filenames:
+                    if filename.startswith('.'):
+                        continue
+                    file_path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(file_path)
+                    except OSError:
+                        continue
+                    rel_path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+                    yield '/' + rel_path, file_path, (stat.st_size, stat.st_mtime_ns)
+    
+    @staticmethod
+    def _hash_file(file_path: str) -> Optional[str]:
+        digest = hashlib.md5()
+        try:
+            with open(file_path, 'rb') as f:
+                for data in iter(lambda: f.read(256 * 1024), b''):
+                    digest.update(data)
+        except OSError:
+            return None
+        return digest.hexdigest()[:HASH_LENGTH]
+    
+    def _render(self, page_file: str) -> Optional[Tuple[StaticResponse, List[str]]]:
+        file_path = os.path.join(self.root, page_file)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._rendered.get(page_file)
+            if cached and cached[0] == signature and cached[1] == self._generation:
+                return cached[2], cached[3]
+            generation = self._generation
+            assets = self._assets
+        
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                html = f.read()
+        except OSError:
+            return None
+        
+        references: List[str] = []
+        
+        def replace(match):
+            entry = assets.get('/' + match.group('url').lstrip('/'))
+            if entry is None:
+                return match.group(0)
+            if entry.url not in references:
+                references.append(entry.url)
+            return f"{match.group('prefix')}{match.group('quote')}{entry.url}{match.group('quote')}"
+        
+        body = _REFERENCE_PATTERN.sub(replace, html).encode('utf-8')
+        etag = f'"{hashlib.md5(body).hexdigest()[:16]}"'
+        page = StaticResponse(body, etag, 'text/html; charset=utf-8')
+        with self._lock:
+            self._rendered[page_file] = (signature, generation, page, references)
+        return page, references
+
+
+# 全局静态资源实例
+static_assets = StaticAssets()
+
+
+def get_static_assets() -> StaticAssets:
+    """获取全局静态资源实例"""
+    return static_assets
+
+
+if __name__ == '__main__':
+    start = time.time()
+    static_assets.refresh(force=True)
+    manifest = static_assets.get_manifest()
+    elapsed = time.time() - start
+    
+    for url, fingerprinted in manifest.items():
+        print(f'{url} -> {fingerprinted}')
+    print(f"\n📦 资源 {len(manifest)} 个，计算指纹耗时 {elapsed * 1000:.1f}ms")
+    print(static_assets.render_precache().body.decode('utf-8'))
@@ -1,15 +1,11 @@
-const CACHE_NAME = 'epub-reader-v1.2.1';
-const urlsToCache = [
-  '/',
-  '/epub-reader.html',
-  '/assets/css/epub-reader.css',
-  '/assets/js/epub-reader.js',
-  '/assets/js/dictionary.js',
-  '/assets/js/jszip.min.js',
-  '/assets/js/epub.min.js',
-  '/assets/fonts/ipaexm.ttf',
-  '/manifest.json'
-];
+// 缓存版本号和预缓存列表由服务器根据静态资源清单生成（static_assets.py）
+importScripts('/sw-precache.js');
+
+const CACHE_NAME = `epub-reader-${self.PRECACHE_VERSION}`;
+const urlsToCache = self.PRECACHE_URLS;
+
+// 带内容指纹的资源地址（例如 /assets/js/page.3f2a9c1b7e.js），内容不会改变
+const FINGERPRINTED_ASSET = /^\/assets\/.+\.[0-9a-f]{10}\.[a-z0-9]+$/;
 
 // 安装事件 - 缓存资源
 self.addEventListener('install', event => {
@@ -61,6 +57,23 @@ self.addEventListener('fetch', event => {
     return;
   }
 
+  // 指纹资源缓存优先，不需要访问网络
+  const url = new URL(event.request.url);
+  if (url.origin === self.location.origin && FINGERPRINTED_ASSET.test(url.pathname)) {
+    event.respondWith(
+      caches.match(event.request).then(cached => {
+        return cached || fetch(event.request).then(response => {
+          if (response && response.status === 200) {
+            const responseToCache = response.clone();
+            caches.open(CACHE_NAME).then(cache => cache.put(event.request, responseToCache));
+          }
+          return response;
+        });
+      })
+    );
+    return;
+  }
+
   event.respondWith(
     fetch(event.request)
       .then(response => {
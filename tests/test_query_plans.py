@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+热点查询执行计划测试
+在临时数据库上（新建，以及模拟的 v3 数据库迁移到最新版本后）检查 HOT_QUERIES 中的每个查询都走索引
+
+运行: python3 -m unittest tests/test_query_plans.py（或 python3 tests/test_query_plans.py）
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import DatabaseSchema, AnnotationModel, HOT_QUERIES, check_query_plans
+
+
+class QueryPlanTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, 'plan_check.db')
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def _create_v3_database(self) -> None:
+        """模拟 v3 数据库：恢复旧的单列索引，删除 v4 的复合索引，写入接近真实书库的数据"""
+        DatabaseSchema.init_database(self.db_path)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('CREATE INDEX idx_annotations_book_id ON annotations (book_id)')
+            for (index_name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                              "AND name IN ('idx_annotations_book_type_time', 'idx_annotations_book_time', "
+                                              "'idx_reading_daily_stats_book_day', 'idx_reading_book_stats_last_read')").fetchall():
+                conn.execute(f'DROP INDEX {index_name}')
+            conn.execute('UPDATE schema_version SET version = 3')
+            
+            conn.executemany('INSERT INTO books (book_id, title) VALUES (?, ?)',
+                             [(f'book_{i}', f'书籍 {i}') for i in range(50)])
+            conn.executemany('INSERT INTO annotations (id, book_id, type, timestamp) VALUES (?, ?, ?, ?)',
+                             [(f'a_{i}', f'book_{i % 50}', AnnotationModel.get_valid_types()[i % 4], i)
+                              for i in range(2000)])
+            conn.executemany('INSERT INTO reading_daily_stats (day, book_id, duration_ms) VALUES (?, ?, ?)',
+                             [(f'2024-01-{d:02d}', f'book_{b}', 60000) for d in range(1, 29) for b in range(10)])
+            conn.executemany('INSERT INTO reading_book_stats (book_id, last_read) VALUES (?, ?)',
+                             [(f'book_{b}', b) for b in range(50)])
+    
+    def _assert_plans(self) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            for entry in HOT_QUERIES:
+                with self.subTest(query=entry[0]):
+                    failures = check_query_plans(conn, [entry])
+                    self.assertEqual(failures, [], f"{entry[0]} 未走索引: {failures}")
+    
+    def test_new_database(self):
+        DatabaseSchema.init_database(self.db_path)
+        self._assert_plans()
+    
+    def test_migrated_from_v3(self):
+        self._create_v3_database()
+        DatabaseSchema.init_database(self.db_path)
+        
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(DatabaseSchema._get_current_version(conn.cursor()), DatabaseSchema.VERSION)
+            analyzed = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0]
+        self.assertTrue(analyzed, '迁移后没有执行 ANALYZE')
+        self._assert_plans()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+书籍批量上传处理模块
+多本书并行处理（计算ID、写入文件、提取元数据和封面、写入数据库），
+每本书独立提交，处理完一本就产生一条进度事件，单本失败不影响其他书籍。
+"""
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterator, List, Optional, Callable, Tuple
+
+from data_sqlite import SQLiteDataManager
+from epub_parser import EpubBook, EpubParseError
+from file_cache import atomic_write_bytes
+
+
+# 并行处理的线程数（可通过环境变量 EPUB_UPLOAD_WORKERS 调整）
+UPLOAD_WORKERS = int(os.environ.get('EPUB_UPLOAD_WORKERS', '4'))
+
+# 前端解析不到元数据时填入的占位值，可被服务端解析结果替换
+_PLACEHOLDER_VALUES = {'unknown', '未知作者', '未知出版商'}
+
+
+def generate_book_id(file_content, filename):
+    """基于文件内容生成唯一的bookId"""
+    return book_id_from_hash(hashlib.md5(file_content).hexdigest(), filename)
+
+
+def book_id_from_hash(content_hash, filename):
+    """由文件内容的 MD5 生成 bookId（与 generate_book_id 一致，用于不在内存中的文件）"""
+    name_hash = hashlib.md5(filename.encode('utf-8')).hexdigest()
+    return f"book_{content_hash[:8]}_{name_hash[:8]}"
+
+
+def extract_epub_info(file_path: str) -> Dict[str, Any]:
+    """
+    从 EPUB 中读取 OPF 元数据和封面图片
+    
+    Returns:
+        {'metadata': {...}, 'cover': bytes 或 None}
+    """
+    with EpubBook(file_path) as book:
+        cover = None
+        cover_item = book.cover_item()
+        if cover_item:
+            try:
+                cover = book.read(cover_item['path'])
+            except EpubParseError:
+                cover = None
+        return {'metadata': dict(book.metadata), 'cover': cover}
+
+
+class UploadPipeline:
+    """批量上传处理器"""
+    
+    def __init__(self, data_manager: SQLiteDataManager, books_dir: str = 'books',
+                 covers_dir: str = 'books/covers', workers: int = UPLOAD_WORKERS,
+                 on_book_saved: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            on_book_saved: 每本书写入数据库后的回调 (book_id, book_file_path)
+        """
+        self.data_manager = data_manager
+        self.books_dir = books_dir
+        self.covers_dir = covers_dir
+        self.workers = max(1, workers)
+        self.on_book_saved = on_book_saved
+    
+    def process(self, uploads: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        并行处理上传的书籍，按完成顺序产生进度事件
+        
+        Args:
+            uploads: [{'filename', 'content', 'metadata', 'cover'}]，metadata/cover 为前端提供（可选）；
+                分块上传的文件用 'path'（暂存文件，会被移动到书籍目录）和 'md5' 代替 'content'
+        
+        Yields:
+            {'event': 'start'} / {'event': 'book', ...} / {'event': 'done', ...}
+        """
+        start = time.time()
+        total = len(uploads)
+        yield {'event': 'start', 'total': total, 'workers': self.workers}
+        
+        uploaded = 0
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload') as executor:
+            futures = {
+                executor.submit(self._process_one, upload): index
+                for index, upload in enumerate(uploads)
+            }
+            for completed, future in enumerate(as_completed(futures), 1):
+                index = futures[future]
+                event = {
+                    'event': 'book',
+                    'index': index,
+                    'completed': completed,
+                    'total': total,
+                    'filename': uploads[index]['filename']
+                }
+                try:
+                    event.update(future.result())
+                    event['success'] = True
+                    uploaded += 1
+                except Exception as e:
+                    print(f"❌ [UploadPipeline] 处理失败: {uploads[index]['filename']} - {e}")
+                    event['success'] = False
+                    event['error'] = str(e)
+                    # 文件本身无法解析（重试也不会成功），区别于服务端的 I/O、数据库错误
+                    event['invalidEpub'] = isinstance(e, EpubParseError)
+                    failed += 1
+                yield event
+        
+        yield {
+            'event': 'done',
+            'total': total,
+            'uploaded': uploaded,
+            'failed': failed,
+            'elapsed': round(time.time() - start, 3)
+        }
+    
+    def _process_one(self, upload: Dict[str, Any]) -> Dict[str, Any]:
+        """处理一本书：写入文件、补全元数据和封面、写入数据库"""
+        start = time.time()
+        filename = upload['filename']
+        if 'path' in upload:
+            book_id = book_id_from_hash(upload['md5'], filename)
+        else:
+            book_id = generate_book_id(upload['content'], filename)
+        
+        # 写入文件到登记书籍期间持有书籍锁，删除同一本书的后台清理任务不会删掉刚写入的文件
+        with self.data_manager.book_lock(book_id):
+            book_info, book_file_path = self._save_book(book_id, upload)
+        
+        if self.on_book_saved:
+            self.on_book_saved(book_id, book_file_path)
+        
+        print(f"📚 [UploadPipeline] 上传成功: {filename} -> {book_id}")
+        return {
+            'id': book_id,
+            'title': book_info['title'],
+            'hasCover': book_info['coverPath'] is not None,
+            'elapsed': round(time.time() - start, 3)
+        }
+    
+    def _save_book(self, book_id: str, upload: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """
+        写入书籍文件和封面并登记到数据库，返回 (书籍信息, 书籍文件路径)
+        
+        登记失败时撤销文件写入：分块上传的文件移回暂存位置（会话可以重试），
+        其他情况删除刚写入的文件；同一本书已有的文件保留
+        """
+        book_file_path = os.path.join(self.books_dir, f"{book_id}.epub")
+        existed = os.path.exists(book_file_path)
+        if 'path' in upload:
+            # 分块上传：暂存文件已校验，直接移动到书籍目录，不读入内存（书籍 ID 相同即内容相同，已有文件时不移动）
+            if not existed:
+                os.replace(upload['path'], book_file_path)
+            file_size = os.path.getsize(book_file_path)
+        else:
+            content = upload['content']
+            atomic_write_bytes(book_file_path, content)
+            file_size = len(content)
+        
+        try:
+            return self._register_book(book_id, upload, book_file_path, file_size)
+        except BaseException:
+            if not existed and os.path.exists(book_file_path):
+                if 'path' in upload:
+                    os.replace(book_file_path, upload['path'])
+                else:
+                    os.remove(book_file_path)
+            raise
+    
+    def _register_book(self, book_id: str, upload: Dict[str, Any], book_file_path: str,
+                       file_size: int) -> Tuple[Dict[str, Any], str]:
+        """补全元数据、保存封面并写入数据库"""
+        filename = upload['filename']
+        # 前端解析的元数据优先，缺失的字段由服务端从 OPF 中补全
+        metadata = dict(upload.get('metadata') or {})
+        cover = upload.get('cover')
+        try:
+            extracted = extract_epub_info(book_file_path)
+        except EpubParseError as e:
+            if not metadata:
+                # 没有前端元数据时无法登记无效的文件，作为失败返回
+                raise
+            print(f"⚠️ [UploadPipeline] 服务端解析失败，使用前端元数据: {filename} - {e}")
+            extracted = {'metadata': {}, 'cover': None}
+        for key, value in extracted['metadata'].items():
+            if not metadata.get(key) or metadata[key] in _PLACEHOLDER_VALUES:
+                metadata[key] = value
+        if not cover:
+            cover = extracted['cover']
+        
+        cover_path = None
+        if cover:
+            try:
+                cover_path = os.path.join(self.covers_dir, f"{book_id}.jpg")
+                atomic_write_bytes(cover_path, cover)
+            except Exception as e:
+                print(f"❌ [UploadPipeline] 封面保存失败: {e}")
+                cover_path = None
+        
+        book_info = {
+            'title': metadata.get('title', filename.replace('.epub', '')),
+            'author': metadata.get('creator', metadata.get('author', '未知作者')),
+            'filename': filename,
+            'addedDate': str(int(time.time() * 1000)),
+            'language': metadata.get('language', 'unknown'),
+            'fileSize': file_size,
+            'publisher': metadata.get('publisher', '未知出版商'),
+            'description': metadata.get('description', ''),
+            'identifier': metadata.get('identifier', ''),
+            'coverPath': cover_path
+        }
+        self.data_manager.add_book(book_id, book_info, book_file_path)
+        return book_info, book_file_path